@@ -1,59 +1,317 @@
 #!/usr/bin/env python3
+"""
+OpenCV post-processing for enhanced images: CLAHE on L plus gray-world white balance.
+
+One-shot:
+    opencv_post.py --input in.jpg --output out.jpg
+
+Persistent server (one interpreter and cv2 import for many images):
+    opencv_post.py --serve [--socket /tmp/opencv_post.sock] [--workers 4]
+
+In server mode each line on stdin (or on a socket connection) is a JSON job
+    {"id": "...", "input": "in.jpg", "output": "out.jpg", "options": {"clip_limit": 2.0}}
+and one JSON result per job is written back (stdout, or the same connection)
+as jobs complete, not necessarily in submission order:
+    {"id": "...", "ok": true, "output": "out.jpg", "timings_ms": {...}}
+"""
 import argparse
-import cv2
-import numpy as np
+import json
+import os
 import shutil
+import socket
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
-    parser = argparse.ArgumentParser(description='OpenCV post-processing for enhanced images')
-    parser.add_argument('--input', required=True, help='Input image path')
-    parser.add_argument('--output', required=True, help='Output image path')
-    args = parser.parse_args()
+import cv2
+import numpy as np
+
+DEFAULT_OPTIONS = {'clip_limit': 2.0, 'tile_grid': 8, 'quality': 92, 'engine': 'lut'}
+
+
+def clahe_lab_legacy(img, clip_limit, grid):
+    """CLAHE on L via split/merge; returns a new BGR image."""
+    # Convert to LAB
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+
+    # CLAHE on L channel
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(grid, grid))
+    l_clahe = clahe.apply(l)
+
+    # Merge back
+    lab_clahe = cv2.merge([l_clahe, a, b])
+
+    # Convert back to BGR
+    return cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2BGR)
+
+
+def clahe_lab_inplace(img, clip_limit, grid):
+    """CLAHE on L reusing one LAB buffer and writing the result back into ``img``."""
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l = cv2.extractChannel(lab, 0)
+    cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(grid, grid)).apply(l, dst=l)
+    cv2.insertChannel(l, lab, 0)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=img)
+
+
+def gray_world_scales(img):
+    """Per-channel gains that bring each BGR channel mean to the overall mean."""
+    means = cv2.mean(img)[:3]  # BGR
+    avg_mean = np.mean(means)
+    return [avg_mean / mean if mean > 0 else 1.0 for mean in means]
+
+
+def white_balance_legacy(img):
+    """Gray-world white balance through a float32 copy of the frame."""
+    scales = gray_world_scales(img)
+
+    # Apply scaling
+    balanced = img.astype(np.float32)
+    balanced[:, :, 0] *= scales[0]  # B
+    balanced[:, :, 1] *= scales[1]  # G
+    balanced[:, :, 2] *= scales[2]  # R
+    return np.clip(balanced, 0, 255).astype(np.uint8)
+
+
+def gray_world_lut(scales):
+    """
+    256-entry per-channel lookup table for the gray-world gains.
+
+    Entries are computed exactly as the float32 path computes each pixel
+    (scale, clip, truncate), so the lookup reproduces it bit for bit.
+    """
+    levels = np.arange(256, dtype=np.float32)
+    lut = np.stack([levels * np.float32(scale) for scale in scales], axis=-1)
+    return np.clip(lut, 0, 255).astype(np.uint8).reshape(1, 256, 3)
+
+
+def white_balance_lut(img):
+    """Gray-world white balance as one in-place cv2.LUT pass over the uint8 frame."""
+    return cv2.LUT(img, gray_world_lut(gray_world_scales(img)), dst=img)
+
+
+ENGINES = {
+    'lut': (clahe_lab_inplace, white_balance_lut),
+    'legacy': (clahe_lab_legacy, white_balance_legacy),
+}
+
+
+def enhance(img, opts, timings=None):
+    """Apply CLAHE + white balance with the selected engine, recording stage timings."""
+    clahe_stage, balance_stage = ENGINES[opts['engine']]
+    start = time.perf_counter()
+    img = clahe_stage(img, float(opts['clip_limit']), int(opts['tile_grid']))
+    middle = time.perf_counter()
+    img = balance_stage(img)
+    if timings is not None:
+        timings['clahe'] = round((middle - start) * 1000, 2)
+        timings['white_balance'] = round((time.perf_counter() - middle) * 1000, 2)
+    return img
+
+
+def process_image(input_path, output_path, options=None):
+    """Run CLAHE + white balance on one file and return per-stage timings in ms."""
+    opts = {**DEFAULT_OPTIONS, **(options or {})}
+    if opts['engine'] not in ENGINES:
+        raise ValueError(f"Unknown engine {opts['engine']!r}, expected one of {sorted(ENGINES)}")
+    timings = {}
+    start = time.perf_counter()
+
+    # Read image
+    img = cv2.imread(input_path)
+    if img is None:
+        raise ValueError(f"Could not read image from {input_path}")
+    timings['read'] = round((time.perf_counter() - start) * 1000, 2)
+
+    balanced = enhance(img, opts, timings)
+
+    # Write with quality 92 by default
+    stage = time.perf_counter()
+    if not cv2.imwrite(output_path, balanced, [cv2.IMWRITE_JPEG_QUALITY, int(opts['quality'])]):
+        raise ValueError(f"Could not write image to {output_path}")
+    timings['write'] = round((time.perf_counter() - stage) * 1000, 2)
+
+    timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+    return timings
+
+
+def bench(input_path, repeat):
+    """Time each engine's stages on one decoded image and compare their outputs."""
+    img = cv2.imread(input_path)
+    if img is None:
+        raise ValueError(f"Could not read image from {input_path}")
+    print(f"{input_path}: {img.shape[1]}x{img.shape[0]}, best of {repeat}")
+    print(f"{'engine':>8} {'clahe ms':>9} {'wb ms':>8} {'total ms':>9}")
+
+    outputs = {}
+    for engine in ENGINES:
+        best = None
+        for _ in range(repeat):
+            timings = {}
+            # Engines may work in place, so each run gets a fresh copy
+            outputs[engine] = enhance(img.copy(), {**DEFAULT_OPTIONS, 'engine': engine}, timings)
+            timings['total'] = timings['clahe'] + timings['white_balance']
+            if best is None or timings['total'] < best['total']:
+                best = timings
+        print(f"{engine:>8} {best['clahe']:>9.2f} {best['white_balance']:>8.2f} {best['total']:>9.2f}")
+
+    diff = cv2.absdiff(outputs['lut'], outputs['legacy']).max()
+    print(f"max abs difference lut vs legacy: {diff}")
+
+
+def run_job(job):
+    """Process one job dict and return its result dict; never raises."""
+    job_id = job.get('id')
+    input_path, output_path = job.get('input'), job.get('output')
+    if not input_path or not output_path:
+        return {'id': job_id, 'ok': False, 'error': 'job needs "input" and "output"'}
 
     try:
-        # Read image
-        img = cv2.imread(args.input)
-        if img is None:
-            raise ValueError(f"Could not read image from {args.input}")
+        timings = process_image(input_path, output_path, job.get('options'))
+        return {'id': job_id, 'ok': True, 'output': output_path, 'timings_ms': timings}
+    except Exception as e:
+        # Same fallback as one-shot mode: pass the input through unchanged
+        result = {'id': job_id, 'ok': False, 'error': str(e), 'fallback': False}
+        try:
+            shutil.copy2(input_path, output_path)
+            result['fallback'] = True
+        except OSError:
+            pass
+        return result
+
+
+def serve_stream(lines, write, pool):
+    """Submit every NDJSON line to the pool; results are written as they finish."""
+    outstanding = 0
+    idle = threading.Condition()
+
+    def done(future, received, job_id):
+        nonlocal outstanding
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'id': job_id, 'ok': False, 'error': str(e) or e.__class__.__name__}
+            # Time spent waiting for a free worker
+            timings = result.setdefault('timings_ms', {})
+            timings['queued'] = round((time.perf_counter() - received) * 1000 - timings.get('total', 0), 2)
+            write(result)
+        finally:
+            # Always release the job, or EOF would wait for it forever
+            with idle:
+                outstanding -= 1
+                idle.notify_all()
 
-        # Convert to LAB
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            write({'id': None, 'ok': False, 'error': f'invalid JSON: {e}'})
+            continue
+        if not isinstance(job, dict):
+            write({'id': None, 'ok': False, 'error': 'job must be a JSON object'})
+            continue
 
-        # CLAHE on L channel
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l_clahe = clahe.apply(l)
+        with idle:
+            outstanding += 1
+        received = time.perf_counter()
+        pool.submit(run_job, job).add_done_callback(
+            lambda f, received=received, job_id=job.get('id'): done(f, received, job_id)
+        )
 
-        # Merge back
-        lab_clahe = cv2.merge([l_clahe, a, b])
+    # Flush every result before the caller closes the stream
+    with idle:
+        idle.wait_for(lambda: outstanding == 0)
 
-        # Convert back to BGR
-        balanced = cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2BGR)
 
-        # Simple gray-world white balance
-        # Calculate mean of each channel
-        means = cv2.mean(balanced)[:3]  # BGR
-        avg_mean = np.mean(means)
+def make_writer(stream):
+    lock = threading.Lock()
 
-        # Scale each channel to match average
-        scales = [avg_mean / mean if mean > 0 else 1.0 for mean in means]
+    def write(result):
+        data = json.dumps(result) + '\n'
+        with lock:
+            stream.write(data)
+            stream.flush()
 
-        # Apply scaling
-        balanced = balanced.astype(np.float32)
-        balanced[:, :, 0] *= scales[0]  # B
-        balanced[:, :, 1] *= scales[1]  # G
-        balanced[:, :, 2] *= scales[2]  # R
-        balanced = np.clip(balanced, 0, 255).astype(np.uint8)
+    return write
 
-        # Write with quality 92
-        cv2.imwrite(args.output, balanced, [cv2.IMWRITE_JPEG_QUALITY, 92])
 
+def serve_stdin(pool):
+    serve_stream(sys.stdin, make_writer(sys.stdout), pool)
+
+
+def serve_socket(path, pool):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    print(f"opencv_post listening on {path}", file=sys.stderr, flush=True)
+
+    def handle(conn):
+        with conn, conn.makefile('r', encoding='utf-8') as reader, conn.makefile('w', encoding='utf-8') as writer:
+            serve_stream(reader, make_writer(writer), pool)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+    finally:
+        server.close()
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenCV post-processing for enhanced images')
+    parser.add_argument('--input', help='Input image path')
+    parser.add_argument('--output', help='Output image path')
+    parser.add_argument('--serve', action='store_true', help='Read NDJSON jobs until EOF instead of one image')
+    parser.add_argument('--socket', help='With --serve: listen on this Unix socket instead of stdin')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='With --serve: images processed concurrently')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_OPTIONS['engine'],
+                        help='lut: in-place LUT white balance (default); legacy: float32 path')
+    parser.add_argument('--bench', action='store_true', help='Time each engine on --input and compare outputs')
+    parser.add_argument('--repeat', type=int, default=5, help='With --bench: timed runs per engine')
+    args = parser.parse_args()
+    DEFAULT_OPTIONS['engine'] = args.engine
+
+    if args.bench:
+        if not args.input:
+            parser.error('--bench needs --input')
+        bench(args.input, args.repeat)
+        return
+
+    if args.serve:
+        if args.workers > 1:
+            # Parallelism comes from the pool (cv2 releases the GIL); keep each job single-threaded
+            cv2.setNumThreads(1)
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            try:
+                if args.socket:
+                    serve_socket(args.socket, pool)
+                else:
+                    serve_stdin(pool)
+            except KeyboardInterrupt:
+                pass
+        return
+
+    if not args.input or not args.output:
+        parser.error('--input and --output are required unless --serve is given')
+
+    try:
+        process_image(args.input, args.output)
     except Exception as e:
         print(f"Error processing image: {e}", file=sys.stderr)
         # On error, copy input to output
         shutil.copy2(args.input, args.output)
         sys.exit(1)
 
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -27,6 +27,8 @@ const workerEnvSchema = z.object({
   ENHANCE_DEFAULT_SCALE: z.coerce.number().default(2),
   ENHANCE_KEEP_SCALE: z.coerce.number().default(1),
   PYTHON_BIN: z.string().optional(),
+  OPENCV_POST_MODE: z.enum(['server', 'spawn']).default('server'),
+  OPENCV_POST_WORKERS: z.coerce.number().int().positive().default(2),
   OPENAI_API_KEY: z.string().optional(),
   CAPTION_MODEL: z.string().default('gpt-4o-mini'),
   CAPTION_MAX_HASHTAGS: z.coerce.number().default(5),
@@ -2,6 +2,7 @@ import { logger } from '@vitrinealu/shared/logger';
 
 import { env } from './config.js';
 import { createServer } from './server.js';
+import { closeOpencvPostServer } from './lib/opencvPost.js';
 import './lib/queue.js'; // Re-enabled
 // import './webhooks/background.js';
 
@@ -21,6 +22,20 @@ const start = async () => {
   const port = Number(process.env.PORT ?? 4000); // Use 4000
   const host = process.env.HOST ?? '127.0.0.1'; // Use 127.0.0.1 instead of 0.0.0.0 for Windows
 
+  // Stop the persistent OpenCV post-processing child along with the server
+  const shutdown = async (signal: NodeJS.Signals) => {
+    console.log(`Received ${signal}, shutting down worker server`);
+    const results = await Promise.allSettled([app.close(), closeOpencvPostServer()]);
+    for (const result of results) {
+      if (result.status === 'rejected') {
+        console.error('Error during shutdown', result.reason);
+      }
+    }
+    process.exit(0);
+  };
+  process.once('SIGTERM', (signal) => void shutdown(signal));
+  process.once('SIGINT', (signal) => void shutdown(signal));
+
   try {
     const address = await app.listen({ port, host });
     console.log(`Worker server started on ${host}:${port}, listening at ${address}`);
@@ -0,0 +1,66 @@
+import { describe, it, expect, afterEach, vi } from 'vitest';
+import { OpencvPostServer } from './opencvPost.js';
+
+vi.mock('../config.js', () => ({
+  env: {
+    PYTHON_BIN: 'python3',
+    OPENCV_POST_MODE: 'server',
+    OPENCV_POST_WORKERS: 2
+  }
+}));
+
+// Stands in for `opencv_post.py --serve`: answers each NDJSON job, failing inputs named "bad"
+// and exiting on inputs named "crash"
+const fakeServer = `
+const rl = require('node:readline').createInterface({ input: process.stdin });
+rl.on('line', (line) => {
+  const job = JSON.parse(line);
+  if (job.input.includes('crash')) process.exit(3);
+  const result = job.input.includes('bad')
+    ? { id: job.id, ok: false, error: 'Could not read image', fallback: true }
+    : { id: job.id, ok: true, output: job.output, timings_ms: { total: 1.5, pid: process.pid } };
+  setTimeout(() => process.stdout.write(JSON.stringify(result) + '\\n'), job.input.includes('slow') ? 30 : 0);
+});
+`;
+
+describe('OpencvPostServer', () => {
+  let server: OpencvPostServer;
+
+  afterEach(async () => {
+    await server.close();
+  });
+
+  it('matches out-of-order results to their jobs in one process', async () => {
+    server = new OpencvPostServer(process.execPath, ['-e', fakeServer]);
+
+    const results = await Promise.all([
+      server.process('/in/slow.jpg', '/out/slow.jpg'),
+      server.process('/in/a.jpg', '/out/a.jpg'),
+      server.process('/in/b.jpg', '/out/b.jpg', { quality: 90 })
+    ]);
+
+    expect(results.map((r) => r.output)).toEqual(['/out/slow.jpg', '/out/a.jpg', '/out/b.jpg']);
+    const pids = new Set(results.map((r) => (r.timings_ms as Record<string, number>).pid));
+    expect(pids.size).toBe(1);
+  });
+
+  it('rejects failed jobs without affecting others', async () => {
+    server = new OpencvPostServer(process.execPath, ['-e', fakeServer]);
+
+    const [bad, good] = await Promise.allSettled([
+      server.process('/in/bad.jpg', '/out/bad.jpg'),
+      server.process('/in/good.jpg', '/out/good.jpg')
+    ]);
+
+    expect(bad.status).toBe('rejected');
+    expect((bad as PromiseRejectedResult).reason.message).toContain('Could not read image');
+    expect(good.status).toBe('fulfilled');
+  });
+
+  it('fails in-flight jobs when the server dies and restarts on the next job', async () => {
+    server = new OpencvPostServer(process.execPath, ['-e', fakeServer]);
+
+    await expect(server.process('/in/crash.jpg', '/out/crash.jpg')).rejects.toThrow('exited (code 3');
+    await expect(server.process('/in/after.jpg', '/out/after.jpg')).resolves.toMatchObject({ ok: true });
+  });
+});
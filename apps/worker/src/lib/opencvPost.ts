@@ -1,11 +1,173 @@
-import { spawn } from 'node:child_process';
-import { access } from 'node:fs/promises';
+import { spawn, type ChildProcessWithoutNullStreams } from 'node:child_process';
 import path from 'node:path';
+import { createInterface } from 'node:readline';
+import { logger } from '@vitrinealu/shared/logger';
 import { env } from '../config.js';
 
-export const runOpencvPost = async (inputPath: string, outputPath: string): Promise<string> => {
+const scriptPath = path.join(path.dirname(new URL(import.meta.url).pathname), '..', '..', 'scripts', 'opencv_post.py');
+
+export interface OpencvPostOptions {
+  clipLimit?: number;
+  tileGrid?: number;
+  quality?: number;
+}
+
+export interface OpencvPostTimings {
+  read?: number;
+  clahe?: number;
+  white_balance?: number;
+  write?: number;
+  total?: number;
+  queued?: number;
+}
+
+export interface OpencvPostResult {
+  id: string | null;
+  ok: boolean;
+  output?: string;
+  error?: string;
+  fallback?: boolean;
+  timings_ms?: OpencvPostTimings;
+}
+
+interface PendingJob {
+  resolve: (result: OpencvPostResult) => void;
+  reject: (error: Error) => void;
+  timer: ReturnType<typeof setTimeout>;
+}
+
+/**
+ * Long-lived `opencv_post.py --serve` process fed NDJSON jobs over stdin.
+ * Avoids paying interpreter start-up and the cv2/numpy import per image.
+ */
+export class OpencvPostServer {
+  private child: ChildProcessWithoutNullStreams | null = null;
+  private readonly pending = new Map<string, PendingJob>();
+  private nextId = 0;
+
+  constructor(
+    private readonly command: string,
+    private readonly args: string[],
+    private readonly timeoutMs = 120_000
+  ) {}
+
+  private ensureStarted(): ChildProcessWithoutNullStreams {
+    if (this.child) {
+      return this.child;
+    }
+
+    const child = spawn(this.command, this.args, { stdio: ['pipe', 'pipe', 'pipe'] });
+    child.on('error', (err) => this.stopped(child, err));
+    child.on('exit', (code, signal) =>
+      this.stopped(child, new Error(`OpenCV post server exited (code ${code}, signal ${signal})`))
+    );
+    child.stdin.on('error', (err) => this.stopped(child, err));
+    child.stderr.on('data', (chunk: Buffer) => logger.warn({ stderr: chunk.toString().trim() }, 'opencv_post'));
+    createInterface({ input: child.stdout }).on('line', (line) => this.handleLine(line));
+
+    this.child = child;
+    logger.info({ pid: child.pid }, 'Started OpenCV post server');
+    return child;
+  }
+
+  private handleLine(line: string) {
+    let result: OpencvPostResult;
+    try {
+      result = JSON.parse(line) as OpencvPostResult;
+    } catch {
+      logger.warn({ line }, 'Ignoring malformed OpenCV post server output');
+      return;
+    }
+
+    const job = result.id === null ? undefined : this.pending.get(result.id);
+    if (!job) {
+      logger.warn({ result }, 'OpenCV post result for unknown job');
+      return;
+    }
+    this.pending.delete(result.id as string);
+    clearTimeout(job.timer);
+
+    if (result.ok) {
+      job.resolve(result);
+    } else {
+      job.reject(new Error(`OpenCV post-processing failed: ${result.error ?? 'unknown error'}`));
+    }
+  }
+
+  private stopped(child: ChildProcessWithoutNullStreams, error: Error) {
+    if (this.child !== child) {
+      return;
+    }
+    this.child = null;
+    // The next job restarts the server; jobs in flight cannot be recovered
+    for (const [id, job] of this.pending) {
+      clearTimeout(job.timer);
+      job.reject(error);
+      this.pending.delete(id);
+    }
+  }
+
+  process(inputPath: string, outputPath: string, options: OpencvPostOptions = {}): Promise<OpencvPostResult> {
+    const id = String(++this.nextId);
+    const job = {
+      id,
+      input: inputPath,
+      output: outputPath,
+      options: { clip_limit: options.clipLimit, tile_grid: options.tileGrid, quality: options.quality }
+    };
+
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`OpenCV post-processing timed out after ${this.timeoutMs}ms`));
+      }, this.timeoutMs);
+      this.pending.set(id, { resolve, reject, timer });
+
+      try {
+        this.ensureStarted().stdin.write(`${JSON.stringify(job)}\n`);
+      } catch (err) {
+        clearTimeout(timer);
+        this.pending.delete(id);
+        reject(err as Error);
+      }
+    });
+  }
+
+  /** Finish queued jobs and stop the server. */
+  async close(): Promise<void> {
+    const child = this.child;
+    if (!child) {
+      return;
+    }
+    await new Promise<void>((resolve) => {
+      child.once('exit', () => resolve());
+      child.stdin.end();
+    });
+  }
+}
+
+let sharedServer: OpencvPostServer | null = null;
+
+const getServer = () => {
+  if (!sharedServer) {
+    sharedServer = new OpencvPostServer(env.PYTHON_BIN ?? 'python', [
+      scriptPath,
+      '--serve',
+      '--workers',
+      String(env.OPENCV_POST_WORKERS)
+    ]);
+  }
+  return sharedServer;
+};
+
+export const closeOpencvPostServer = async () => {
+  const server = sharedServer;
+  sharedServer = null;
+  await server?.close();
+};
+
+const runOneShot = (inputPath: string, outputPath: string): Promise<string> => {
   const pythonBin = env.PYTHON_BIN ?? 'python';
-  const scriptPath = path.join(path.dirname(new URL(import.meta.url).pathname), '..', '..', 'scripts', 'opencv_post.py');
 
   return new Promise((resolve, reject) => {
     const child = spawn(pythonBin, [scriptPath, '--input', inputPath, '--output', outputPath], {
@@ -21,4 +183,14 @@ export const runOpencvPost = async (inputPath: string, outputPath: string): Prom
       }
     });
   });
-};
\ No newline at end of file
+};
+
+export const runOpencvPost = async (inputPath: string, outputPath: string): Promise<string> => {
+  if (env.OPENCV_POST_MODE === 'spawn') {
+    return runOneShot(inputPath, outputPath);
+  }
+
+  const result = await getServer().process(inputPath, outputPath);
+  logger.debug({ inputPath, timings: result.timings_ms }, 'OpenCV post-processing complete');
+  return outputPath;
+};
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fused compositor against the legacy composite + lighting path.
+
+Each (size, implementation) pair runs in a fresh subprocess so peak RSS is
+measured in isolation. Reported memory is the peak RSS growth over the
+process state after the inputs were allocated.
+
+Usage:
+    python benchmarks/bench_composite.py [--sizes 12 24] [--repeat 3]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _make_inputs(megapixels: int):
+    import cv2
+    import numpy as np
+
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+
+    foreground = np.empty((height, width, 3), dtype=np.uint8)
+    foreground[:] = np.linspace(40, 220, width, dtype=np.uint8)[None, :, None]
+    background = np.empty_like(foreground)
+    background[:] = np.linspace(200, 60, height, dtype=np.uint8)[:, None, None]
+    background[..., 0] //= 2
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(mask, (width // 2, height // 2), (width // 3, height // 3), 0, 0, 360, 255, -1)
+    cv2.GaussianBlur(mask, (9, 9), 0, dst=mask)
+    return foreground, background, mask
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(impl: str, megapixels: int, repeat: int) -> dict:
+    sys.path.insert(0, str(SERVICE_DIR))
+    from src.composite import adjust_lighting_consistency, create_seamless_composite, fused_composite
+
+    foreground, background, mask = _make_inputs(megapixels)
+    baseline = _peak_rss_mb()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if impl == "legacy":
+            composite = create_seamless_composite(foreground, background, mask)
+            adjust_lighting_consistency(composite, mask)
+        else:
+            fused_composite(foreground, background, mask)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "impl": impl,
+        "megapixels": megapixels,
+        "shape": list(foreground.shape),
+        "best_s": round(min(timings), 3),
+        "mean_s": round(sum(timings) / len(timings), 3),
+        "peak_rss_delta_mb": round(_peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[12, 24], help="Image sizes in megapixels")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement")
+    parser.add_argument("--worker", choices=["legacy", "fused"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.sizes[0], args.repeat)))
+        return
+
+    print(f"{'size':>6} {'impl':>7} {'best s':>8} {'mean s':>8} {'peak RSS +MB':>13}")
+    for megapixels in args.sizes:
+        for impl in ("legacy", "fused"):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", impl,
+                 "--sizes", str(megapixels), "--repeat", str(args.repeat)],
+                capture_output=True, text=True, check=True
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{megapixels:>4}MP {impl:>7} {result['best_s']:>8.3f} "
+                  f"{result['mean_s']:>8.3f} {result['peak_rss_delta_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark SDXL generation profiles (SDXL_PROFILE) on the current device.
+
+Each profile runs in a fresh subprocess so model load, compilation and peak
+RSS are measured in isolation. The first generation is reported separately
+as warm-up (it includes torch.compile for profiles that enable it); the
+steady-state figure is the mean over the remaining runs.
+
+Usage:
+    python benchmarks/bench_sdxl_profiles.py [--profiles quality cpu_fast] [--size 1024] [--repeat 3]
+
+Set MODEL_ID to the checkpoint matching the profile (e.g. latent-consistency/lcm-sdxl
+for "lcm", stabilityai/sdxl-turbo for "turbo"), or pass --model-id per run.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+PROMPT = "professional photography studio with soft diffused lighting, clean backdrop"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(profile: str, size: int, steps: int, repeat: int) -> dict:
+    sys.path.insert(0, str(SERVICE_DIR))
+    from src.generate import SDXLGenerator
+
+    start = time.perf_counter()
+    generator = SDXLGenerator(profile=profile)
+    load_s = time.perf_counter() - start
+
+    timings = []
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        # Distinct seeds so the generator's result cache never short-circuits a run
+        generator.generate_background(PROMPT, width=size, height=size, steps=steps, seed=1000 + i)
+        timings.append(time.perf_counter() - start)
+
+    render_width, render_height = generator.profile.render_size(size, size)
+    render_steps, _ = generator.profile.sampling(steps, 7.5)
+    steady = timings[1:]
+    return {
+        "profile": profile,
+        "render": f"{render_width}x{render_height}",
+        "steps": render_steps,
+        "load_s": round(load_s, 1),
+        "warmup_s": round(timings[0], 1),
+        "s_per_image": round(sum(steady) / len(steady), 2),
+        "peak_rss_mb": round(_peak_rss_mb()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["quality", "cpu_fast"], help="Profiles to compare")
+    parser.add_argument("--size", type=int, default=1024, help="Requested square output size")
+    parser.add_argument("--steps", type=int, default=20, help="Requested steps (profiles may cap them)")
+    parser.add_argument("--repeat", type=int, default=2, help="Timed runs after the warm-up run")
+    parser.add_argument("--model-id", help="Override MODEL_ID for every profile")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.size, args.steps, args.repeat)))
+        return
+
+    env = dict(os.environ)
+    if args.model_id:
+        env["MODEL_ID"] = args.model_id
+
+    print(f"{'profile':>9} {'render':>10} {'steps':>6} {'load s':>7} {'warmup s':>9} {'s/image':>8} {'peak RSS MB':>12}")
+    for profile in args.profiles:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", profile, "--size", str(args.size),
+             "--steps", str(args.steps), "--repeat", str(args.repeat)],
+            capture_output=True, text=True, env=env, cwd=SERVICE_DIR
+        )
+        if proc.returncode != 0:
+            print(f"{profile:>9} failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{profile:>9} {r['render']:>10} {r['steps']:>6} {r['load_s']:>7.1f} {r['warmup_s']:>9.1f} "
+              f"{r['s_per_image']:>8.2f} {r['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,12 @@ __version__ = "1.0.0"
 __author__ = "VitrineLu Marketing"
 __description__ = "Microservice for background cleanup and generative background replacement"
 
-from .main import app
+__all__ = ["app"]
 
-__all__ = ["app"]
\ No newline at end of file
+
+def __getattr__(name):
+    # Import the app lazily so submodules (and their tests) load without the full service
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,6 +6,59 @@ from typing import Tuple, Optional
 from scipy.stats import pearsonr
 
 from .logger import log
+from .tiles import boundary_tiles, pad_tile
+
+
+def _selection_mask(mask: np.ndarray) -> np.ndarray:
+    """Return ``mask > 0`` as the uint8 0/255 mask OpenCV reductions expect."""
+    if mask.dtype == np.uint8:
+        return cv2.compare(mask, 0, cv2.CMP_GT)
+    return (mask > 0).astype(np.uint8) * 255
+
+
+def masked_mean_std(image: np.ndarray, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-channel mean and standard deviation over the pixels selected by a mask.
+    
+    A single ``cv2.meanStdDev`` reduction replaces boolean fancy-indexing, which
+    copies every selected pixel once per statistic and channel.
+    
+    Args:
+        image: Single- or multi-channel image
+        mask: Optional mask; pixels where ``mask > 0`` are included
+        
+    Returns:
+        Tuple of (mean, std) arrays with one entry per channel
+    """
+    if mask is None:
+        mean, std = cv2.meanStdDev(image)
+    else:
+        select = _selection_mask(mask)
+        if cv2.countNonZero(select) == 0:
+            raise ValueError("Mask selects no pixels")
+        mean, std = cv2.meanStdDev(image, mask=select)
+    return mean.ravel(), std.ravel()
+
+
+def _color_match_lut(source_mean: np.ndarray,
+                     source_std: np.ndarray,
+                     target_mean: np.ndarray,
+                     target_std: np.ndarray) -> np.ndarray:
+    """
+    Build the per-channel lookup table for a mean/std colour transfer.
+    
+    The transfer is affine per channel, so on 8-bit LAB it collapses to a
+    256-entry table per channel applied with ``cv2.LUT``.
+    """
+    levels = np.arange(256, dtype=np.float64)
+    lut = np.empty((1, 256, 3), dtype=np.uint8)
+    for i in range(3):
+        if source_std[i] > 0:
+            mapped = (levels - source_mean[i]) * (target_std[i] / source_std[i]) + target_mean[i]
+            lut[0, :, i] = np.clip(mapped, 0, 255).astype(np.uint8)
+        else:
+            lut[0, :, i] = levels.astype(np.uint8)
+    return lut
 
 
 def extract_histogram_features(image: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
@@ -22,6 +75,8 @@ def extract_histogram_features(image: np.ndarray, mask: Optional[np.ndarray] = N
     try:
         # Convert to LAB color space for better color matching
         lab_image = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        if mask is not None:
+            mask = _selection_mask(mask)
         
         # Calculate histograms for each channel
         hist_l = cv2.calcHist([lab_image], [0], mask, [32], [0, 256])
@@ -60,40 +115,25 @@ def match_color_histograms(source: np.ndarray,
         Color-matched source image
     """
     try:
+        # An empty mask has no statistics to match; leave the colours unchanged
+        for mask in (source_mask, target_mask):
+            if mask is not None and cv2.countNonZero(_selection_mask(mask)) == 0:
+                log.warning("Color matching skipped - mask selects no pixels")
+                return source.copy()
+        
         # Convert to LAB color space
-        source_lab = cv2.cvtColor(source, cv2.COLOR_BGR2LAB).astype(np.float32)
-        target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype(np.float32)
+        source_lab = cv2.cvtColor(source, cv2.COLOR_BGR2LAB)
+        target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB)
         
-        # Process each channel
-        matched_lab = source_lab.copy()
+        # Per-channel statistics in one reduction per image
+        source_mean, source_std = masked_mean_std(source_lab, source_mask)
+        target_mean, target_std = masked_mean_std(target_lab, target_mask)
         
-        for i in range(3):
-            source_channel = source_lab[:, :, i]
-            target_channel = target_lab[:, :, i]
-            
-            # Calculate statistics for each channel
-            if source_mask is not None:
-                source_mean = np.mean(source_channel[source_mask > 0])
-                source_std = np.std(source_channel[source_mask > 0])
-            else:
-                source_mean = np.mean(source_channel)
-                source_std = np.std(source_channel)
-            
-            if target_mask is not None:
-                target_mean = np.mean(target_channel[target_mask > 0])
-                target_std = np.std(target_channel[target_mask > 0])
-            else:
-                target_mean = np.mean(target_channel)
-                target_std = np.std(target_channel)
-            
-            # Avoid division by zero
-            if source_std > 0:
-                # Match statistics
-                matched_channel = (source_channel - source_mean) * (target_std / source_std) + target_mean
-                matched_lab[:, :, i] = matched_channel
+        # Match statistics (channels with zero spread are left unchanged)
+        lut = _color_match_lut(source_mean, source_std, target_mean, target_std)
+        matched_lab = cv2.LUT(source_lab, lut)
         
         # Convert back to BGR
-        matched_lab = np.clip(matched_lab, 0, 255).astype(np.uint8)
         matched_bgr = cv2.cvtColor(matched_lab, cv2.COLOR_LAB2BGR)
         
         log.info("Color histogram matching complete")
@@ -117,24 +157,12 @@ def transfer_color_statistics(source: np.ndarray, target: np.ndarray) -> np.ndar
     """
     try:
         # Convert to LAB color space
-        source_lab = cv2.cvtColor(source, cv2.COLOR_BGR2LAB).astype(np.float32)
-        target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype(np.float32)
-        
-        # Calculate mean and standard deviation for each channel
-        source_mean = np.mean(source_lab, axis=(0, 1))
-        source_std = np.std(source_lab, axis=(0, 1))
-        target_mean = np.mean(target_lab, axis=(0, 1))
-        target_std = np.std(target_lab, axis=(0, 1))
+        source_lab = cv2.cvtColor(source, cv2.COLOR_BGR2LAB)
+        target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB)
         
-        # Transfer statistics
-        result = source_lab.copy()
-        for i in range(3):
-            if source_std[i] > 0:
-                result[:, :, i] = (source_lab[:, :, i] - source_mean[i]) * (target_std[i] / source_std[i]) + target_mean[i]
-        
-        # Convert back to BGR
-        result = np.clip(result, 0, 255).astype(np.uint8)
-        result_bgr = cv2.cvtColor(result, cv2.COLOR_LAB2BGR)
+        # Transfer mean and standard deviation of each channel
+        lut = _color_match_lut(*masked_mean_std(source_lab), *masked_mean_std(target_lab))
+        result_bgr = cv2.cvtColor(cv2.LUT(source_lab, lut), cv2.COLOR_LAB2BGR)
         
         log.info("Color statistics transfer complete")
         return result_bgr
@@ -147,44 +175,64 @@ def transfer_color_statistics(source: np.ndarray, target: np.ndarray) -> np.ndar
 def blend_edges(foreground: np.ndarray, 
                 background: np.ndarray, 
                 mask: np.ndarray,
-                feather_size: int = 5) -> np.ndarray:
+                feather_size: int = 5,
+                tile_size: int = 256) -> np.ndarray:
     """
     Blend edges between foreground and background using feathering.
     
+    Feathering and blending only run on tiles around the mask boundary;
+    fully opaque pixels take the foreground and fully transparent pixels the
+    background without any float work.
+    
     Args:
         foreground: Foreground image (BGR)
         background: Background image (BGR)
         mask: Foreground mask
         feather_size: Size of feathering kernel
+        tile_size: Tile edge length for boundary processing
         
     Returns:
         Blended composite image
     """
     try:
-        # Create feathered mask
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (feather_size, feather_size))
-        feathered_mask = cv2.morphologyEx(mask, cv2.MORPH_GRADIENT, kernel)
-        feathered_mask = cv2.GaussianBlur(feathered_mask, (feather_size, feather_size), 0)
-        
-        # Normalize mask to 0-1 range
-        mask_norm = mask.astype(np.float32) / 255.0
-        feather_norm = feathered_mask.astype(np.float32) / 255.0
         
-        # Combine masks
-        combined_mask = np.maximum(mask_norm, feather_norm * 0.5)
-        combined_mask = np.clip(combined_mask, 0, 1)
+        # Solid regions copy straight through
+        blended = background.copy()
+        np.copyto(blended, foreground, where=(mask == 255)[:, :, None])
         
-        # Expand mask to 3 channels
-        mask_3ch = np.stack([combined_mask] * 3, axis=2)
+        # Gradient and blur each reach feather_size // 2 pixels
+        reach = feather_size
+        tiles = boundary_tiles(mask, reach, tile_size, flat_values=(0, 255))
         
-        # Blend images
-        foreground_f = foreground.astype(np.float32)
-        background_f = background.astype(np.float32)
-        
-        blended = foreground_f * mask_3ch + background_f * (1 - mask_3ch)
-        blended = np.clip(blended, 0, 255).astype(np.uint8)
+        for tile in tiles:
+            y0, y1, x0, x1 = tile
+            py0, py1, px0, px1 = pad_tile(tile, reach, mask.shape)
+            
+            # Create feathered mask
+            feathered_mask = cv2.morphologyEx(mask[py0:py1, px0:px1], cv2.MORPH_GRADIENT, kernel)
+            feathered_mask = cv2.GaussianBlur(feathered_mask, (feather_size, feather_size), 0)
+            feathered_mask = feathered_mask[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+            
+            # Normalize mask to 0-1 range
+            mask_norm = mask[y0:y1, x0:x1].astype(np.float32) / 255.0
+            feather_norm = feathered_mask.astype(np.float32) / 255.0
+            
+            # Combine masks
+            combined_mask = np.maximum(mask_norm, feather_norm * 0.5)
+            combined_mask = np.clip(combined_mask, 0, 1)
+            
+            # Expand mask to 3 channels
+            mask_3ch = combined_mask[:, :, None]
+            
+            # Blend images
+            foreground_f = foreground[y0:y1, x0:x1].astype(np.float32)
+            background_f = background[y0:y1, x0:x1].astype(np.float32)
+            
+            tile_blend = foreground_f * mask_3ch + background_f * (1 - mask_3ch)
+            blended[y0:y1, x0:x1] = np.clip(tile_blend, 0, 255).astype(np.uint8)
         
-        log.info("Edge blending complete")
+        log.info(f"Edge blending complete ({len(tiles)} boundary tile(s))")
         return blended
         
     except Exception as e:
@@ -282,15 +330,14 @@ def adjust_lighting_consistency(composite: np.ndarray,
         log.info("Adjusting lighting consistency")
         
         # Convert to LAB for luminance adjustment
-        lab_image = cv2.cvtColor(composite, cv2.COLOR_BGR2LAB).astype(np.float32)
-        l_channel = lab_image[:, :, 0]
+        lab_image = cv2.cvtColor(composite, cv2.COLOR_BGR2LAB)
         
         # Calculate background and foreground brightness
         background_mask = cv2.bitwise_not(foreground_mask)
         
-        if np.any(background_mask > 0) and np.any(foreground_mask > 0):
-            bg_brightness = np.mean(l_channel[background_mask > 0])
-            fg_brightness = np.mean(l_channel[foreground_mask > 0])
+        if cv2.countNonZero(background_mask) and cv2.countNonZero(foreground_mask):
+            bg_brightness = masked_mean_std(lab_image, background_mask)[0][0]
+            fg_brightness = masked_mean_std(lab_image, foreground_mask)[0][0]
             
             # Calculate adjustment factor
             if target_brightness is None:
@@ -300,13 +347,13 @@ def adjust_lighting_consistency(composite: np.ndarray,
             
             # Apply adjustment to foreground areas
             adjustment_mask = foreground_mask.astype(np.float32) / 255.0
-            l_channel += brightness_diff * adjustment_mask
+            l_channel = lab_image[:, :, 0] + brightness_diff * adjustment_mask
             
-            # Clip values
-            lab_image[:, :, 0] = np.clip(l_channel, 0, 100)
+            # Clip values (8-bit LAB stores L scaled to 0-255)
+            lab_image[:, :, 0] = np.clip(l_channel, 0, 255)
             
             # Convert back to BGR
-            adjusted_bgr = cv2.cvtColor(lab_image.astype(np.uint8), cv2.COLOR_LAB2BGR)
+            adjusted_bgr = cv2.cvtColor(lab_image, cv2.COLOR_LAB2BGR)
             
             log.info(f"Lighting adjusted: brightness difference {brightness_diff:.2f}")
             return adjusted_bgr
@@ -316,4 +363,180 @@ def adjust_lighting_consistency(composite: np.ndarray,
         
     except Exception as e:
         log.error(f"Failed to adjust lighting consistency: {e}")
-        return composite
\ No newline at end of file
+        return composite
+
+
+# Rows per band for the fused compositor; ~2.5 MB of float32 scratch per
+# buffer at 4000px width
+DEFAULT_BAND_ROWS = 160
+
+
+def _band_slices(height: int, band_rows: int):
+    """Yield (start, stop) row ranges covering ``height``."""
+    for start in range(0, height, band_rows):
+        yield start, min(start + band_rows, height)
+
+
+def _accumulate_stats(acc: np.ndarray, lab: np.ndarray, select: np.ndarray) -> None:
+    """Add count, per-channel sum and sum of squares of selected LAB pixels to ``acc``."""
+    count = cv2.countNonZero(select)
+    if count == 0:
+        return
+    mean, std = masked_mean_std(lab, select)
+    acc[0] += count
+    acc[1:4] += mean * count
+    acc[4:7] += (std ** 2 + mean ** 2) * count
+
+
+def _stats_from_acc(acc: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn accumulated sums into per-channel mean and standard deviation."""
+    mean = acc[1:4] / acc[0]
+    var = np.maximum(acc[4:7] / acc[0] - mean ** 2, 0)
+    return mean, np.sqrt(var)
+
+
+def fused_composite(foreground: np.ndarray,
+                    background: np.ndarray,
+                    mask: np.ndarray,
+                    match_colors: bool = True,
+                    feather_edges: bool = True,
+                    feather_size: int = 5,
+                    adjust_lighting: bool = True,
+                    target_brightness: Optional[float] = None,
+                    band_rows: int = DEFAULT_BAND_ROWS,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Composite, colour match and relight in bounded memory.
+    
+    Produces the same result as ``create_seamless_composite`` followed by
+    ``adjust_lighting_consistency`` but works on row bands: colour matching is a
+    per-channel 8-bit LUT, the feathered alpha is built per band (with a halo
+    for the morphology), blending writes straight into ``out`` and the
+    luminance shift is applied band by band. Scratch memory is a handful of
+    band-sized buffers instead of several full-size float32 copies.
+    
+    Args:
+        foreground: Foreground image (BGR, uint8)
+        background: Background image (BGR, uint8), resized if shapes differ
+        mask: Foreground mask (uint8)
+        match_colors: Whether to match foreground colours to the background
+        feather_edges: Whether to feather edges for smooth blending
+        feather_size: Size of feathering kernel
+        adjust_lighting: Whether to shift foreground luminance towards the background
+        target_brightness: Target L value (background brightness if None)
+        band_rows: Rows processed per band
+        out: Optional preallocated output (same shape as foreground, uint8)
+        
+    Returns:
+        Composite image (``out`` if given)
+    """
+    try:
+        if foreground.dtype != np.uint8 or background.dtype != np.uint8:
+            raise ValueError("fused_composite expects uint8 BGR images")
+        
+        height, width = foreground.shape[:2]
+        if background.shape[:2] != (height, width):
+            background = cv2.resize(background, (width, height))
+        if out is None:
+            out = np.empty_like(foreground)
+        elif out.shape != foreground.shape or out.dtype != np.uint8:
+            raise ValueError(f"out must be uint8 with shape {foreground.shape}")
+        
+        # Band-sized scratch buffers, reused for every band
+        lab = np.empty((band_rows, width, 3), dtype=np.uint8)
+        matched = np.empty((band_rows, width, 3), dtype=np.uint8)
+        fg_select = np.empty((band_rows, width), dtype=np.uint8)
+        bg_select = np.empty((band_rows, width), dtype=np.uint8)
+        alpha = np.empty((band_rows, width), dtype=np.float32)
+        inv_alpha = np.empty((band_rows, width), dtype=np.float32)
+        
+        # Pass 1: colour statistics. The border mask used by
+        # create_seamless_composite reduces to every pixel outside the
+        # fully opaque foreground (mask < 255).
+        lut = None
+        if match_colors:
+            source_acc = np.zeros(7)
+            target_acc = np.zeros(7)
+            for y0, y1 in _band_slices(height, band_rows):
+                n = y1 - y0
+                band_mask = mask[y0:y1]
+                cv2.compare(band_mask, 0, cv2.CMP_GT, dst=fg_select[:n])
+                cv2.compare(band_mask, 255, cv2.CMP_LT, dst=bg_select[:n])
+                cv2.cvtColor(foreground[y0:y1], cv2.COLOR_BGR2LAB, dst=lab[:n])
+                _accumulate_stats(source_acc, lab[:n], fg_select[:n])
+                cv2.cvtColor(background[y0:y1], cv2.COLOR_BGR2LAB, dst=lab[:n])
+                _accumulate_stats(target_acc, lab[:n], bg_select[:n])
+            if source_acc[0] > 0 and target_acc[0] > 0:
+                lut = _color_match_lut(*_stats_from_acc(source_acc), *_stats_from_acc(target_acc))
+        
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (feather_size, feather_size))
+        halo = feather_size
+        
+        # Pass 2: matched foreground, feathered alpha and blend into ``out``,
+        # collecting composite luminance for the lighting correction
+        fg_l = [0.0, 0]
+        bg_l = [0.0, 0]
+        for y0, y1 in _band_slices(height, band_rows):
+            n = y1 - y0
+            band_mask = mask[y0:y1]
+            
+            band_fg = foreground[y0:y1]
+            if lut is not None:
+                cv2.cvtColor(band_fg, cv2.COLOR_BGR2LAB, dst=lab[:n])
+                cv2.LUT(lab[:n], lut, dst=lab[:n])
+                cv2.cvtColor(lab[:n], cv2.COLOR_LAB2BGR, dst=matched[:n])
+                band_fg = matched[:n]
+            
+            np.multiply(band_mask, np.float32(1 / 255), out=alpha[:n])
+            if feather_edges:
+                h0, h1 = max(y0 - halo, 0), min(y1 + halo, height)
+                feathered = cv2.morphologyEx(mask[h0:h1], cv2.MORPH_GRADIENT, kernel)
+                feathered = cv2.GaussianBlur(feathered, (feather_size, feather_size), 0)
+                np.multiply(feathered[y0 - h0:y0 - h0 + n], np.float32(0.5 / 255), out=inv_alpha[:n])
+                np.maximum(alpha[:n], inv_alpha[:n], out=alpha[:n])
+            np.subtract(np.float32(1), alpha[:n], out=inv_alpha[:n])
+            
+            cv2.blendLinear(band_fg, background[y0:y1], alpha[:n], inv_alpha[:n], dst=out[y0:y1])
+            
+            if adjust_lighting:
+                cv2.cvtColor(out[y0:y1], cv2.COLOR_BGR2LAB, dst=lab[:n])
+                l_channel = lab[:n, :, 0]
+                cv2.compare(band_mask, 0, cv2.CMP_GT, dst=fg_select[:n])
+                cv2.compare(band_mask, 255, cv2.CMP_LT, dst=bg_select[:n])
+                for select, acc in ((fg_select[:n], fg_l), (bg_select[:n], bg_l)):
+                    count = cv2.countNonZero(select)
+                    if count:
+                        acc[0] += cv2.mean(l_channel, mask=select)[0] * count
+                        acc[1] += count
+        
+        if not adjust_lighting:
+            log.info("Fused composite created")
+            return out
+        if fg_l[1] == 0 or bg_l[1] == 0:
+            log.warning("Could not calculate lighting adjustment - insufficient mask data")
+            return out
+        
+        fg_brightness = fg_l[0] / fg_l[1]
+        if target_brightness is None:
+            target_brightness = bg_l[0] / bg_l[1]
+        brightness_diff = target_brightness - fg_brightness
+        
+        # Pass 3: shift foreground luminance, only on bands that contain foreground
+        for y0, y1 in _band_slices(height, band_rows):
+            n = y1 - y0
+            band_mask = mask[y0:y1]
+            if cv2.countNonZero(band_mask) == 0:
+                continue
+            cv2.cvtColor(out[y0:y1], cv2.COLOR_BGR2LAB, dst=lab[:n])
+            np.multiply(band_mask, np.float32(brightness_diff / 255), out=alpha[:n])
+            np.add(alpha[:n], lab[:n, :, 0], out=alpha[:n])
+            np.clip(alpha[:n], 0, 255, out=alpha[:n])
+            lab[:n, :, 0] = alpha[:n]
+            cv2.cvtColor(lab[:n], cv2.COLOR_LAB2BGR, dst=out[y0:y1])
+        
+        log.info(f"Fused composite created: brightness difference {brightness_diff:.2f}")
+        return out
+        
+    except Exception as e:
+        log.error(f"Failed to create fused composite: {e}")
+        raise
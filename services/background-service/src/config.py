@@ -3,9 +3,10 @@
 import os
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseSettings, Field
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class BGEngine(str, Enum):
@@ -24,36 +25,72 @@ class Settings(BaseSettings):
     """Application settings."""
     
     # Service configuration
-    host: str = Field(default="0.0.0.0", env="HOST")
-    port: int = Field(default=8089, env="PORT")
+    host: str = Field(default="0.0.0.0")
+    port: int = Field(default=8089)
     
     # Background processing
-    bg_engine: BGEngine = Field(default=BGEngine.SDXL, env="BG_ENGINE")
-    model_id: str = Field(default="stabilityai/stable-diffusion-xl-base-1.0", env="MODEL_ID")
-    device: str = Field(default="cpu", env="DEVICE")
-    output_dir: Path = Field(default=Path("./media/backgrounds"), env="OUTPUT_DIR")
+    bg_engine: BGEngine = Field(default=BGEngine.SDXL)
+    model_id: str = Field(default="stabilityai/stable-diffusion-xl-base-1.0")
+    device: str = Field(default="cpu")
+    # Generation profile: quality, cpu_fast, lcm or turbo (see generate.PROFILES)
+    sdxl_profile: str = Field(default="quality")
+    output_dir: Path = Field(default=Path("./media/backgrounds"))
+    log_dir: Path = Field(default=Path("./logs"))
     
     # API keys
-    runway_api_key: Optional[str] = Field(default=None, env="RUNWAY_API_KEY")
-    runway_base_url: str = Field(default="https://api.runwayml.com", env="RUNWAY_BASE_URL")
+    runway_api_key: Optional[str] = Field(default=None)
+    runway_base_url: str = Field(default="https://api.runwayml.com")
     
     # Generation parameters
-    default_steps: int = Field(default=20, env="DEFAULT_STEPS")
-    default_guidance_scale: float = Field(default=7.5, env="DEFAULT_GUIDANCE_SCALE")
-    default_width: int = Field(default=1024, env="DEFAULT_WIDTH")
-    default_height: int = Field(default=1024, env="DEFAULT_HEIGHT")
+    default_steps: int = Field(default=20)
+    default_guidance_scale: float = Field(default=7.5)
+    default_width: int = Field(default=1024)
+    default_height: int = Field(default=1024)
+    sdxl_max_batch: int = Field(default=4)
+    # How long a queued request waits for others to share its pipeline call (0 disables)
+    sdxl_batch_delay_ms: int = Field(default=100)
+    max_variants: int = Field(default=8)
     
     # Processing parameters
-    default_blur_radius: int = Field(default=8, env="DEFAULT_BLUR_RADIUS")
-    default_desaturate_pct: int = Field(default=25, env="DEFAULT_DESATURATE_PCT")
+    default_blur_radius: int = Field(default=8)
+    default_desaturate_pct: int = Field(default=25)
+    
+    # Segmentation runs with the long side capped here, then the mask is
+    # upsampled guided by the full-resolution image (0 disables downscaling)
+    mask_inference_size: int = Field(default=1024)
+    
+    # Refined-mask cache (memory LRU + compressed PNGs on disk)
+    mask_cache_dir: Path = Field(default=Path("./media/mask_cache"))
+    mask_cache_memory_mb: int = Field(default=256)
+    mask_cache_disk_mb: int = Field(default=1024)
+    
+    # Pre-rendered backgrounds served instead of generating (see src/library.py)
+    bg_library_dir: Path = Field(default=Path("./media/bg_library"))
+    
+    # Upload limits (uploads above the spool size are buffered on disk)
+    max_upload_mb: int = Field(default=50)
+    upload_spool_mb: int = Field(default=4)
+    
+    # Shared-filesystem path handoff (comma-separated roots the JSON endpoints may read)
+    shared_roots: str = Field(default="")
+    
+    # Model lifecycle: resident models are unloaded LRU-first beyond the budget
+    # and after the idle timeout (0 keeps them loaded); warm-up is a comma list
+    # of model names (e.g. "rembg:u2net,sdxl") loaded in the background at startup
+    model_memory_budget_mb: int = Field(default=16384)
+    model_idle_timeout_s: int = Field(default=900)
+    model_warmup: str = Field(default="")
     
     # Runway polling
-    runway_max_poll_attempts: int = Field(default=60, env="RUNWAY_MAX_POLL_ATTEMPTS")
-    runway_poll_interval: int = Field(default=5, env="RUNWAY_POLL_INTERVAL")
+    runway_max_poll_attempts: int = Field(default=60)
+    runway_poll_interval: int = Field(default=5)
+    
+    @property
+    def shared_root_paths(self) -> List[Path]:
+        """Resolved allowlist for path handoff requests."""
+        return [Path(root).expanduser().resolve() for root in self.shared_roots.split(",") if root.strip()]
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, protected_namespaces=("settings_",))
 
 
 # Global settings instance
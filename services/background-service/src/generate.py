@@ -4,20 +4,85 @@ import torch
 import numpy as np
 import cv2
 from PIL import Image
-from typing import Optional, Tuple
-from diffusers import StableDiffusionXLPipeline, DPMSolverMultistepScheduler
+from typing import Dict, List, Optional, Tuple, Union
+from diffusers import (
+    StableDiffusionXLPipeline, DPMSolverMultistepScheduler, EulerAncestralDiscreteScheduler, LCMScheduler
+)
 import gc
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 
 from .logger import log
 from .config import settings
+from .model_manager import model_manager
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Speed/quality trade-offs applied when loading and running the pipeline."""
+    name: str
+    # "dpm", "lcm" (LCM-distilled checkpoints/LoRAs) or "euler_a" (SDXL Turbo)
+    scheduler: str = "dpm"
+    # Fraction of the requested size actually rendered; the result is upscaled back
+    render_scale: float = 1.0
+    # Caps the requested step count (distilled models need only a few)
+    max_steps: Optional[int] = None
+    # Replaces the requested guidance scale (Turbo is trained without CFG)
+    guidance_scale: Optional[float] = None
+    attention_slicing: bool = False
+    channels_last: bool = False
+    compile_unet: bool = False
+    
+    def render_size(self, width: int, height: int) -> Tuple[int, int]:
+        """Size to render at: scaled, rounded to the UNet's multiple of 64, at least 512."""
+        def scale(value: int) -> int:
+            return max(512, int(round(value * self.render_scale / 64)) * 64)
+        
+        if self.render_scale >= 1.0:
+            return width, height
+        return min(width, scale(width)), min(height, scale(height))
+    
+    def sampling(self, steps: int, guidance_scale: float) -> Tuple[int, float]:
+        """Effective (steps, guidance scale) for a request."""
+        if self.max_steps is not None:
+            steps = min(steps, self.max_steps)
+        if self.guidance_scale is not None:
+            guidance_scale = self.guidance_scale
+        return steps, guidance_scale
+
+
+# Selected with SDXL_PROFILE. "lcm" and "turbo" expect a matching MODEL_ID,
+# e.g. latent-consistency/lcm-sdxl or stabilityai/sdxl-turbo.
+PROFILES: Dict[str, GenerationProfile] = {
+    profile.name: profile for profile in (
+        GenerationProfile("quality"),
+        GenerationProfile("cpu_fast", render_scale=0.5, max_steps=12,
+                          attention_slicing=True, channels_last=True, compile_unet=True),
+        GenerationProfile("lcm", scheduler="lcm", render_scale=0.75, max_steps=6, guidance_scale=1.0,
+                          attention_slicing=True, channels_last=True, compile_unet=True),
+        GenerationProfile("turbo", scheduler="euler_a", render_scale=0.5, max_steps=4, guidance_scale=0.0,
+                          attention_slicing=True, channels_last=True, compile_unet=True),
+    )
+}
+
+
+def get_profile(name: str) -> GenerationProfile:
+    """Look up a generation profile by name."""
+    try:
+        return PROFILES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown SDXL profile '{name}', expected one of {sorted(PROFILES)}")
 
 
 class SDXLGenerator:
     """SDXL-based background generator with in-memory cache."""
-    def __init__(self):
+    def __init__(self, profile: Optional[str] = None):
         self.pipeline = None
         self.device = settings.device
         self.model_id = settings.model_id
+        self.profile = get_profile(profile or settings.sdxl_profile)
         self._load_pipeline()
         # (prompt, negative_prompt, width, height, steps, guidance_scale, seed) -> np.ndarray
         self._cache = {}
@@ -25,7 +90,7 @@ class SDXLGenerator:
     def _load_pipeline(self):
         """Load the SDXL pipeline with optimizations."""
         try:
-            log.info(f"Loading SDXL pipeline: {self.model_id}")
+            log.info(f"Loading SDXL pipeline: {self.model_id} (profile: {self.profile.name})")
             
             # Configure torch for low VRAM
             if self.device == "cuda" and torch.cuda.is_available():
@@ -53,9 +118,18 @@ class SDXLGenerator:
                 self.pipeline.enable_attention_slicing(1)
             
             # Use faster scheduler
-            self.pipeline.scheduler = DPMSolverMultistepScheduler.from_config(
-                self.pipeline.scheduler.config
-            )
+            scheduler_config = self.pipeline.scheduler.config
+            if self.profile.scheduler == "lcm":
+                self.pipeline.scheduler = LCMScheduler.from_config(scheduler_config)
+            elif self.profile.scheduler == "euler_a":
+                self.pipeline.scheduler = EulerAncestralDiscreteScheduler.from_config(
+                    scheduler_config, timestep_spacing="trailing"
+                )
+            else:
+                self.pipeline.scheduler = DPMSolverMultistepScheduler.from_config(scheduler_config)
+            
+            if self.device == "cpu":
+                self._apply_cpu_optimizations()
             
             log.info("SDXL pipeline loaded successfully")
             
@@ -64,6 +138,24 @@ class SDXLGenerator:
             self.pipeline = None
             raise
     
+    def _apply_cpu_optimizations(self):
+        """Apply the profile's CPU speedups to the loaded pipeline."""
+        if self.profile.attention_slicing:
+            self.pipeline.enable_attention_slicing()
+        
+        if self.profile.channels_last:
+            # oneDNN convolutions are faster on NHWC tensors
+            self.pipeline.unet.to(memory_format=torch.channels_last)
+            self.pipeline.vae.to(memory_format=torch.channels_last)
+        
+        if self.profile.compile_unet:
+            if hasattr(torch, "compile"):
+                # Compilation happens on the first call, which is correspondingly slower
+                self.pipeline.unet = torch.compile(self.pipeline.unet)
+                log.info("UNet wrapped with torch.compile")
+            else:
+                log.warning("torch.compile is not available, running the UNet eagerly")
+    
     def is_available(self) -> bool:
         """Check if the generator is available."""
         return self.pipeline is not None
@@ -91,41 +183,100 @@ class SDXLGenerator:
         Returns:
             Generated image as numpy array (BGR)
         """
+        return self.generate_backgrounds(
+            [prompt], negative_prompt, width, height, steps, guidance_scale, [seed]
+        )[0]
+    
+    def generate_backgrounds(self,
+                             prompts: List[str],
+                             negative_prompt: Union[str, List[str]] = "people, text, watermark",
+                             width: int = 1024,
+                             height: int = 1024,
+                             steps: int = 20,
+                             guidance_scale: float = 7.5,
+                             seeds: Optional[List[Optional[int]]] = None,
+                             max_batch: Optional[int] = None) -> List[np.ndarray]:
+        """
+        Generate several backgrounds, batching uncached prompts into shared pipeline calls.
+        
+        Each denoising step then reads the UNet weights once for the whole
+        batch instead of once per prompt.
+        
+        Args:
+            prompts: Generation prompts
+            negative_prompt: Negative prompt for every prompt, or one per prompt
+            width: Output width
+            height: Output height
+            steps: Number of inference steps
+            guidance_scale: Guidance scale
+            seeds: Per-prompt random seeds (None entries are random)
+            max_batch: Largest batch per pipeline call (``SDXL_MAX_BATCH`` if None)
+            
+        Returns:
+            Generated images as numpy arrays (BGR), in prompt order
+        """
         if not self.is_available():
             raise RuntimeError("SDXL pipeline not available")
         
+        seeds = list(seeds) if seeds is not None else [None] * len(prompts)
+        negatives = [negative_prompt] * len(prompts) if isinstance(negative_prompt, str) else list(negative_prompt)
+        if len(seeds) != len(prompts) or len(negatives) != len(prompts):
+            raise ValueError("seeds and negative prompts must have one entry per prompt")
+        max_batch = max_batch or settings.sdxl_max_batch
+        render_width, render_height = self.profile.render_size(width, height)
+        render_steps, render_guidance = self.profile.sampling(steps, guidance_scale)
+        
         try:
-            cache_key = (prompt, negative_prompt, width, height, steps, guidance_scale, seed)
-            if cache_key in self._cache:
-                log.info(f"Cache hit for background: {cache_key}")
-                return self._cache[cache_key]
-            log.info(f"Generating background: '{prompt}' ({width}x{height}, steps={steps})")
-            # Set seed if provided
-            generator = None
-            if seed is not None:
-                generator = torch.Generator(device=self.device).manual_seed(seed)
-            # Generate image
-            with torch.inference_mode():
-                result = self.pipeline(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    width=width,
-                    height=height,
-                    num_inference_steps=steps,
-                    guidance_scale=guidance_scale,
-                    generator=generator
-                )
-            # Convert to BGR numpy array
-            generated_image = result.images[0]
-            bgr_image = cv2.cvtColor(np.array(generated_image), cv2.COLOR_RGB2BGR)
-            # Store in cache
-            self._cache[cache_key] = bgr_image
-            # Clear GPU memory
-            if self.device == "cuda":
-                torch.cuda.empty_cache()
-                gc.collect()
+            results: List[Optional[np.ndarray]] = [None] * len(prompts)
+            pending = []
+            for i, (prompt, negative, seed) in enumerate(zip(prompts, negatives, seeds)):
+                cache_key = (prompt, negative, width, height, steps, guidance_scale, seed)
+                if cache_key in self._cache:
+                    log.info(f"Cache hit for background: {cache_key}")
+                    results[i] = self._cache[cache_key]
+                else:
+                    pending.append(i)
+            
+            for start in range(0, len(pending), max_batch):
+                batch = pending[start:start + max_batch]
+                log.info(f"Generating {len(batch)} background(s) ({render_width}x{render_height}, "
+                         f"steps={render_steps}, profile={self.profile.name}): "
+                         f"{[prompts[i] for i in batch]}")
+                # One generator per item keeps every image reproducible from its own seed
+                generators = []
+                for i in batch:
+                    generator = torch.Generator(device=self.device)
+                    if seeds[i] is not None:
+                        generator.manual_seed(seeds[i])
+                    else:
+                        generator.seed()
+                    generators.append(generator)
+                # Generate images
+                with torch.inference_mode():
+                    result = self.pipeline(
+                        prompt=[prompts[i] for i in batch],
+                        negative_prompt=[negatives[i] for i in batch],
+                        width=render_width,
+                        height=render_height,
+                        num_inference_steps=render_steps,
+                        guidance_scale=render_guidance,
+                        generator=generators
+                    )
+                for i, generated_image in zip(batch, result.images):
+                    # Convert to BGR numpy array
+                    bgr_image = cv2.cvtColor(np.array(generated_image), cv2.COLOR_RGB2BGR)
+                    if (render_width, render_height) != (width, height):
+                        bgr_image = cv2.resize(bgr_image, (width, height), interpolation=cv2.INTER_CUBIC)
+                    # Store in cache
+                    self._cache[(prompts[i], negatives[i], width, height, steps, guidance_scale, seeds[i])] = bgr_image
+                    results[i] = bgr_image
+                # Clear GPU memory
+                if self.device == "cuda":
+                    torch.cuda.empty_cache()
+                    gc.collect()
+            
             log.info("Background generation complete")
-            return bgr_image
+            return results
         except Exception as e:
             log.error(f"Failed to generate background: {e}")
             # Clear GPU memory on error
@@ -147,18 +298,203 @@ class SDXLGenerator:
         log.info("SDXL generator cleaned up")
 
 
-# Global generator instance
-_sdxl_generator = None
+# Rough resident size of the SDXL base pipeline: ~3.5B parameters in fp16 on
+# GPU (weights are offloaded to host RAM) or fp32 on CPU
+_SDXL_MEMORY_MB = 7500 if settings.device == "cuda" else 14000
 
+model_manager.register("sdxl", SDXLGenerator, size_mb=_SDXL_MEMORY_MB, unloader=SDXLGenerator.cleanup)
 
-def get_sdxl_generator() -> SDXLGenerator:
-    """Get or create the global SDXL generator instance."""
-    global _sdxl_generator
+
+class _ManagedSDXL:
+    """Generator facade that pins the managed SDXL pipeline for each call."""
     
-    if _sdxl_generator is None:
-        _sdxl_generator = SDXLGenerator()
+    def is_available(self) -> bool:
+        with model_manager.use("sdxl") as generator:
+            return generator.is_available()
     
-    return _sdxl_generator
+    def generate_background(self, *args, **kwargs) -> np.ndarray:
+        with model_manager.use("sdxl") as generator:
+            return generator.generate_background(*args, **kwargs)
+    
+    def generate_backgrounds(self, *args, **kwargs) -> List[np.ndarray]:
+        with model_manager.use("sdxl") as generator:
+            return generator.generate_backgrounds(*args, **kwargs)
+
+
+def get_sdxl_generator() -> _ManagedSDXL:
+    """Get the managed SDXL generator; each call loads it if needed and pins it while it runs."""
+    return _ManagedSDXL()
+
+
+@dataclass
+class _GenerationRequest:
+    """One queued prompt waiting for a batched pipeline call."""
+    prompt: str
+    negative_prompt: str
+    seed: Optional[int]
+    # Requests only share a pipeline call when these match
+    key: Tuple[int, int, int, float]
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class GenerationCoalescer:
+    """
+    Merge concurrent SDXL requests into batched pipeline calls.
+    
+    Callers block in :meth:`generate` while a single worker thread drains the
+    queue. Requests with the same size, steps and guidance scale are grouped
+    into one call (each with its own seeded generator); a group is flushed as
+    soon as it reaches ``max_batch`` or its oldest request has waited
+    ``max_delay`` seconds. This also makes the worker the only thread that
+    touches the pipeline.
+    """
+    
+    def __init__(self, generator: SDXLGenerator, max_batch: int, max_delay: float):
+        self.generator = generator
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._pending: List[_GenerationRequest] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        # Batch-size histogram for /health
+        self.batches: Dict[int, int] = {}
+        
+        self._worker = threading.Thread(target=self._run, name="sdxl-coalescer", daemon=True)
+        self._worker.start()
+    
+    def generate(self,
+                 prompts: List[str],
+                 negative_prompt: str,
+                 width: int,
+                 height: int,
+                 steps: int,
+                 guidance_scale: float,
+                 seeds: Optional[List[Optional[int]]] = None) -> List[np.ndarray]:
+        """
+        Queue prompts for generation and wait for their images.
+        
+        Args:
+            prompts: Generation prompts
+            negative_prompt: Negative prompt
+            width: Output width
+            height: Output height
+            steps: Number of inference steps
+            guidance_scale: Guidance scale
+            seeds: Per-prompt random seeds
+            
+        Returns:
+            Generated images as numpy arrays (BGR), in prompt order
+        """
+        seeds = list(seeds) if seeds is not None else [None] * len(prompts)
+        key = (width, height, steps, float(guidance_scale))
+        requests = [_GenerationRequest(p, negative_prompt, s, key) for p, s in zip(prompts, seeds)]
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("SDXL coalescer is shut down")
+            self._pending.extend(requests)
+            self._cond.notify_all()
+        return [request.future.result() for request in requests]
+    
+    def _next_batch(self) -> Optional[List[_GenerationRequest]]:
+        """Wait for a full or expired group and take it off the queue."""
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return None
+            
+            head = self._pending[0]
+            deadline = head.enqueued_at + self.max_delay
+            while True:
+                group = [r for r in self._pending if r.key == head.key]
+                remaining = deadline - time.monotonic()
+                if len(group) >= self.max_batch or remaining <= 0 or self._stopped:
+                    break
+                self._cond.wait(remaining)
+            
+            # shutdown() may have run during the wait and already failed the queue
+            if self._stopped or not group:
+                return None
+            batch = group[:self.max_batch]
+            taken = set(map(id, batch))
+            self._pending = [r for r in self._pending if id(r) not in taken]
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            width, height, steps, guidance_scale = batch[0].key
+            self.batches[len(batch)] = self.batches.get(len(batch), 0) + 1
+            log.info(f"Coalesced {len(batch)} SDXL request(s) into one pipeline call")
+            try:
+                images = self.generator.generate_backgrounds(
+                    prompts=[r.prompt for r in batch],
+                    negative_prompt=[r.negative_prompt for r in batch],
+                    width=width,
+                    height=height,
+                    steps=steps,
+                    guidance_scale=guidance_scale,
+                    seeds=[r.seed for r in batch],
+                    max_batch=len(batch)
+                )
+                for request, image in zip(batch, images):
+                    request.future.set_result(image)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+    
+    def shutdown(self):
+        """Stop the worker and fail any requests still queued."""
+        with self._cond:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for request in pending:
+            request.future.set_exception(RuntimeError("SDXL coalescer is shut down"))
+        self._worker.join(timeout=5)
+    
+    def stats(self) -> Dict[str, object]:
+        """Queue depth and batch-size histogram."""
+        with self._cond:
+            return {"pending": len(self._pending), "batches": dict(self.batches)}
+
+
+# Global coalescer instance
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> GenerationCoalescer:
+    """Get or create the global SDXL request coalescer."""
+    global _coalescer
+    
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = GenerationCoalescer(
+                _ManagedSDXL(),
+                max_batch=settings.sdxl_max_batch,
+                max_delay=settings.sdxl_batch_delay_ms / 1000
+            )
+        return _coalescer
+
+
+def coalescer_stats() -> Optional[Dict[str, object]]:
+    """Stats of the global coalescer, or None if no request has started it."""
+    with _coalescer_lock:
+        return _coalescer.stats() if _coalescer is not None else None
+
+
+def shutdown_coalescer():
+    """Stop the global coalescer if it was started."""
+    global _coalescer
+    
+    with _coalescer_lock:
+        if _coalescer is not None:
+            _coalescer.shutdown()
+            _coalescer = None
 
 
 def generate_background_sdxl(prompt: str,
@@ -183,16 +519,54 @@ def generate_background_sdxl(prompt: str,
     Returns:
         Generated image as numpy array (BGR)
     """
-    generator = get_sdxl_generator()
-    return generator.generate_background(
-        prompt=prompt,
-        negative_prompt=negative_prompt,
-        width=width,
-        height=height,
-        steps=steps,
-        guidance_scale=guidance_scale,
-        seed=seed
-    )
+    with model_manager.use("sdxl") as generator:
+        return generator.generate_background(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            width=width,
+            height=height,
+            steps=steps,
+            guidance_scale=guidance_scale,
+            seed=seed
+        )
+
+
+def generate_backgrounds_sdxl(prompts: List[str],
+                              negative_prompt: str = "people, text, watermark",
+                              width: int = 1024,
+                              height: int = 1024,
+                              steps: int = 20,
+                              guidance_scale: float = 7.5,
+                              seeds: Optional[List[Optional[int]]] = None) -> List[np.ndarray]:
+    """
+    Convenience function to generate several backgrounds in SDXL batches.
+    
+    Args:
+        prompts: Generation prompts
+        negative_prompt: Negative prompt
+        width: Output width
+        height: Output height
+        steps: Number of inference steps
+        guidance_scale: Guidance scale
+        seeds: Per-prompt random seeds
+        
+    Returns:
+        Generated images as numpy arrays (BGR), in prompt order
+    """
+    if settings.sdxl_batch_delay_ms > 0:
+        # Share pipeline calls with concurrent requests
+        return get_coalescer().generate(prompts, negative_prompt, width, height, steps, guidance_scale, seeds)
+    
+    with model_manager.use("sdxl") as generator:
+        return generator.generate_backgrounds(
+            prompts=prompts,
+            negative_prompt=negative_prompt,
+            width=width,
+            height=height,
+            steps=steps,
+            guidance_scale=guidance_scale,
+            seeds=seeds
+        )
 
 
 def resize_background_to_match(background: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarray:
@@ -1,8 +1,11 @@
 """I/O utilities for image loading, saving, and validation."""
 
 import hashlib
+import mmap
+import struct
+import time
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional, Union
 import numpy as np
 from PIL import Image, ImageOps
 import cv2
@@ -10,6 +13,12 @@ import cv2
 from .logger import log
 
 
+# Uncompressed transport for co-located clients: magic, height, width, channels, then RGB bytes
+RAW_MAGIC = b"VRAW"
+RAW_HEADER = struct.Struct("<4sIIB")
+RAW_CONTENT_TYPE = "application/x-vitrine-raw"
+
+
 def load_image(image_path: str) -> Tuple[np.ndarray, Image.Image]:
     """
     Load an image from path and return both OpenCV and PIL formats.
@@ -46,6 +55,146 @@ def load_image(image_path: str) -> Tuple[np.ndarray, Image.Image]:
         raise
 
 
+def decode_image(data: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+    """
+    Decode an uploaded image buffer into a BGR array.
+    
+    Accepts any format OpenCV can decode (EXIF orientation is applied) as well as
+    the raw RGB transport (``RAW_MAGIC`` header followed by pixel data), which is
+    wrapped without a decode step.
+    
+    Args:
+        data: Encoded image bytes
+        
+    Returns:
+        BGR image array
+    """
+    buffer = memoryview(data)
+    if buffer.nbytes >= RAW_HEADER.size and bytes(buffer[:4]) == RAW_MAGIC:
+        _, height, width, channels = RAW_HEADER.unpack_from(buffer)
+        expected = height * width * channels
+        if channels != 3 or buffer.nbytes - RAW_HEADER.size != expected:
+            raise ValueError(f"Malformed raw image payload ({width}x{height}x{channels})")
+        rgb = np.frombuffer(buffer, dtype=np.uint8, count=expected, offset=RAW_HEADER.size)
+        return cv2.cvtColor(rgb.reshape(height, width, channels), cv2.COLOR_RGB2BGR)
+    
+    image = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image data")
+    return image
+
+
+def resolve_shared_path(path: Union[str, Path], roots: List[Path]) -> Path:
+    """
+    Resolve a client-supplied path and ensure it lies inside an allowlisted root.
+    
+    Symlinks and ``..`` segments are resolved before the check.
+    
+    Args:
+        path: Path as seen by the service
+        roots: Allowed root directories (already resolved)
+        
+    Returns:
+        Resolved path
+        
+    Raises:
+        PermissionError: If no roots are configured or the path is outside them
+    """
+    resolved = Path(path).expanduser().resolve()
+    if not roots:
+        raise PermissionError("Path handoff is disabled (SHARED_ROOTS is not set)")
+    if not any(resolved == root or root in resolved.parents for root in roots):
+        raise PermissionError(f"Path is outside the shared roots: {path}")
+    return resolved
+
+
+def read_image(path: Union[str, Path]) -> np.ndarray:
+    """
+    Decode an image straight from disk into a BGR array.
+    
+    Args:
+        path: Image file path
+        
+    Returns:
+        BGR image array
+    """
+    image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image: {path}")
+    return image
+
+
+def content_digest(data: Union[bytes, bytearray, memoryview]) -> str:
+    """
+    Hash encoded image bytes for content-addressed caching.
+    
+    Args:
+        data: Encoded image buffer
+        
+    Returns:
+        SHA-256 hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_image_with_digest(path: Union[str, Path]) -> Tuple[np.ndarray, str]:
+    """
+    Decode an image from disk and hash its bytes, reading the file once.
+    
+    Args:
+        path: Image file path
+        
+    Returns:
+        Tuple of (BGR image array, content digest)
+    """
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f"Could not read image: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return decode_image(view), content_digest(view)
+            finally:
+                view.release()
+
+
+def save_image(image: np.ndarray, output_path: Union[str, Path], mask: Optional[np.ndarray] = None) -> str:
+    """
+    Save image, choosing PNG or JPEG from the output path suffix.
+    
+    Args:
+        image: BGR image array
+        output_path: Output file path
+        mask: Optional alpha mask (PNG only)
+        
+    Returns:
+        Path to saved file
+    """
+    if Path(output_path).suffix.lower() == ".png":
+        return save_image_png(image, str(output_path), mask)
+    return save_image_jpg(image, str(output_path))
+
+
+def generate_output_path(output_dir: Union[str, Path], filename: Optional[str], suffix: str, ext: str = ".jpg") -> Path:
+    """
+    Generate a unique output path for an uploaded file.
+    
+    Args:
+        output_dir: Output directory
+        filename: Original upload filename (may be None)
+        suffix: Operation suffix, e.g. 'cleaned' or 'replaced'
+        ext: Output file extension
+        
+    Returns:
+        Output path inside ``output_dir``
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(filename).stem if filename else "image"
+    token = hashlib.md5(f"{stem}{time.time_ns()}".encode()).hexdigest()[:8]
+    return output_dir / f"{stem}_{suffix}_{token}{ext}"
+
+
 def save_image_png(image: np.ndarray, output_path: str, mask: Optional[np.ndarray] = None) -> str:
     """
     Save image as PNG, optionally with alpha channel from mask.
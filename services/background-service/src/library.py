@@ -0,0 +1,369 @@
+"""
+Pre-generated background library.
+
+Brand replacements mostly reuse a handful of fixed prompts, so backgrounds for
+those prompts are rendered offline (several seeds and aspect ratios each) and
+stored with their colour statistics. At request time the best-fitting stored
+background is cropped to the input's aspect ratio instead of running diffusion.
+
+Build or extend the library with:
+
+    python -m src.library --presets ../background/presets.yaml library_presets.yaml --seeds 4
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+import yaml
+
+from .composite import masked_mean_std
+from .logger import log
+
+# Score weight of a 2x aspect-ratio mismatch relative to the full LAB range
+ASPECT_WEIGHT = 2.0
+
+# SDXL's native buckets for square, landscape and portrait renders
+DEFAULT_SIZES = ((1024, 1024), (1152, 896), (896, 1152))
+
+
+@dataclass
+class LibraryEntry:
+    """One stored background and the statistics used to pick it."""
+    id: str
+    preset: str
+    prompt: str
+    negative_prompt: str
+    seed: int
+    width: int
+    height: int
+    lab_mean: Tuple[float, float, float]
+    lab_std: Tuple[float, float, float]
+    file: str
+
+    @property
+    def aspect(self) -> float:
+        return self.width / self.height
+
+
+def fit_to_shape(background: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Centre-crop a background to the target aspect ratio, then resize it.
+
+    Args:
+        background: Background image (BGR)
+        target_shape: Target (height, width)
+
+    Returns:
+        Background of exactly ``target_shape``
+    """
+    target_height, target_width = target_shape
+    height, width = background.shape[:2]
+    target_aspect = target_width / target_height
+
+    if width / height > target_aspect:
+        crop_width = max(1, round(height * target_aspect))
+        x0 = (width - crop_width) // 2
+        background = background[:, x0:x0 + crop_width]
+    else:
+        crop_height = max(1, round(width / target_aspect))
+        y0 = (height - crop_height) // 2
+        background = background[y0:y0 + crop_height]
+
+    interpolation = cv2.INTER_AREA if background.shape[1] > target_width else cv2.INTER_CUBIC
+    return cv2.resize(background, (target_width, target_height), interpolation=interpolation)
+
+
+def lab_statistics(image: np.ndarray, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """LAB (uint8 scale) per-channel mean and std of an image, optionally inside a mask."""
+    return masked_mean_std(cv2.cvtColor(image, cv2.COLOR_BGR2LAB), mask)
+
+
+class BackgroundLibrary:
+    """
+    On-disk store of pre-rendered backgrounds with an in-memory index.
+
+    Images are JPEGs next to an ``index.json`` listing their prompt, seed,
+    size and LAB statistics. The index is reloaded when another process (the
+    offline build job) rewrites it.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.root / "index.json"
+        self._entries: List[LibraryEntry] = []
+        self._by_prompt: Dict[Tuple[str, str], List[LibraryEntry]] = {}
+        self._index_mtime = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self._reload_if_changed()
+
+    @staticmethod
+    def _prompt_key(prompt: str, negative_prompt: str) -> Tuple[str, str]:
+        return prompt.strip(), (negative_prompt or "").strip()
+
+    def _reload_if_changed(self) -> None:
+        """Re-read the index if it changed on disk. Caller may hold the lock."""
+        try:
+            mtime = self._index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+
+        data = json.loads(self._index_path.read_text())
+        self._set_entries([
+            LibraryEntry(**{**e, "lab_mean": tuple(e["lab_mean"]), "lab_std": tuple(e["lab_std"])})
+            for e in data.get("entries", [])
+        ])
+        self._index_mtime = mtime
+        log.info(f"Loaded background library index: {len(self._entries)} background(s)")
+
+    def _set_entries(self, entries: List[LibraryEntry]) -> None:
+        """Replace the entry list and rebuild the prompt index."""
+        by_prompt: Dict[Tuple[str, str], List[LibraryEntry]] = {}
+        for entry in entries:
+            by_prompt.setdefault(self._prompt_key(entry.prompt, entry.negative_prompt), []).append(entry)
+        self._entries, self._by_prompt = entries, by_prompt
+
+    def _write_index(self) -> None:
+        """Atomically rewrite the index. Caller holds the lock."""
+        tmp_path = self._index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"entries": [asdict(e) for e in self._entries]}, indent=1))
+        os.replace(tmp_path, self._index_path)
+        self._index_mtime = self._index_path.stat().st_mtime_ns
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._reload_if_changed()
+            return len(self._entries)
+
+    def contains(self, prompt: str, negative_prompt: str, seed: int, width: int, height: int) -> bool:
+        """Check whether a render is already stored (used to resume builds)."""
+        candidates = self._by_prompt.get(self._prompt_key(prompt, negative_prompt), [])
+        return any(e.seed == seed and (e.width, e.height) == (width, height) for e in candidates)
+
+    def add(self,
+            image: np.ndarray,
+            prompt: str,
+            negative_prompt: str,
+            seed: int,
+            preset: str = "") -> LibraryEntry:
+        """
+        Store a rendered background.
+
+        Args:
+            image: Background (BGR)
+            prompt: Prompt it was rendered from
+            negative_prompt: Negative prompt it was rendered with
+            seed: Generation seed
+            preset: Preset name, for reporting
+
+        Returns:
+            The new index entry
+        """
+        height, width = image.shape[:2]
+        prompt, negative_prompt = self._prompt_key(prompt, negative_prompt)
+        mean, std = lab_statistics(image)
+        prompt_hash = hashlib.sha256(f"{prompt}|{negative_prompt}".encode()).hexdigest()[:12]
+        entry_id = f"{prompt_hash}_{seed}_{width}x{height}"
+        entry = LibraryEntry(
+            id=entry_id,
+            preset=preset,
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            seed=seed,
+            width=width,
+            height=height,
+            lab_mean=tuple(round(float(v), 2) for v in mean),
+            lab_std=tuple(round(float(v), 2) for v in std),
+            file=f"{entry_id}.jpg"
+        )
+        if not cv2.imwrite(str(self.root / entry.file), image, [cv2.IMWRITE_JPEG_QUALITY, 95]):
+            raise ValueError(f"Could not write library background {entry.file}")
+
+        with self._lock:
+            self._reload_if_changed()
+            self._set_entries([e for e in self._entries if e.id != entry.id] + [entry])
+            self._write_index()
+        return entry
+
+    def best_match(self,
+                   prompt: str,
+                   negative_prompt: str,
+                   target_shape: Tuple[int, int],
+                   foreground_mean: Optional[Sequence[float]] = None,
+                   exclude_seeds: Sequence[int] = ()) -> Optional[LibraryEntry]:
+        """
+        Pick the stored background that best fits a request.
+
+        Candidates must have the same prompt and negative prompt. They are
+        ranked by aspect-ratio mismatch, which decides how much is cropped
+        away, plus the LAB distance from the foreground's mean colour, which
+        decides how far colour matching has to pull the foreground.
+
+        Args:
+            prompt: Requested prompt
+            negative_prompt: Requested negative prompt
+            target_shape: Input image (height, width)
+            foreground_mean: Foreground LAB mean from :func:`lab_statistics`
+            exclude_seeds: Seeds already used, so repeated prompts get distinct backgrounds
+
+        Returns:
+            Best entry, or None if the library has no candidate
+        """
+        with self._lock:
+            self._reload_if_changed()
+            candidates = self._by_prompt.get(self._prompt_key(prompt, negative_prompt), [])
+            candidates = [e for e in candidates if e.seed not in exclude_seeds]
+            if not candidates:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        target_aspect = target_shape[1] / target_shape[0]
+
+        def score(entry: LibraryEntry) -> float:
+            value = ASPECT_WEIGHT * abs(math.log(entry.aspect / target_aspect)) / math.log(2)
+            if foreground_mean is not None:
+                value += float(np.linalg.norm(np.subtract(entry.lab_mean, foreground_mean))) / 255
+            return value
+
+        return min(candidates, key=lambda e: (score(e), e.id))
+
+    def load(self, entry: LibraryEntry, target_shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Read a stored background, cropped and resized to ``target_shape``.
+
+        Args:
+            entry: Entry from :meth:`best_match`
+            target_shape: Target (height, width)
+
+        Returns:
+            Background image (BGR)
+        """
+        background = cv2.imread(str(self.root / entry.file), cv2.IMREAD_COLOR)
+        if background is None:
+            raise ValueError(f"Library background {entry.file} is missing or unreadable")
+        return fit_to_shape(background, target_shape)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters for the health endpoint."""
+        with self._lock:
+            return {
+                "backgrounds": len(self._entries),
+                "prompts": len(self._by_prompt),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def load_presets(paths: Sequence[Union[str, Path]]) -> List[Dict[str, Any]]:
+    """
+    Read background presets from YAML files with a top-level ``presets:`` list.
+
+    Args:
+        paths: Preset files (e.g. ``../background/presets.yaml``)
+
+    Returns:
+        Presets with ``name``, ``prompt`` and optional ``negative_prompt``,
+        ``num_inference_steps`` and ``guidance_scale``
+    """
+    presets = []
+    for path in paths:
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+        for preset in data.get("presets", []):
+            if not preset.get("name") or not preset.get("prompt"):
+                raise ValueError(f"{path}: every preset needs a name and a prompt")
+            presets.append(preset)
+    return presets
+
+
+def build_library(library: BackgroundLibrary,
+                  presets: List[Dict[str, Any]],
+                  seeds: Sequence[int],
+                  sizes: Sequence[Tuple[int, int]],
+                  generate: Callable[..., List[np.ndarray]]) -> int:
+    """
+    Render every (preset, size, seed) combination not already in the library.
+
+    Args:
+        library: Target library
+        presets: Presets from :func:`load_presets`
+        seeds: Seeds to render per preset and size
+        sizes: (width, height) render sizes
+        generate: Batched generator with the signature of ``generate_backgrounds_sdxl``
+
+    Returns:
+        Number of backgrounds rendered
+    """
+    rendered = 0
+    for preset in presets:
+        negative_prompt = preset.get("negative_prompt", "")
+        steps = int(preset.get("num_inference_steps", 20))
+        guidance_scale = float(preset.get("guidance_scale", 7.5))
+        for width, height in sizes:
+            todo = [s for s in seeds if not library.contains(preset["prompt"], negative_prompt, s, width, height)]
+            if not todo:
+                continue
+            start = time.perf_counter()
+            images = generate(
+                prompts=[preset["prompt"]] * len(todo),
+                negative_prompt=negative_prompt,
+                width=width,
+                height=height,
+                steps=steps,
+                guidance_scale=guidance_scale,
+                seeds=todo
+            )
+            for seed, image in zip(todo, images):
+                library.add(image, preset["prompt"], negative_prompt, seed, preset=preset["name"])
+            rendered += len(todo)
+            log.info(f"Rendered {len(todo)} background(s) for '{preset['name']}' at {width}x{height} "
+                     f"in {time.perf_counter() - start:.1f}s")
+    return rendered
+
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    from .config import settings
+    from .generate import generate_backgrounds_sdxl
+
+    parser = argparse.ArgumentParser(description="Pre-render preset backgrounds into the background library")
+    parser.add_argument("--presets", nargs="+", required=True, help="Preset YAML files")
+    parser.add_argument("--only", nargs="*", help="Restrict to these preset names")
+    parser.add_argument("--seeds", type=int, default=4, help="Seeds per preset and size")
+    parser.add_argument("--seed-base", type=int, default=1000, help="First seed")
+    parser.add_argument("--sizes", nargs="+", type=_parse_size,
+                        default=list(DEFAULT_SIZES), help="Render sizes as WIDTHxHEIGHT")
+    parser.add_argument("--library-dir", type=Path, default=settings.bg_library_dir, help="Library directory")
+    args = parser.parse_args()
+
+    presets = load_presets(args.presets)
+    if args.only:
+        presets = [p for p in presets if p["name"] in args.only]
+    library = BackgroundLibrary(args.library_dir)
+    seeds = range(args.seed_base, args.seed_base + args.seeds)
+
+    rendered = build_library(library, presets, seeds, args.sizes, generate_backgrounds_sdxl)
+    log.info(f"Background library build complete: {rendered} new, {len(library)} total in {args.library_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 
 import sys
 from loguru import logger
-from pathlib import Path
+
+from .config import settings
 
 
 def setup_logger():
@@ -23,8 +24,8 @@ def setup_logger():
     )
     
     # Add file handler for errors
-    log_dir = Path("./logs")
-    log_dir.mkdir(exist_ok=True)
+    log_dir = settings.log_dir
+    log_dir.mkdir(parents=True, exist_ok=True)
     
     logger.add(
         log_dir / "background_service.log",
@@ -3,13 +3,16 @@
 import os
 import time
 from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 import traceback
-from typing import Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
 
+import numpy as np
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
 from .logger import log
@@ -33,12 +36,16 @@ def _consume_token() -> bool:
             _bucket_tokens -= 1
             return True
         return False
-from .models import CleanupRequest, ReplaceRequest, ProcessingResponse
-from .io import load_image, save_image, generate_output_path
+from .models import CleanupRequest, ReplaceRequest, ProcessingResponse, VariantsResponse
+from .io import read_image, read_image_with_digest, save_image, generate_output_path, resolve_shared_path
+from .uploads import UploadLimitMiddleware, read_upload, spooling_route
+from .mask_cache import MaskCache
+from .model_manager import model_manager
 from .masking import extract_foreground_mask, refine_mask
 from .enhance import cleanup_background_transparent, cleanup_background_soften, enhance_foreground
-from .composite import create_seamless_composite, adjust_lighting_consistency
-from .generate import generate_background_sdxl, resize_background_to_match
+from .composite import fused_composite
+from .library import BackgroundLibrary, lab_statistics
+from .generate import coalescer_stats, generate_backgrounds_sdxl, resize_background_to_match, shutdown_coalescer
 from .runway_adapter import generate_background_runway
 
 
@@ -60,6 +67,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before the body is read; spool large ones to disk
+app.add_middleware(UploadLimitMiddleware, max_bytes=settings.max_upload_mb * 1024 * 1024)
+app.router.route_class = spooling_route(settings.upload_spool_mb * 1024 * 1024)
+
+# Refined masks keyed by image content, shared by cleanup and replace calls
+mask_cache = MaskCache(settings.mask_cache_dir, settings.mask_cache_memory_mb, settings.mask_cache_disk_mb)
+
+# Pre-rendered backgrounds for fixed preset prompts, built offline by src/library.py
+background_library = BackgroundLibrary(settings.bg_library_dir)
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -71,6 +88,15 @@ async def startup_event():
     
     # Ensure output directory exists
     settings.output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Models load on first use; optionally pre-load some without delaying startup
+    model_manager.start_reaper()
+    if settings.model_warmup:
+        warmup = [name.strip() for name in settings.model_warmup.split(",")]
+        unknown = [name for name in warmup if name and name not in model_manager]
+        if unknown:
+            log.warning(f"Ignoring unknown warm-up models: {unknown}")
+        model_manager.warmup([name for name in warmup if name in model_manager])
 
 
 @app.on_event("shutdown")
@@ -78,14 +104,12 @@ async def shutdown_event():
     """Cleanup on shutdown."""
     log.info("Shutting down Background Processing Service")
     
-    # Cleanup generators if using SDXL
-    if settings.bg_engine == BGEngine.SDXL:
-        try:
-            from .generate import get_sdxl_generator
-            generator = get_sdxl_generator()
-            generator.cleanup()
-        except Exception as e:
-            log.warning(f"Error during SDXL cleanup: {e}")
+    # Stop batching, then release whichever models are loaded
+    try:
+        shutdown_coalescer()
+        model_manager.shutdown()
+    except Exception as e:
+        log.warning(f"Error during model cleanup: {e}")
 
 
 @app.get("/")
@@ -97,7 +121,10 @@ async def root():
         "status": "running",
         "endpoints": [
             "/background/cleanup",
-            "/background/replace"
+            "/background/cleanup/path",
+            "/background/replace",
+            "/background/replace/path",
+            "/background/replace/variants"
         ]
     }
 
@@ -108,16 +135,329 @@ async def health_check():
     return {
         "status": "healthy",
         "engine": settings.bg_engine.value,
-        "device": settings.device
+        "device": settings.device,
+        "sdxl_profile": settings.sdxl_profile,
+        "mask_cache": mask_cache.stats(),
+        "background_library": background_library.stats(),
+        "sdxl_batching": coalescer_stats(),
+        "models": model_manager.stats()
     }
 
 
+def _get_mask(input_image: np.ndarray, image_digest: str, mask_id: Optional[str] = None) -> Tuple[np.ndarray, str]:
+    """
+    Return the refined foreground mask and its id, reusing cached masks.
+    
+    Masks are looked up by image content and mask parameters and only
+    segmented on a miss. A caller-supplied ``mask_id`` from an earlier response
+    must be the id of this image's mask; ids of other images are rejected.
+    """
+    key = MaskCache.make_key(image_digest, model="u2net", inference_size=settings.mask_inference_size)
+    if mask_id:
+        if not MaskCache.is_valid_id(mask_id):
+            raise HTTPException(status_code=400, detail=f"Invalid mask_id '{mask_id}'")
+        if mask_id != key:
+            raise HTTPException(status_code=400, detail="mask_id does not belong to this image")
+    
+    mask = mask_cache.get(key)
+    if mask is None:
+        _, mask = extract_foreground_mask(input_image, inference_size=settings.mask_inference_size)
+        mask = refine_mask(mask)
+        mask_cache.put(key, mask)
+    else:
+        log.info(f"Mask cache hit: {key}")
+    return mask, key
+
+
+def _process_cleanup(input_image: np.ndarray,
+                     mask: np.ndarray,
+                     bg_mode: BGMode,
+                     enhance_fg: bool,
+                     denoise: bool,
+                     blur_radius: int,
+                     desaturate_pct: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Run the cleanup pipeline and return (processed_image, alpha_mask)."""
+    # Clean up background based on mode
+    if bg_mode == BGMode.TRANSPARENT:
+        processed_image, alpha_mask = cleanup_background_transparent(input_image, mask)
+    else:  # soften
+        processed_image, alpha_mask = cleanup_background_soften(
+            input_image, mask, blur_radius=blur_radius, desaturate_pct=desaturate_pct
+        )
+    
+    # Enhance foreground if requested
+    if enhance_fg:
+        processed_image = enhance_foreground(processed_image, mask)
+    
+    # Apply denoising if requested
+    if denoise:
+        from .enhance import denoise_image
+        processed_image = denoise_image(processed_image)
+    
+    return processed_image, alpha_mask
+
+
+def _validate_generation(steps: int, guidance_scale: float) -> None:
+    """Reject out-of-range generation parameters."""
+    if steps < 1 or steps > 100:
+        raise HTTPException(status_code=400, detail="Steps must be between 1 and 100")
+    if guidance_scale < 1.0 or guidance_scale > 20.0:
+        raise HTTPException(status_code=400, detail="Guidance scale must be between 1.0 and 20.0")
+
+
+def _generate_backgrounds(prompts: List[str],
+                          negative_prompt: str,
+                          steps: int,
+                          guidance_scale: float,
+                          seeds: List[Optional[int]],
+                          target_shape: Tuple[int, int]) -> List[np.ndarray]:
+    """
+    Generate one background per prompt with the configured engine, resized to ``target_shape``.
+    
+    Runway requests run concurrently; SDXL prompts share batched pipeline calls.
+    """
+    target_height, target_width = target_shape
+    max_dim = max(target_width, target_height)
+    engine = settings.bg_engine
+    allow_4k = os.getenv('ALLOW_4K', '0') == '1'
+    runway_timeout_ms = int(os.getenv('RUNWAY_TIMEOUT_MS', '180000'))
+    fallback_local = os.getenv('BG_FALLBACK_LOCAL', '0') == '1'
+    generated = None
+    if engine == BGEngine.RUNWAY:
+        try:
+            if max_dim > 4096 and not allow_4k:
+                raise HTTPException(status_code=400, detail="4K+ resolution not allowed in Runway mode unless ALLOW_4K=1")
+            from .runway_adapter import generate_background_remote
+            
+            def fetch(prompt_seed):
+                tmp_path = generate_background_remote(prompt_seed[0], negative_prompt, prompt_seed[1], (1024, 1024),
+                                                      timeout_ms=runway_timeout_ms)
+                try:
+                    return read_image(tmp_path)
+                finally:
+                    os.unlink(tmp_path)
+            
+            with ThreadPoolExecutor(max_workers=min(len(prompts), 4)) as pool:
+                generated = list(pool.map(fetch, zip(prompts, seeds)))
+        except Exception as e:
+            log.warning(f"Runway generation failed: {e}")
+            if fallback_local:
+                log.info("Falling back to local SDXL generation...")
+                engine = BGEngine.SDXL
+            else:
+                raise HTTPException(status_code=500, detail=f"Runway generation failed: {e}")
+    if engine == BGEngine.SDXL:
+        if max_dim > 4096 and not allow_4k:
+            raise HTTPException(status_code=400, detail="4K+ resolution not allowed in SDXL mode unless ALLOW_4K=1")
+        generated = generate_backgrounds_sdxl(
+            prompts=prompts,
+            negative_prompt=negative_prompt,
+            width=1024,
+            height=1024,
+            steps=steps,
+            guidance_scale=guidance_scale,
+            seeds=seeds
+        )
+    if not generated or any(bg is None for bg in generated):
+        raise HTTPException(status_code=500, detail="Background generation failed (no image)")
+    
+    # Resize backgrounds to match input image
+    return [resize_background_to_match(bg, target_shape) for bg in generated]
+
+
+def _library_backgrounds(input_image: np.ndarray,
+                         mask: np.ndarray,
+                         prompts: List[str],
+                         negative_prompt: str,
+                         seeds: List[Optional[int]]) -> List[Optional[np.ndarray]]:
+    """
+    Look up a pre-rendered background for each prompt.
+    
+    Returns one background (fitted to the input) or None per prompt; repeated
+    prompts get backgrounds rendered from different seeds. Prompts with an
+    explicit seed are always generated so the result matches that seed.
+    """
+    if not len(background_library):
+        return [None] * len(prompts)
+    
+    # An empty mask has no foreground colour to match; rank by aspect ratio only
+    foreground_mean = None
+    if np.count_nonzero(mask):
+        foreground_mean, _ = lab_statistics(input_image, mask)
+    used_seeds = {}
+    backgrounds = []
+    for prompt, seed in zip(prompts, seeds):
+        if seed is not None:
+            backgrounds.append(None)
+            continue
+        entry = background_library.best_match(
+            prompt, negative_prompt, input_image.shape[:2], foreground_mean,
+            exclude_seeds=used_seeds.get(prompt, ())
+        )
+        if entry is None:
+            backgrounds.append(None)
+            continue
+        log.info(f"Using library background {entry.id} for prompt '{prompt}'")
+        used_seeds.setdefault(prompt, set()).add(entry.seed)
+        backgrounds.append(background_library.load(entry, input_image.shape[:2]))
+    return backgrounds
+
+
+def _process_replace_variants(input_image: np.ndarray,
+                              image_digest: str,
+                              mask_id: Optional[str],
+                              prompts: List[str],
+                              negative_prompt: str,
+                              steps: int,
+                              guidance_scale: float,
+                              seeds: List[Optional[int]],
+                              enhance_fg: bool,
+                              match_colors: bool,
+                              feather_edges: bool,
+                              force_fresh: bool = False) -> Tuple[List[np.ndarray], str]:
+    """
+    Composite the input over one generated background per prompt.
+    
+    The mask and foreground enhancement are computed once and shared by every
+    variant. Prompts with pre-rendered backgrounds in the library skip
+    generation unless ``force_fresh`` is set. Returns (composites in prompt
+    order, mask_id).
+    """
+    _validate_generation(steps, guidance_scale)
+    
+    # Extract foreground mask (cached by image content)
+    mask, mask_id = _get_mask(input_image, image_digest, mask_id)
+    
+    # Prefer stored backgrounds, generate the rest
+    backgrounds = [None] * len(prompts)
+    if not force_fresh:
+        backgrounds = _library_backgrounds(input_image, mask, prompts, negative_prompt, seeds)
+    missing = [i for i, background in enumerate(backgrounds) if background is None]
+    if missing:
+        generated = _generate_backgrounds(
+            [prompts[i] for i in missing], negative_prompt, steps, guidance_scale,
+            [seeds[i] for i in missing], input_image.shape[:2]
+        )
+        for i, background in zip(missing, generated):
+            backgrounds[i] = background
+    
+    # Enhance foreground if requested
+    enhanced_image = input_image
+    if enhance_fg:
+        enhanced_image = enhance_foreground(input_image, mask)
+    
+    # Composite, colour match and relight band by band
+    composites = [
+        fused_composite(
+            foreground=enhanced_image,
+            background=background,
+            mask=mask,
+            match_colors=match_colors,
+            feather_edges=feather_edges
+        )
+        for background in backgrounds
+    ]
+    return composites, mask_id
+
+
+def _process_replace(input_image: np.ndarray,
+                     image_digest: str,
+                     mask_id: Optional[str],
+                     prompt: str,
+                     negative_prompt: str,
+                     steps: int,
+                     guidance_scale: float,
+                     seed: Optional[int],
+                     enhance_fg: bool,
+                     match_colors: bool,
+                     feather_edges: bool,
+                     force_fresh: bool = False) -> Tuple[np.ndarray, str]:
+    """Run the replacement pipeline and return (final_composite, mask_id)."""
+    composites, mask_id = _process_replace_variants(
+        input_image, image_digest, mask_id, [prompt], negative_prompt, steps, guidance_scale, [seed],
+        enhance_fg, match_colors, feather_edges, force_fresh
+    )
+    return composites[0], mask_id
+
+
+def _cleanup_response(output_path: Path, bg_mode: BGMode, mask_id: str) -> ProcessingResponse:
+    transparent = bg_mode == BGMode.TRANSPARENT
+    return ProcessingResponse(
+        success=True,
+        output_path=str(output_path),
+        mask_id=mask_id,
+        out_png=str(output_path) if transparent else None,
+        out_jpg=str(output_path) if not transparent else None,
+        message="Background cleanup completed successfully"
+    )
+
+
+def _replace_response(output_path: Path, mask_id: str) -> ProcessingResponse:
+    return ProcessingResponse(
+        success=True,
+        output_path=str(output_path),
+        mask_id=mask_id,
+        out_jpg=str(output_path),
+        message="Background replacement completed successfully"
+    )
+
+
+def _resolve_handoff_paths(image_path: str, output_path: Optional[str], suffix: str, ext: str) -> Tuple[Path, Path]:
+    """
+    Resolve the input and output paths of a path handoff request.
+    
+    Outputs default to the input's directory, falling back to the service
+    output directory when that directory is read-only. Paths are checked
+    against ``SHARED_ROOTS`` before the input is looked up, so the response
+    never reveals whether a file outside the roots exists.
+    """
+    roots = settings.shared_root_paths
+    try:
+        input_path = resolve_shared_path(image_path, roots)
+        resolved_output = resolve_shared_path(output_path, roots) if output_path else None
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if not input_path.is_file():
+        raise HTTPException(status_code=404, detail=f"Image path does not exist: {image_path}")
+    if resolved_output is not None:
+        return input_path, resolved_output
+    
+    output_dir = input_path.parent if os.access(input_path.parent, os.W_OK) else settings.output_dir
+    return input_path, generate_output_path(output_dir, input_path.name, suffix, ext=ext)
+
+
+def _cleanup_path(request: CleanupRequest, input_path: Path, output_path: Path) -> str:
+    """Read, clean up and write a path handoff image; returns the mask id."""
+    input_image, image_digest = read_image_with_digest(input_path)
+    mask, mask_id = _get_mask(input_image, image_digest, request.mask_id)
+    processed_image, alpha_mask = _process_cleanup(
+        input_image, mask, request.mode, request.enhance_fg, request.denoise,
+        request.blur_radius, request.desaturate_pct
+    )
+    save_image(processed_image, output_path, alpha_mask if request.mode == BGMode.TRANSPARENT else None)
+    return mask_id
+
+
+def _replace_path(request: ReplaceRequest, input_path: Path, output_path: Path) -> str:
+    """Read, replace the background of and write a path handoff image; returns the mask id."""
+    input_image, image_digest = read_image_with_digest(input_path)
+    final_image, mask_id = _process_replace(
+        input_image, image_digest, request.mask_id,
+        request.prompt, request.negative_prompt or "", request.steps,
+        request.guidance_scale, request.seed,
+        request.enhance_fg, request.match_colors, request.feather_edges, request.force_fresh
+    )
+    save_image(final_image, output_path)
+    return mask_id
+
+
 @app.post("/background/cleanup", response_model=ProcessingResponse)
 async def cleanup_background(
     file: UploadFile = File(...),
     mode: str = Form(default="transparent"),
     enhance_fg: bool = Form(default=True),
-    denoise: bool = Form(default=False)
+    denoise: bool = Form(default=False),
+    mask_id: Optional[str] = Form(default=None)
 ):
     """
     Clean up image background by removing or softening it.
@@ -127,6 +467,7 @@ async def cleanup_background(
         mode: Cleanup mode ('transparent' or 'soften')
         enhance_fg: Whether to enhance foreground
         denoise: Whether to apply denoising
+        mask_id: Mask id returned by an earlier call for the same image
         
     Returns:
         Processing response with output file path
@@ -147,41 +488,64 @@ async def cleanup_background(
             )
         
         # Load input image
-        image_data = await file.read()
-        input_image = load_image(image_data)
+        input_image, image_digest = read_upload(file)
         
         log.info(f"Loaded input image: {input_image.shape}")
         
-        # Extract foreground mask
-        mask = extract_foreground_mask(input_image)
-        mask = refine_mask(mask, input_image)
+        mask, mask_id = _get_mask(input_image, image_digest, mask_id)
+        processed_image, alpha_mask = _process_cleanup(
+            input_image, mask, bg_mode, enhance_fg, denoise,
+            settings.default_blur_radius, settings.default_desaturate_pct
+        )
         
-        # Clean up background based on mode
+        # Save output (PNG keeps the transparent background)
         if bg_mode == BGMode.TRANSPARENT:
-            processed_image = cleanup_background_transparent(input_image, mask)
-        else:  # soften
-            processed_image = cleanup_background_soften(input_image, mask)
+            output_path = generate_output_path(settings.output_dir, file.filename, "cleaned", ext=".png")
+            save_image(processed_image, output_path, alpha_mask)
+        else:
+            output_path = generate_output_path(settings.output_dir, file.filename, "cleaned")
+            save_image(processed_image, output_path)
         
-        # Enhance foreground if requested
-        if enhance_fg:
-            processed_image = enhance_foreground(processed_image, mask)
+        log.info(f"Cleanup complete: {output_path}")
         
-        # Apply denoising if requested
-        if denoise:
-            from .enhance import denoise_image
-            processed_image = denoise_image(processed_image)
+        return _cleanup_response(output_path, bg_mode, mask_id)
         
-        # Save output
-        output_path = generate_output_path(settings.output_dir, file.filename, "cleaned")
-        save_image(processed_image, output_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Cleanup failed: {e}")
+        log.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+
+@app.post("/background/cleanup/path", response_model=ProcessingResponse)
+async def cleanup_background_path(request: CleanupRequest):
+    """
+    Clean up the background of an image on a shared volume.
+    
+    The image is read directly from ``image_path`` (which must be under
+    ``SHARED_ROOTS``) and the result is written next to it, so co-located
+    clients skip the multipart upload entirely.
+    
+    Args:
+        request: Cleanup request with a server-visible image path
+        
+    Returns:
+        Processing response with output file path
+    """
+    # Token bucket limiter
+    if not _consume_token():
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+    try:
+        ext = ".png" if request.mode == BGMode.TRANSPARENT else ".jpg"
+        input_path, output_path = _resolve_handoff_paths(request.image_path, request.output_path, "cleaned", ext)
+        
+        log.info(f"Processing cleanup path request: {input_path}, mode={request.mode.value}")
+        mask_id = await run_in_threadpool(_cleanup_path, request, input_path, output_path)
         
         log.info(f"Cleanup complete: {output_path}")
         
-        return ProcessingResponse(
-            success=True,
-            output_path=str(output_path),
-            message="Background cleanup completed successfully"
-        )
+        return _cleanup_response(output_path, request.mode, mask_id)
         
     except HTTPException:
         raise
@@ -201,7 +565,9 @@ async def replace_background(
     seed: Optional[int] = Form(default=None),
     enhance_fg: bool = Form(default=True),
     match_colors: bool = Form(default=True),
-    feather_edges: bool = Form(default=True)
+    feather_edges: bool = Form(default=True),
+    mask_id: Optional[str] = Form(default=None),
+    force_fresh: bool = Form(default=False)
 ):
     """
     Replace image background with AI-generated content.
@@ -216,6 +582,8 @@ async def replace_background(
         enhance_fg: Whether to enhance foreground
         match_colors: Whether to match colors between foreground and background
         feather_edges: Whether to feather edges for smooth blending
+        mask_id: Mask id returned by an earlier call for the same image
+        force_fresh: Generate even if the background library has this prompt
         
     Returns:
         Processing response with output file path
@@ -226,95 +594,149 @@ async def replace_background(
     try:
         log.info(f"Processing replace request: prompt='{prompt}', steps={steps}, guidance={guidance_scale}")
         
-        # Validate parameters
-        if steps < 1 or steps > 100:
-            raise HTTPException(status_code=400, detail="Steps must be between 1 and 100")
-        if guidance_scale < 1.0 or guidance_scale > 20.0:
-            raise HTTPException(status_code=400, detail="Guidance scale must be between 1.0 and 20.0")
-        
         # Load input image
-        image_data = await file.read()
-        input_image = load_image(image_data)
+        input_image, image_digest = read_upload(file)
         
         log.info(f"Loaded input image: {input_image.shape}")
         
-        # Extract foreground mask
-        mask = extract_foreground_mask(input_image)
-        mask = refine_mask(mask, input_image)
-        
-
-        # Generate new background
-        target_height, target_width = input_image.shape[:2]
-        max_dim = max(target_width, target_height)
-        engine = settings.bg_engine
-        allow_4k = os.getenv('ALLOW_4K', '0') == '1'
-        runway_timeout_ms = int(os.getenv('RUNWAY_TIMEOUT_MS', '180000'))
-        fallback_local = os.getenv('BG_FALLBACK_LOCAL', '0') == '1'
-        generated_bg = None
-        error = None
-        if engine == BGEngine.RUNWAY:
-            try:
-                if max_dim > 4096 and not allow_4k:
-                    raise HTTPException(status_code=400, detail="4K+ resolution not allowed in Runway mode unless ALLOW_4K=1")
-                from .runway_adapter import generate_background_remote
-                tmp_path = generate_background_remote(prompt, negative_prompt, seed, (1024, 1024), timeout_ms=runway_timeout_ms)
-                generated_bg = load_image(open(tmp_path, 'rb').read())
-                os.unlink(tmp_path)
-            except Exception as e:
-                error = e
-                log.warning(f"Runway generation failed: {e}")
-                if fallback_local:
-                    log.info("Falling back to local SDXL generation...")
-                    engine = BGEngine.SDXL
-                else:
-                    raise HTTPException(status_code=500, detail=f"Runway generation failed: {e}")
-        if engine == BGEngine.SDXL:
-            if max_dim > 4096 and not allow_4k:
-                raise HTTPException(status_code=400, detail="4K+ resolution not allowed in SDXL mode unless ALLOW_4K=1")
-            generated_bg = generate_background_sdxl(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                width=1024,
-                height=1024,
-                steps=steps,
-                guidance_scale=guidance_scale,
-                seed=seed
-            )
-        if generated_bg is None:
-            raise HTTPException(status_code=500, detail="Background generation failed (no image)")
-
-        # Resize background to match input image
-        background = resize_background_to_match(generated_bg, (target_height, target_width))
-        
-        # Enhance foreground if requested
-        enhanced_image = input_image
-        if enhance_fg:
-            enhanced_image = enhance_foreground(input_image, mask)
-        
-        # Create seamless composite
-        composite = create_seamless_composite(
-            foreground=enhanced_image,
-            background=background,
-            mask=mask,
-            match_colors=match_colors,
-            feather_edges=feather_edges
+        # Off the event loop, so concurrent requests can share SDXL batches
+        final_image, mask_id = await run_in_threadpool(
+            _process_replace,
+            input_image, image_digest, mask_id, prompt, negative_prompt, steps, guidance_scale, seed,
+            enhance_fg, match_colors, feather_edges, force_fresh
         )
         
-        # Adjust lighting consistency
-        final_image = adjust_lighting_consistency(composite, mask)
-        
         # Save output
         output_path = generate_output_path(settings.output_dir, file.filename, "replaced")
         save_image(final_image, output_path)
         
         log.info(f"Background replacement complete: {output_path}")
         
-        return ProcessingResponse(
+        return _replace_response(output_path, mask_id)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Background replacement failed: {e}")
+        log.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+
+@app.post("/background/replace/variants", response_model=VariantsResponse)
+async def replace_background_variants(
+    file: UploadFile = File(...),
+    prompts: List[str] = Form(...),
+    negative_prompt: str = Form(default="people, text, watermark"),
+    steps: int = Form(default=20),
+    guidance_scale: float = Form(default=7.5),
+    seed: Optional[int] = Form(default=None),
+    enhance_fg: bool = Form(default=True),
+    match_colors: bool = Form(default=True),
+    feather_edges: bool = Form(default=True),
+    mask_id: Optional[str] = Form(default=None),
+    force_fresh: bool = Form(default=False)
+):
+    """
+    Render one image over several generated backgrounds in a single request.
+    
+    The upload, mask and foreground enhancement are shared by every variant
+    and SDXL backgrounds are generated in batches, so N prompts cost far less
+    than N calls to ``/background/replace``.
+    
+    Args:
+        file: Input image file
+        prompts: Generation prompts (repeat the form field once per variant)
+        negative_prompt: Negative prompt applied to every variant
+        steps: Number of inference steps
+        guidance_scale: Guidance scale for generation
+        seed: Base random seed; variant ``i`` uses ``seed + i``
+        enhance_fg: Whether to enhance foreground
+        match_colors: Whether to match colors between foreground and background
+        feather_edges: Whether to feather edges for smooth blending
+        mask_id: Mask id returned by an earlier call for the same image
+        force_fresh: Generate even if the background library has these prompts
+        
+    Returns:
+        One processing result per prompt
+    """
+    # Token bucket limiter
+    if not _consume_token():
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+    try:
+        prompts = [p.strip() for p in prompts if p.strip()]
+        if not prompts:
+            raise HTTPException(status_code=400, detail="At least one prompt is required")
+        if len(prompts) > settings.max_variants:
+            raise HTTPException(status_code=400, detail=f"At most {settings.max_variants} prompts per request")
+        
+        log.info(f"Processing replace variants request: {len(prompts)} prompt(s), steps={steps}")
+        start_time = time.time()
+        
+        # Load input image
+        input_image, image_digest = read_upload(file)
+        
+        log.info(f"Loaded input image: {input_image.shape}")
+        
+        seeds = [seed + i if seed is not None else None for i in range(len(prompts))]
+        composites, mask_id = await run_in_threadpool(
+            _process_replace_variants,
+            input_image, image_digest, mask_id, prompts, negative_prompt, steps, guidance_scale, seeds,
+            enhance_fg, match_colors, feather_edges, force_fresh
+        )
+        
+        results = []
+        for i, (prompt, variant_seed, composite) in enumerate(zip(prompts, seeds, composites)):
+            output_path = generate_output_path(settings.output_dir, file.filename, f"replaced_{i + 1}")
+            save_image(composite, output_path)
+            result = _replace_response(output_path, mask_id)
+            result.meta = {"prompt": prompt, "seed": variant_seed}
+            results.append(result)
+        
+        log.info(f"Background variants complete: {len(results)} output(s)")
+        
+        return VariantsResponse(
             success=True,
-            output_path=str(output_path),
-            message="Background replacement completed successfully"
+            message=f"Generated {len(results)} background variant(s)",
+            mask_id=mask_id,
+            results=results,
+            processing_time=round(time.time() - start_time, 2)
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Background variants failed: {e}")
+        log.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+
+@app.post("/background/replace/path", response_model=ProcessingResponse)
+async def replace_background_path(request: ReplaceRequest):
+    """
+    Replace the background of an image on a shared volume.
+    
+    The image is read directly from ``image_path`` (which must be under
+    ``SHARED_ROOTS``) and the composite is written next to it.
+    
+    Args:
+        request: Replace request with a server-visible image path
+        
+    Returns:
+        Processing response with output file path
+    """
+    # Token bucket limiter
+    if not _consume_token():
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again later.")
+    try:
+        input_path, output_path = _resolve_handoff_paths(request.image_path, request.output_path, "replaced", ".jpg")
+        
+        log.info(f"Processing replace path request: {input_path}, prompt='{request.prompt}'")
+        mask_id = await run_in_threadpool(_replace_path, request, input_path, output_path)
+        
+        log.info(f"Background replacement complete: {output_path}")
+        
+        return _replace_response(output_path, mask_id)
+        
     except HTTPException:
         raise
     except Exception as e:
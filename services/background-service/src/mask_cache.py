@@ -0,0 +1,170 @@
+"""Content-addressed cache of refined foreground masks."""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from .logger import log
+
+_MASK_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class MaskCache:
+    """
+    Two-level cache mapping image content + mask parameters to a refined mask.
+
+    Masks are kept in an in-memory LRU bounded by bytes and persisted as
+    compressed PNGs on disk, so a cleanup followed by several replacements of
+    the same photo runs segmentation once, even across restarts.
+    """
+
+    def __init__(self, cache_dir: Path, max_memory_mb: int = 256, max_disk_mb: int = 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*.png"))
+        self._lock = Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_digest: str, **params: Any) -> str:
+        """
+        Build the mask id for an image digest and the parameters that shaped the mask.
+
+        Args:
+            image_digest: Content hash of the encoded image
+            **params: Mask parameters (model, inference size, ...)
+
+        Returns:
+            32-character hex mask id
+        """
+        material = image_digest + "|" + "|".join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def is_valid_id(mask_id: str) -> bool:
+        """Check a caller-supplied mask id before it is used as a filename."""
+        return bool(_MASK_ID.match(mask_id))
+
+    def _path(self, mask_id: str) -> Path:
+        return self.cache_dir / f"{mask_id}.png"
+
+    def _remember(self, mask_id: str, mask: np.ndarray) -> None:
+        """Insert into the memory LRU, evicting least recently used masks. Caller holds the lock."""
+        if mask_id in self._memory:
+            self._memory.move_to_end(mask_id)
+            return
+        self._memory[mask_id] = mask
+        self._memory_bytes += mask.nbytes
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def get(self, mask_id: str) -> Optional[np.ndarray]:
+        """
+        Look up a mask by id.
+
+        Args:
+            mask_id: Mask id from :meth:`make_key`
+
+        Returns:
+            Cached mask or None
+        """
+        if not self.is_valid_id(mask_id):
+            return None
+
+        with self._lock:
+            mask = self._memory.get(mask_id)
+            if mask is not None:
+                self._memory.move_to_end(mask_id)
+                self.memory_hits += 1
+                return mask
+
+        path = self._path(mask_id)
+        mask = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE) if path.exists() else None
+
+        with self._lock:
+            if mask is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(mask_id, mask)
+
+        # Refresh mtime so disk eviction is least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return mask
+
+    def put(self, mask_id: str, mask: np.ndarray) -> None:
+        """
+        Store a mask in memory and on disk.
+
+        Args:
+            mask_id: Mask id from :meth:`make_key`
+            mask: Refined mask (uint8)
+        """
+        with self._lock:
+            self._remember(mask_id, mask)
+
+        try:
+            ok, encoded = cv2.imencode(".png", mask, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+            if not ok:
+                raise ValueError("PNG encoding failed")
+            path = self._path(mask_id)
+            # Unique per writer so concurrent puts of the same mask never share a temp file
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(encoded.tobytes())
+
+            with self._lock:
+                # Replacing an existing mask only changes the disk total by the size difference
+                previous = path.stat().st_size if path.exists() else 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(encoded) - previous
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+        except Exception as e:
+            # The cache is an optimisation; a failed write only costs a recompute
+            log.warning(f"Failed to persist mask {mask_id}: {e}")
+
+    def _evict_disk(self) -> None:
+        """Delete the oldest masks until the disk budget is met. Caller holds the lock."""
+        files = sorted(self.cache_dir.glob("*.png"), key=lambda p: p.stat().st_mtime)
+        self._disk_bytes = sum(p.stat().st_size for p in files)
+        for path in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._disk_bytes -= size
+            log.info(f"Evicted cached mask {path.stem}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes for the health endpoint."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_mb": round(self._memory_bytes / 1e6, 1),
+                "disk_mb": round(self._disk_bytes / 1e6, 1),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
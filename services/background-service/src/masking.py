@@ -3,19 +3,134 @@
 import numpy as np
 import cv2
 from PIL import Image
-from rembg import remove
+from rembg import new_session, remove
+from threading import Lock
 from typing import Tuple, Optional
 
 from .logger import log
+from .model_manager import model_manager
+from .tiles import boundary_tiles, pad_tile
 
 
-def extract_foreground_mask(image: np.ndarray, model_name: str = "u2net") -> Tuple[np.ndarray, np.ndarray]:
+# Approximate resident size of a loaded rembg ONNX session per model
+_REMBG_MEMORY_MB = {"u2net": 350, "u2netp": 40, "u2net_human_seg": 350, "silueta": 90, "isnet-general-use": 350}
+
+# CascadeClassifier.detectMultiScale is not safe to call concurrently on one instance
+_face_cascade_lock = Lock()
+
+
+def _session_name(model_name: str) -> str:
+    """Register the rembg session for ``model_name`` with the model manager and return its name."""
+    name = f"rembg:{model_name}"
+    if name not in model_manager:
+        model_manager.register(name, lambda: new_session(model_name), _REMBG_MEMORY_MB.get(model_name, 350))
+    return name
+
+
+_session_name("u2net")
+model_manager.register(
+    "face_cascade",
+    lambda: cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'),
+    size_mb=1
+)
+
+
+def boundary_band(mask: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Mark the pixels within ``radius`` of the mask boundary.
+    
+    The band covers every partially transparent pixel plus the transition
+    between fully opaque and fully transparent regions, grown by ``radius``.
+    
+    Args:
+        mask: Alpha mask (uint8)
+        radius: Band half-width in pixels
+        
+    Returns:
+        Band mask (uint8, 255 inside the band)
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    uncertain = cv2.inRange(mask, 1, 254)
+    binary = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)[1]
+    edges = cv2.morphologyEx(binary, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    return cv2.dilate(cv2.bitwise_or(uncertain, edges), kernel)
+
+
+def _guided_filter(guide: np.ndarray, src: np.ndarray, radius: int, eps: float) -> np.ndarray:
+    """Grey-guide guided filter (He et al.) on float32 inputs in [0, 1]."""
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_i = cv2.boxFilter(guide, -1, ksize)
+    mean_p = cv2.boxFilter(src, -1, ksize)
+    cov_ip = cv2.boxFilter(guide * src, -1, ksize) - mean_i * mean_p
+    var_i = cv2.boxFilter(guide * guide, -1, ksize) - mean_i * mean_i
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return cv2.boxFilter(a, -1, ksize) * guide + cv2.boxFilter(b, -1, ksize)
+
+
+def upsample_mask(mask: np.ndarray,
+                  guide: np.ndarray,
+                  radius: int = 8,
+                  eps: float = 1e-4,
+                  tile_size: int = 256) -> np.ndarray:
+    """
+    Upsample a low-resolution mask using the full-resolution image as guide.
+    
+    The mask is resized bilinearly, then a guided filter snaps its edges to
+    the image edges. Filtering only runs on tiles that contain the boundary
+    band and only band pixels are rewritten; solid interior and exterior
+    pixels are left as they are.
+    
+    Args:
+        mask: Low-resolution alpha mask (uint8)
+        guide: Full-resolution image (BGR)
+        radius: Guided filter radius at full resolution
+        eps: Guided filter regularisation
+        tile_size: Tile edge length for band processing
+        
+    Returns:
+        Full-resolution alpha mask (uint8)
+    """
+    height, width = guide.shape[:2]
+    upsampled = cv2.resize(mask, (width, height), interpolation=cv2.INTER_LINEAR)
+    
+    # Band must cover the bilinear blur of one low-res pixel plus the filter window
+    scale = max(height / mask.shape[0], width / mask.shape[1])
+    band_radius = radius + int(np.ceil(scale))
+    band = boundary_band(upsampled, band_radius)
+    gray = cv2.cvtColor(guide, cv2.COLOR_BGR2GRAY)
+    
+    # Every band pixel lies within band_radius + 1 of a partial or changing mask value
+    for tile in boundary_tiles(upsampled, band_radius + 1, tile_size, flat_values=(0, 255)):
+        # Pad each tile by the filter radius so box sums are exact at the core
+        y0, y1, x0, x1 = tile
+        py0, py1, px0, px1 = pad_tile(tile, radius, gray.shape)
+        guide_tile = gray[py0:py1, px0:px1].astype(np.float32) / 255.0
+        alpha_tile = upsampled[py0:py1, px0:px1].astype(np.float32) / 255.0
+        
+        filtered = _guided_filter(guide_tile, alpha_tile, radius, eps)
+        filtered = np.clip(filtered[y0 - py0:y1 - py0, x0 - px0:x1 - px0] * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        
+        core = upsampled[y0:y1, x0:x1]
+        np.copyto(core, filtered, where=band[y0:y1, x0:x1] > 0)
+    
+    return upsampled
+
+
+def extract_foreground_mask(image: np.ndarray,
+                            model_name: str = "u2net",
+                            inference_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
     """
     Extract foreground mask using rembg.
     
+    Segmentation runs on a copy downscaled so its long side is at most
+    ``inference_size`` (u2net itself works at 320 px), and the mask is brought
+    back to full resolution with :func:`upsample_mask`.
+    
     Args:
         image: Input image in BGR format
         model_name: rembg model to use ('u2net', 'u2net_human_seg', 'silueta', etc.)
+        inference_size: Long side used for segmentation (0 disables downscaling)
         
     Returns:
         Tuple of (foreground_rgba, mask)
@@ -23,30 +138,29 @@ def extract_foreground_mask(image: np.ndarray, model_name: str = "u2net") -> Tup
     try:
         log.info(f"Extracting foreground mask using {model_name}")
         
+        height, width = image.shape[:2]
+        scale = inference_size / max(height, width) if inference_size else 1.0
+        if scale < 1.0:
+            small = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = image
+        
         # Convert BGR to RGB for rembg
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(rgb_image)
-        
-        # Remove background
-        result = remove(pil_image, model_name=model_name)
-        
-        # Convert result to numpy array
-        result_array = np.array(result)
-        
-        if result_array.shape[2] == 4:  # RGBA
-            # Extract alpha channel as mask
-            mask = result_array[:, :, 3]
-            # Convert RGB to BGR for consistency
-            foreground_bgr = cv2.cvtColor(result_array[:, :, :3], cv2.COLOR_RGB2BGR)
-            foreground_rgba = np.dstack([foreground_bgr, mask])
-        else:  # RGB
-            # Create mask from non-black pixels
-            gray = cv2.cvtColor(result_array, cv2.COLOR_RGB2GRAY)
-            mask = (gray > 10).astype(np.uint8) * 255
-            foreground_bgr = cv2.cvtColor(result_array, cv2.COLOR_RGB2BGR)
-            foreground_rgba = np.dstack([foreground_bgr, mask])
-        
-        log.info(f"Foreground extraction complete. Mask coverage: {np.sum(mask > 0) / mask.size * 100:.1f}%")
+        pil_image = Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        
+        # Only the alpha is needed; skip building the RGBA cutout
+        with model_manager.use(_session_name(model_name)) as session:
+            result = remove(pil_image, session=session, only_mask=True)
+        mask = np.array(result.convert("L"))
+        
+        if small is not image:
+            mask = upsample_mask(mask, image)
+        
+        foreground_rgba = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        foreground_rgba[:, :, 3] = mask
+        
+        log.info(f"Foreground extraction complete. Mask coverage: {cv2.countNonZero(mask) / mask.size * 100:.1f}%")
         return foreground_rgba, mask
         
     except Exception as e:
@@ -58,16 +172,21 @@ def refine_mask(mask: np.ndarray,
                 morph_kernel_size: int = 3,
                 close_iterations: int = 2,
                 open_iterations: int = 1,
-                blur_radius: int = 1) -> np.ndarray:
+                blur_radius: int = 1,
+                tile_size: int = 256) -> np.ndarray:
     """
     Refine mask using morphological operations and blurring.
     
+    Only tiles that contain the mask boundary are processed; solid interior
+    and exterior regions cannot change and are copied as-is.
+    
     Args:
         mask: Input binary mask
         morph_kernel_size: Size of morphological kernel
         close_iterations: Number of closing operations
         open_iterations: Number of opening operations
         blur_radius: Gaussian blur radius for edge softening
+        tile_size: Tile edge length for boundary processing
         
     Returns:
         Refined mask
@@ -78,16 +197,30 @@ def refine_mask(mask: np.ndarray,
         # Create morphological kernel
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph_kernel_size, morph_kernel_size))
         
-        # Fill holes with closing
-        refined = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=close_iterations)
-        
-        # Remove noise with opening
-        refined = cv2.morphologyEx(refined, cv2.MORPH_OPEN, kernel, iterations=open_iterations)
+        # How far any operation below can move a value; pixels further than
+        # this from the boundary are unchanged and copied straight through
+        reach = (morph_kernel_size // 2) * 2 * (close_iterations + open_iterations) + max(blur_radius, 0)
+        refined = mask.copy()
+        tiles = boundary_tiles(mask, reach, tile_size)
         
-        # Soften edges with gaussian blur
-        if blur_radius > 0:
-            refined = cv2.GaussianBlur(refined, (blur_radius * 2 + 1, blur_radius * 2 + 1), 0)
+        for tile in tiles:
+            y0, y1, x0, x1 = tile
+            py0, py1, px0, px1 = pad_tile(tile, reach, mask.shape)
+            region = mask[py0:py1, px0:px1]
+            
+            # Fill holes with closing
+            region = cv2.morphologyEx(region, cv2.MORPH_CLOSE, kernel, iterations=close_iterations)
+            
+            # Remove noise with opening
+            region = cv2.morphologyEx(region, cv2.MORPH_OPEN, kernel, iterations=open_iterations)
+            
+            # Soften edges with gaussian blur
+            if blur_radius > 0:
+                region = cv2.GaussianBlur(region, (blur_radius * 2 + 1, blur_radius * 2 + 1), 0)
+            
+            refined[y0:y1, x0:x1] = region[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
         
+        log.info(f"Refined mask on {len(tiles)} boundary tile(s)")
         return refined
         
     except Exception as e:
@@ -95,6 +228,18 @@ def refine_mask(mask: np.ndarray,
         raise
 
 
+def _detect_faces(face_cascade, gray: np.ndarray) -> Optional[np.ndarray]:
+    """Run the face detector, or return None if the cascade failed to load."""
+    if face_cascade.empty():
+        return None
+    return face_cascade.detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(30, 30)
+    )
+
+
 def create_face_preserve_region(image: np.ndarray, face_cascade_path: Optional[str] = None) -> Optional[np.ndarray]:
     """
     Detect faces and create a preservation mask.
@@ -107,27 +252,20 @@ def create_face_preserve_region(image: np.ndarray, face_cascade_path: Optional[s
         Face preservation mask or None if no faces detected
     """
     try:
-        # Use default OpenCV face cascade if none provided
+        # Convert to grayscale for face detection
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        # Use the managed default OpenCV face cascade if none provided
         if face_cascade_path is None:
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            with model_manager.use("face_cascade") as face_cascade, _face_cascade_lock:
+                faces = _detect_faces(face_cascade, gray)
         else:
-            face_cascade = cv2.CascadeClassifier(face_cascade_path)
+            faces = _detect_faces(cv2.CascadeClassifier(face_cascade_path), gray)
         
-        if face_cascade.empty():
+        if faces is None:
             log.warning("Could not load face cascade")
             return None
         
-        # Convert to grayscale for face detection
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
-        )
-        
         if len(faces) == 0:
             log.info("No faces detected")
             return None
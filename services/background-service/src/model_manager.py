@@ -0,0 +1,305 @@
+"""Lazy loading, memory budgeting and idle unloading for heavy models."""
+
+import gc
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import settings
+from .logger import log
+
+
+@dataclass
+class _ModelEntry:
+    """Registration and residency state of one model."""
+    name: str
+    loader: Callable[[], Any]
+    size_mb: float
+    unloader: Optional[Callable[[Any], None]] = None
+    instance: Any = None
+    loading: bool = False
+    in_use: int = 0
+    last_used: float = 0.0
+    load_seconds: float = 0.0
+    load_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ModelManager:
+    """
+    Load models on first use and keep the resident set within a memory budget.
+
+    Each model is registered with a loader and an estimated resident size.
+    Loading a model that would exceed the budget first unloads the least
+    recently used idle models; models idle for longer than ``idle_timeout_s``
+    are unloaded by a background reaper. Models pinned with :meth:`use` are
+    never unloaded while the block runs. A load in progress counts against
+    the budget, so concurrent loads of different models cannot overshoot it.
+    """
+
+    def __init__(self, memory_budget_mb: float, idle_timeout_s: float = 0):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout_s = idle_timeout_s
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self,
+                 name: str,
+                 loader: Callable[[], Any],
+                 size_mb: float,
+                 unloader: Optional[Callable[[Any], None]] = None) -> None:
+        """
+        Register a model. Registering an existing name is a no-op.
+
+        Args:
+            name: Model name used with :meth:`use` and on ``/health``
+            loader: Builds the model instance
+            size_mb: Estimated resident memory once loaded
+            unloader: Releases the instance's resources (optional)
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _ModelEntry(name, loader, size_mb, unloader)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def _entry(self, name: str) -> _ModelEntry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Model '{name}' is not registered")
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """
+        Load a model if needed and pin it for the duration of the block.
+
+        Args:
+            name: Registered model name
+
+        Yields:
+            The model instance
+        """
+        entry = self._entry(name)
+        while True:
+            with entry.load_lock:
+                if entry.instance is None:
+                    self._load(entry)
+            with self._lock:
+                # Re-check: the model may have been evicted between load and pin
+                if entry.instance is not None:
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    instance = entry.instance
+                    break
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def load(self, name: str) -> None:
+        """
+        Load a model if it is not resident, without pinning it.
+
+        Args:
+            name: Registered model name
+        """
+        entry = self._entry(name)
+        with entry.load_lock:
+            if entry.instance is None:
+                self._load(entry)
+
+    def _load(self, entry: _ModelEntry) -> None:
+        """Make room for and load a model. Caller holds the entry's load lock."""
+        self._release(self._make_room(entry))
+        log.info(f"Loading model '{entry.name}' (~{entry.size_mb:.0f} MB)")
+        start = time.monotonic()
+        try:
+            instance = entry.loader()
+        except BaseException:
+            with self._lock:
+                entry.loading = False
+            raise
+        with self._lock:
+            entry.instance = instance
+            entry.loading = False
+            entry.load_seconds = time.monotonic() - start
+            entry.last_used = time.monotonic()
+        log.info(f"Loaded model '{entry.name}' in {entry.load_seconds:.1f}s")
+
+    def _make_room(self, entry: _ModelEntry) -> List[Tuple[_ModelEntry, Any, str]]:
+        """
+        Reserve ``entry``'s size, detaching least recently used idle models until it fits the budget.
+
+        Returns:
+            Detached models for :meth:`_release`
+        """
+        detached = []
+        with self._lock:
+            resident = self._resident_mb()
+            victims = sorted(
+                (e for e in self._entries.values() if e.instance is not None and e.in_use == 0 and e is not entry),
+                key=lambda e: e.last_used
+            )
+            for victim in victims:
+                if resident + entry.size_mb <= self.memory_budget_mb:
+                    break
+                detached.append(self._detach(victim, "memory budget"))
+                resident -= victim.size_mb
+
+            if resident + entry.size_mb > self.memory_budget_mb:
+                log.warning(f"Loading '{entry.name}' exceeds the model memory budget "
+                            f"({resident + entry.size_mb:.0f} / {self.memory_budget_mb:.0f} MB); "
+                            f"remaining models are in use or loading")
+            entry.loading = True
+        return detached
+
+    def _resident_mb(self) -> float:
+        """Size of loaded models and of loads in progress. Caller holds the lock."""
+        return sum(e.size_mb for e in self._entries.values() if e.instance is not None or e.loading)
+
+    @staticmethod
+    def _detach(entry: _ModelEntry, reason: str) -> Tuple[_ModelEntry, Any, str]:
+        """Mark a model unloaded. Caller holds the lock and passes the result to :meth:`_release`."""
+        instance, entry.instance = entry.instance, None
+        return entry, instance, reason
+
+    @staticmethod
+    def _release(detached: List[Tuple[_ModelEntry, Any, str]]) -> None:
+        """Run unloaders and collect garbage for detached models. Called without the lock."""
+        if not detached:
+            return
+        while detached:
+            entry, instance, reason = detached.pop()
+            try:
+                if entry.unloader is not None:
+                    entry.unloader(instance)
+            except Exception as e:
+                log.warning(f"Error unloading model '{entry.name}': {e}")
+            del instance
+            log.info(f"Unloaded model '{entry.name}' ({reason})")
+        gc.collect()
+
+    def unload(self, name: str) -> bool:
+        """
+        Unload a model now unless it is in use.
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            True if the model was resident and has been unloaded
+        """
+        entry = self._entry(name)
+        with self._lock:
+            if entry.instance is None or entry.in_use:
+                return False
+            detached = [self._detach(entry, "requested")]
+        self._release(detached)
+        return True
+
+    def unload_idle(self, now: Optional[float] = None) -> List[str]:
+        """
+        Unload models unused for longer than the idle timeout.
+
+        Args:
+            now: Monotonic timestamp to compare against (defaults to now)
+
+        Returns:
+            Names of the unloaded models
+        """
+        if self.idle_timeout_s <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        detached = []
+        with self._lock:
+            for entry in self._entries.values():
+                if (entry.instance is not None and entry.in_use == 0
+                        and now - entry.last_used >= self.idle_timeout_s):
+                    detached.append(self._detach(entry, f"idle for {now - entry.last_used:.0f}s"))
+        unloaded = [entry.name for entry, _, _ in detached]
+        self._release(detached)
+        return unloaded
+
+    def start_reaper(self) -> None:
+        """Start the background thread that unloads idle models."""
+        if self.idle_timeout_s <= 0 or self._reaper is not None:
+            return
+        interval = min(60.0, max(1.0, self.idle_timeout_s / 4))
+
+        def reap():
+            while not self._stop.wait(interval):
+                self.unload_idle()
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def warmup(self, names: Iterable[str], background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load models ahead of the first request.
+
+        Args:
+            names: Registered model names, loaded in order
+            background: Load in a daemon thread instead of blocking
+
+        Returns:
+            The warm-up thread when ``background`` is set
+        """
+        names = [name for name in names if name]
+
+        def load_all():
+            for name in names:
+                try:
+                    self.load(name)
+                except Exception as e:
+                    log.warning(f"Warm-up of model '{name}' failed: {e}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        """Stop the reaper and unload every idle model."""
+        self._stop.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+        with self._lock:
+            detached = [
+                self._detach(entry, "shutdown")
+                for entry in self._entries.values() if entry.instance is not None and entry.in_use == 0
+            ]
+        self._release(detached)
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, resident models and their sizes for the health endpoint."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "budget_mb": self.memory_budget_mb,
+                "resident_mb": round(self._resident_mb()),
+                "resident": {
+                    e.name: {
+                        "size_mb": e.size_mb,
+                        "in_use": e.in_use,
+                        "idle_s": round(now - e.last_used),
+                        "load_s": round(e.load_seconds, 1)
+                    }
+                    for e in self._entries.values() if e.instance is not None
+                },
+                "registered": sorted(self._entries)
+            }
+
+
+# Global manager shared by the masking and generation modules
+model_manager = ModelManager(settings.model_memory_budget_mb, settings.model_idle_timeout_s)
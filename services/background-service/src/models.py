@@ -1,6 +1,6 @@
 """Pydantic models for request/response DTOs."""
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 from pydantic import BaseModel, Field, validator
 
@@ -14,13 +14,15 @@ class CleanupRequest(BaseModel):
     mode: BGMode = Field(default=BGMode.TRANSPARENT, description="Cleanup mode")
     blur_radius: int = Field(default=8, ge=1, le=50, description="Blur radius for soften mode")
     desaturate_pct: int = Field(default=25, ge=0, le=100, description="Desaturation percentage")
+    enhance_fg: bool = Field(default=True, description="Enhance foreground")
+    denoise: bool = Field(default=False, description="Apply denoising")
+    output_path: Optional[str] = Field(default=None, description="Output path (defaults to next to the input)")
+    mask_id: Optional[str] = Field(default=None, description="Mask id returned by an earlier call for the same image")
     
     @validator('image_path')
     def validate_image_path(cls, v):
-        """Validate that the image path exists."""
+        """Validate the image format; existence is checked after the SHARED_ROOTS allowlist."""
         path = Path(v)
-        if not path.exists():
-            raise ValueError(f"Image path does not exist: {v}")
         if not path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
             raise ValueError(f"Unsupported image format: {path.suffix}")
         return v
@@ -38,25 +40,22 @@ class ReplaceRequest(BaseModel):
     # SDXL specific parameters
     steps: Optional[int] = Field(default=20, ge=1, le=100, description="Number of inference steps")
     guidance_scale: Optional[float] = Field(default=7.5, ge=1.0, le=20.0, description="Guidance scale")
-    width: Optional[int] = Field(default=1024, ge=512, le=2048, description="Output width")
-    height: Optional[int] = Field(default=1024, ge=512, le=2048, description="Output height")
+    
+    # Compositing options
+    enhance_fg: bool = Field(default=True, description="Enhance foreground")
+    match_colors: bool = Field(default=True, description="Match colors between foreground and background")
+    feather_edges: bool = Field(default=True, description="Feather edges for smooth blending")
+    output_path: Optional[str] = Field(default=None, description="Output path (defaults to next to the input)")
+    mask_id: Optional[str] = Field(default=None, description="Mask id returned by an earlier call for the same image")
+    force_fresh: bool = Field(default=False, description="Always generate instead of using the background library")
     
     @validator('image_path')
     def validate_image_path(cls, v):
-        """Validate that the image path exists."""
+        """Validate the image format; existence is checked after the SHARED_ROOTS allowlist."""
         path = Path(v)
-        if not path.exists():
-            raise ValueError(f"Image path does not exist: {v}")
         if not path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
             raise ValueError(f"Unsupported image format: {path.suffix}")
         return v
-    
-    @validator('width', 'height')
-    def validate_dimensions(cls, v):
-        """Ensure dimensions are multiples of 8 for SDXL."""
-        if v % 8 != 0:
-            raise ValueError(f"Dimensions must be multiples of 8, got {v}")
-        return v
 
 
 class ProcessingResponse(BaseModel):
@@ -66,9 +65,11 @@ class ProcessingResponse(BaseModel):
     message: str = Field(..., description="Status message")
     
     # Output files
+    output_path: Optional[str] = Field(None, description="Path to the primary output file")
     out_png: Optional[str] = Field(None, description="Path to PNG output with transparency")
     out_jpg: Optional[str] = Field(None, description="Path to JPG output")
     mask_path: Optional[str] = Field(None, description="Path to the foreground mask")
+    mask_id: Optional[str] = Field(None, description="Id of the cached foreground mask, reusable in later calls")
     
     # Metadata
     meta: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
@@ -78,6 +79,16 @@ class ProcessingResponse(BaseModel):
     engine_used: Optional[str] = Field(None, description="Engine used for generation")
 
 
+class VariantsResponse(BaseModel):
+    """Response model for multi-prompt background replacement."""
+    
+    success: bool = Field(..., description="Whether the operation was successful")
+    message: str = Field(..., description="Status message")
+    mask_id: Optional[str] = Field(None, description="Id of the cached foreground mask shared by all variants")
+    results: List[ProcessingResponse] = Field(default_factory=list, description="One result per prompt, in request order")
+    processing_time: Optional[float] = Field(None, description="Processing time in seconds")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     
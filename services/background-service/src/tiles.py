@@ -0,0 +1,48 @@
+"""Tile grids for processing only the neighbourhood of a mask boundary."""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def boundary_tiles(mask: np.ndarray,
+                   pad: int,
+                   tile_size: int = 256,
+                   flat_values: Optional[Tuple[int, ...]] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    List the grid tiles whose neighbourhood is not a single flat value.
+    
+    A local operation reaching at most ``pad`` pixels cannot change a tile
+    whose padded neighbourhood is uniform, so only the returned tiles need
+    processing. Uses per-column min/max reductions rather than a
+    full-resolution band, so it costs roughly one read of the mask.
+    
+    Args:
+        mask: Mask (uint8)
+        pad: Reach of the operation in pixels
+        tile_size: Tile edge length in pixels
+        flat_values: Only skip uniform tiles with one of these values (any value if None)
+        
+    Returns:
+        Tiles as (y0, y1, x0, x1) half-open ranges
+    """
+    height, width = mask.shape[:2]
+    tiles = []
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        rows = mask[max(y0 - pad, 0):min(y1 + pad, height)]
+        col_min = rows.min(axis=0)
+        col_max = rows.max(axis=0)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            px0, px1 = max(x0 - pad, 0), min(x1 + pad, width)
+            low, high = col_min[px0:px1].min(), col_max[px0:px1].max()
+            if low != high or (flat_values is not None and low not in flat_values):
+                tiles.append((y0, y1, x0, x1))
+    return tiles
+
+
+def pad_tile(tile: Tuple[int, int, int, int], pad: int, shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """Grow a (y0, y1, x0, x1) tile by ``pad`` pixels, clamped to ``shape``."""
+    y0, y1, x0, x1 = tile
+    return max(y0 - pad, 0), min(y1 + pad, shape[0]), max(x0 - pad, 0), min(x1 + pad, shape[1])
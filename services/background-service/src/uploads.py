@@ -0,0 +1,172 @@
+"""Streaming upload handling: early size limits and zero-copy decoding."""
+
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Coroutine, Iterator, Tuple, Type, Union
+
+import numpy as np
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .io import content_digest, decode_image
+from .logger import log
+
+
+class SpoolingRequest(Request):
+    """
+    Request whose multipart files spool to disk above ``spool_bytes``.
+
+    Starlette writes each uploaded file into a ``SpooledTemporaryFile``; parts
+    larger than the threshold roll over to a temp file instead of staying on
+    the heap. The threshold is set on this request's parser only, so other
+    Starlette apps in the process keep their own.
+    """
+
+    def __init__(self, scope: Scope, receive: Receive, spool_bytes: int):
+        super().__init__(scope, receive)
+        self.spool_bytes = spool_bytes
+
+    async def _get_form(self, *, max_files: Union[int, float] = 1000,
+                        max_fields: Union[int, float] = 1000) -> FormData:
+        content_type = self.headers.get("content-type", "")
+        if self._form is None and content_type.startswith("multipart/form-data"):
+            parser = MultiPartParser(self.headers, self.stream(), max_files=max_files, max_fields=max_fields)
+            parser.max_file_size = self.spool_bytes
+            try:
+                self._form = await parser.parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields)
+
+
+def spooling_route(spool_bytes: int) -> Type[APIRoute]:
+    """
+    Build a route class that parses uploads with a :class:`SpoolingRequest`.
+
+    Args:
+        spool_bytes: In-memory spool limit per uploaded file
+
+    Returns:
+        Route class for ``APIRouter.route_class``
+    """
+    class SpoolingRoute(APIRoute):
+        def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+            handler = super().get_route_handler()
+
+            async def spooling_handler(request: Request) -> Response:
+                return await handler(SpoolingRequest(request.scope, request.receive, spool_bytes))
+
+            return spooling_handler
+
+    return SpoolingRoute
+
+
+class UploadLimitMiddleware:
+    """
+    Reject oversized uploads before their body is fully read.
+
+    Requests that declare a ``Content-Length`` above the limit are answered
+    with 413 without reading the body. Chunked requests are counted as they
+    stream in and aborted with 413 as soon as the limit is crossed.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str = "/background/"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http"
+                or scope["method"] != "POST"
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and int(content_length) > self.max_bytes:
+            log.warning(f"Rejected upload of {int(content_length)} bytes (limit {self.max_bytes})")
+            response = JSONResponse(status_code=413, content=self._error_body())
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    log.warning(f"Aborted streamed upload after {received} bytes (limit {self.max_bytes})")
+                    # Raised inside the request handler, so FastAPI turns it into a 413 response
+                    raise HTTPException(status_code=413, detail=self._error_body()["detail"])
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _error_body(self) -> dict:
+        return {
+            "success": False,
+            "error": "Payload too large",
+            "detail": f"Upload exceeds the {self.max_bytes / 1e6:.1f} MB limit"
+        }
+
+
+@contextmanager
+def upload_buffer(upload: UploadFile) -> Iterator[memoryview]:
+    """
+    Expose an uploaded file's contents as a memoryview without copying it.
+
+    Small uploads still in the in-memory spool are viewed directly; uploads
+    rolled over to disk are memory-mapped. The view is only valid inside the
+    ``with`` block.
+
+    Args:
+        upload: FastAPI upload
+
+    Yields:
+        Read-only view of the upload bytes
+    """
+    spooled = upload.file
+    # SpooledTemporaryFile keeps either a BytesIO or a real temp file in ``_file``
+    backing = getattr(spooled, "_file", spooled)
+
+    if isinstance(backing, io.BytesIO):
+        view = backing.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+        return
+
+    backing.flush()
+    if os.fstat(backing.fileno()).st_size == 0:
+        yield memoryview(b"")
+        return
+
+    with mmap.mmap(backing.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+def read_upload(upload: UploadFile) -> Tuple[np.ndarray, str]:
+    """
+    Decode an uploaded image straight from its spool buffer and hash its bytes.
+    
+    Args:
+        upload: FastAPI upload
+        
+    Returns:
+        Tuple of (BGR image array, content digest)
+    """
+    with upload_buffer(upload) as buffer:
+        return decode_image(buffer), content_digest(buffer)
@@ -0,0 +1,21 @@
+"""Keep test runs from writing into the service's media and log directories."""
+
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Settings, the logger and the app's mask cache read these at import time
+_RUN_DIR = Path(tempfile.mkdtemp(prefix="background-service-tests-"))
+for _name in ("OUTPUT_DIR", "LOG_DIR", "MASK_CACHE_DIR", "BG_LIBRARY_DIR"):
+    os.environ[_name] = str(_RUN_DIR / _name.lower())
+
+
+@pytest.fixture(autouse=True)
+def isolated_output_dir(tmp_path, monkeypatch):
+    """Write each test's results under its own tmp_path."""
+    from src.config import settings
+    monkeypatch.setattr(settings, "output_dir", tmp_path / "output")
+    settings.output_dir.mkdir()
+    return settings.output_dir
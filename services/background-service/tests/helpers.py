@@ -0,0 +1,23 @@
+"""Shared helpers for the background service tests."""
+
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def create_test_image(width: int = 256, height: int = 256) -> bytes:
+    """Create a test image as bytes."""
+    # Create a simple test image with a colored rectangle
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    # Add a colored rectangle in the center
+    cv2.rectangle(image, (width//4, height//4), (3*width//4, 3*height//4), (0, 255, 0), -1)
+    
+    # Convert to PIL and then to bytes
+    pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    img_byte_arr = io.BytesIO()
+    pil_image.save(img_byte_arr, format='JPEG')
+    img_byte_arr.seek(0)
+    
+    return img_byte_arr.getvalue()
@@ -0,0 +1,108 @@
+"""Tests for SDXL request batching and generation profiles."""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.generate import GenerationCoalescer, PROFILES, get_profile
+
+
+class _FakeGenerator:
+    """Records batched calls instead of running SDXL."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def generate_backgrounds(self, prompts, negative_prompt, width, height, steps, guidance_scale, seeds, max_batch):
+        self.calls.append({"prompts": prompts, "negatives": negative_prompt, "seeds": seeds, "size": (width, height)})
+        return [np.full((height, width, 3), seed or 0, dtype=np.uint8) for seed in seeds]
+
+
+class TestSDXLBatching:
+    """Test coalescing of concurrent SDXL requests."""
+    
+    def test_concurrent_requests_share_a_batch(self):
+        """Test same-shape requests from different callers run in one pipeline call."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        generator = _FakeGenerator()
+        coalescer = GenerationCoalescer(generator, max_batch=3, max_delay=5.0)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                futures = [
+                    pool.submit(coalescer.generate, [f"prompt {i}"], f"neg {i}", 64, 32, 20, 7.5, [i + 1])
+                    for i in range(3)
+                ]
+                results = [f.result(timeout=5) for f in futures]
+        finally:
+            coalescer.shutdown()
+        
+        # A full batch flushes without waiting out the delay
+        assert len(generator.calls) == 1
+        assert sorted(generator.calls[0]["seeds"]) == [1, 2, 3]
+        assert sorted(generator.calls[0]["negatives"]) == ["neg 0", "neg 1", "neg 2"]
+        # Every caller gets the image generated with its own seed
+        assert [int(r[0][0, 0, 0]) for r in results] == [1, 2, 3]
+    
+    def test_different_sizes_are_not_mixed(self):
+        """Test requests only batch with requests of the same size and settings."""
+        generator = _FakeGenerator()
+        coalescer = GenerationCoalescer(generator, max_batch=4, max_delay=0.05)
+        try:
+            small = coalescer.generate(["a", "b"], "", 32, 32, 20, 7.5, [1, 2])
+            large = coalescer.generate(["c"], "", 64, 64, 20, 7.5, [3])
+        finally:
+            coalescer.shutdown()
+        
+        assert [call["size"] for call in generator.calls] == [(32, 32), (64, 64)]
+        assert small[0].shape == (32, 32, 3) and large[0].shape == (64, 64, 3)
+        assert coalescer.stats()["batches"] == {2: 1, 1: 1}
+
+    
+    def test_shutdown_during_coalescing_delay(self, monkeypatch):
+        """Test shutting down while a batch waits out its delay stops the worker cleanly."""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        
+        errors = []
+        monkeypatch.setattr(threading, "excepthook", errors.append)
+        generator = _FakeGenerator()
+        coalescer = GenerationCoalescer(generator, max_batch=4, max_delay=30.0)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(coalescer.generate, ["a"], "", 32, 32, 20, 7.5, [1])
+            deadline = time.monotonic() + 5
+            while coalescer.stats()["pending"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            coalescer.shutdown()
+            
+            with pytest.raises(RuntimeError, match="shut down"):
+                future.result(timeout=5)
+        
+        assert not coalescer._worker.is_alive()
+        assert errors == [] and generator.calls == []
+
+class TestSDXLProfiles:
+    """Test fast-path generation profiles."""
+    
+    def test_fast_profiles_render_smaller_with_fewer_steps(self):
+        """Test reduced-resolution profiles keep the UNet's size constraints."""
+        assert get_profile("quality").render_size(1024, 1024) == (1024, 1024)
+        assert get_profile("cpu_fast").render_size(1024, 1024) == (512, 512)
+        
+        for profile in (p for p in PROFILES.values() if p.render_scale < 1):
+            width, height = profile.render_size(1920, 1080)
+            assert width % 64 == 0 and height % 64 == 0
+            assert 512 <= width <= 1920 and 512 <= height <= 1080
+        
+        assert get_profile("turbo").sampling(20, 7.5) == (4, 0.0)
+        assert get_profile("quality").sampling(20, 7.5) == (20, 7.5)
+    
+    def test_unknown_profile_is_rejected(self):
+        """Test a typo in SDXL_PROFILE fails loudly."""
+        with pytest.raises(ValueError, match="Unknown SDXL profile"):
+            get_profile("fastest")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
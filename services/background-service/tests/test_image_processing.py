@@ -0,0 +1,171 @@
+"""Tests for image decoding, masking, cleanup and compositing."""
+
+import cv2
+import numpy as np
+import pytest
+
+from src.io import load_image, decode_image, resolve_shared_path, RAW_HEADER, RAW_MAGIC
+from src.masking import extract_foreground_mask, refine_mask, upsample_mask
+from src.enhance import cleanup_background_transparent, cleanup_background_soften
+from src.composite import (
+    create_seamless_composite, adjust_lighting_consistency, fused_composite, masked_mean_std, blend_edges,
+    match_color_histograms
+)
+
+from helpers import create_test_image
+
+
+class TestImageProcessing:
+    """Test image processing functions."""
+    
+    def test_load_image(self):
+        """Test image loading."""
+        test_image_bytes = create_test_image(100, 100)
+        image = load_image(test_image_bytes)
+        
+        assert isinstance(image, np.ndarray)
+        assert image.shape == (100, 100, 3)
+        assert image.dtype == np.uint8
+    
+    def test_decode_raw_transport(self):
+        """Test raw RGB uploads decode to the same pixels without a codec."""
+        rgb = np.random.randint(0, 256, (12, 9, 3), dtype=np.uint8)
+        payload = RAW_HEADER.pack(RAW_MAGIC, 12, 9, 3) + rgb.tobytes()
+        
+        image = decode_image(payload)
+        
+        assert image.shape == (12, 9, 3)
+        assert np.array_equal(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), rgb)
+    
+    def test_decode_raw_transport_rejects_truncated_payload(self):
+        """Test malformed raw uploads are rejected."""
+        payload = RAW_HEADER.pack(RAW_MAGIC, 12, 9, 3) + b"\x00" * 10
+        
+        with pytest.raises(ValueError):
+            decode_image(payload)
+    
+    def test_resolve_shared_path(self, tmp_path):
+        """Test allowlist checks resolve '..' before comparing roots."""
+        root = tmp_path / "shared"
+        root.mkdir()
+        
+        assert resolve_shared_path(root / "a.jpg", [root.resolve()]) == (root / "a.jpg").resolve()
+        with pytest.raises(PermissionError):
+            resolve_shared_path(root / ".." / "a.jpg", [root.resolve()])
+        with pytest.raises(PermissionError):
+            resolve_shared_path(root / "a.jpg", [])
+    
+    def test_extract_foreground_mask(self):
+        """Test foreground mask extraction."""
+        test_image_bytes = create_test_image(100, 100)
+        image = load_image(test_image_bytes)
+        
+        mask = extract_foreground_mask(image)
+        
+        assert isinstance(mask, np.ndarray)
+        assert mask.shape == (100, 100)
+        assert mask.dtype == np.uint8
+        assert np.any(mask > 0)  # Should have some foreground pixels
+    
+    def test_upsample_mask_snaps_to_image_edges(self):
+        """Test guided upsampling puts the mask edge on the image edge."""
+        image = np.full((400, 400, 3), 200, dtype=np.uint8)
+        image[:, 203:] = 40
+        truth = np.zeros((400, 400), dtype=np.uint8)
+        truth[:, 203:] = 255
+        small = cv2.resize(truth, (40, 40), interpolation=cv2.INTER_AREA)
+        
+        mask = upsample_mask(small, image)
+        
+        assert mask.shape == (400, 400)
+        assert mask[200, 202] < 128 <= mask[200, 203]
+        # Solid regions away from the boundary are untouched
+        assert np.all(mask[:, :150] == 0)
+        assert np.all(mask[:, 260:] == 255)
+    
+    def test_tiled_refinement_matches_full_frame(self):
+        """Test boundary-tile refine_mask and blend_edges equal full-frame processing."""
+        mask = np.zeros((300, 400), dtype=np.uint8)
+        cv2.circle(mask, (200, 150), 90, 255, -1)
+        mask[10:14, 20:24] = 255  # speck for opening to remove
+        mask[250:290, 330:390] = 128  # flat partial-alpha region
+        foreground = np.random.randint(0, 256, (300, 400, 3), dtype=np.uint8)
+        background = np.random.randint(0, 256, (300, 400, 3), dtype=np.uint8)
+        
+        assert np.array_equal(refine_mask(mask, tile_size=64), refine_mask(mask, tile_size=1024))
+        assert np.array_equal(
+            blend_edges(foreground, background, mask, tile_size=64),
+            blend_edges(foreground, background, mask, tile_size=1024)
+        )
+    
+    def test_cleanup_background_transparent(self):
+        """Test transparent background cleanup."""
+        test_image_bytes = create_test_image(100, 100)
+        image = load_image(test_image_bytes)
+        mask = extract_foreground_mask(image)
+        
+        result = cleanup_background_transparent(image, mask)
+        
+        assert isinstance(result, np.ndarray)
+        assert result.shape == (100, 100, 4)  # Should have alpha channel
+        assert result.dtype == np.uint8
+    
+    def test_cleanup_background_soften(self):
+        """Test soften background cleanup."""
+        test_image_bytes = create_test_image(100, 100)
+        image = load_image(test_image_bytes)
+        mask = extract_foreground_mask(image)
+        
+        result = cleanup_background_soften(image, mask)
+        
+        assert isinstance(result, np.ndarray)
+        assert result.shape == (100, 100, 3)
+        assert result.dtype == np.uint8
+    
+    def test_masked_mean_std(self):
+        """Test masked statistics match NumPy over the selected pixels."""
+        image = np.random.randint(0, 256, (40, 50, 3), dtype=np.uint8)
+        mask = np.zeros((40, 50), dtype=np.uint8)
+        mask[10:30, 5:45] = 128
+        
+        mean, std = masked_mean_std(image, mask)
+        
+        selected = image[mask > 0].astype(np.float64)
+        assert np.allclose(mean, selected.mean(axis=0))
+        assert np.allclose(std, selected.std(axis=0))
+        with pytest.raises(ValueError):
+            masked_mean_std(image, np.zeros_like(mask))
+    
+    def test_composite_with_empty_mask_leaves_colours_unchanged(self):
+        """Test an all-zero foreground mask skips colour matching instead of raising."""
+        foreground = np.random.randint(0, 256, (60, 80, 3), dtype=np.uint8)
+        background = np.full((60, 80, 3), (40, 120, 200), dtype=np.uint8)
+        mask = np.zeros((60, 80), dtype=np.uint8)
+        
+        matched = match_color_histograms(foreground, background, source_mask=mask, target_mask=cv2.bitwise_not(mask))
+        composite = create_seamless_composite(foreground, background, mask, feather_edges=False)
+        
+        assert np.array_equal(matched, foreground)
+        assert np.array_equal(composite, background)
+    
+    def test_fused_composite_matches_legacy_path(self):
+        """Test the banded compositor agrees with composite + lighting."""
+        foreground = cv2.GaussianBlur(np.random.randint(0, 256, (120, 90, 3), dtype=np.uint8), (15, 15), 0)
+        background = np.full((120, 90, 3), (40, 120, 200), dtype=np.uint8)
+        mask = np.zeros((120, 90), dtype=np.uint8)
+        cv2.circle(mask, (45, 60), 30, 255, -1)
+        
+        expected = adjust_lighting_consistency(
+            create_seamless_composite(foreground, background, mask), mask
+        )
+        out = np.empty_like(foreground)
+        result = fused_composite(foreground, background, mask, band_rows=32, out=out)
+        
+        assert result is out
+        diff = np.abs(result.astype(np.int16) - expected.astype(np.int16))
+        assert diff.max() <= 6
+        assert diff.mean() < 1.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,72 @@
+"""Tests for the pre-rendered background library."""
+
+import numpy as np
+import pytest
+
+from src.library import BackgroundLibrary, build_library, fit_to_shape, lab_statistics, load_presets
+
+
+class TestBackgroundLibrary:
+    """Test the pre-rendered background library."""
+    
+    PROMPT = "professional photography studio with soft diffused lighting"
+    
+    @staticmethod
+    def _solid(width, height, bgr):
+        return np.full((height, width, 3), bgr, dtype=np.uint8)
+    
+    def test_best_match_prefers_aspect_then_colour(self, tmp_path):
+        """Test the pick favours matching aspect ratio, then foreground colour."""
+        library = BackgroundLibrary(tmp_path)
+        library.add(self._solid(128, 128, (200, 200, 200)), self.PROMPT, "text", seed=1)
+        library.add(self._solid(160, 96, (40, 40, 40)), self.PROMPT, "text", seed=2)
+        library.add(self._solid(160, 96, (210, 210, 210)), self.PROMPT, "text", seed=3)
+        
+        foreground_mean, _ = lab_statistics(self._solid(8, 8, (220, 220, 220)))
+        landscape = library.best_match(self.PROMPT, "text", (600, 1000), foreground_mean)
+        square = library.best_match(self.PROMPT, "text", (500, 500), foreground_mean)
+        
+        assert (landscape.seed, square.seed) == (3, 1)
+        assert library.best_match(self.PROMPT, "text", (600, 1000), exclude_seeds={3}).seed == 2
+        # Different negative prompts are different backgrounds
+        assert library.best_match(self.PROMPT, "", (500, 500)) is None
+        assert library.stats()["hits"] == 3 and library.stats()["misses"] == 1
+    
+    def test_loaded_background_is_cropped_not_stretched(self, tmp_path):
+        """Test stored backgrounds are centre-cropped to the target aspect ratio."""
+        background = np.zeros((100, 200, 3), dtype=np.uint8)
+        background[:, 50:150] = 255
+        
+        fitted = fit_to_shape(background, (50, 50))
+        
+        assert fitted.shape == (50, 50, 3)
+        assert fitted.min() == 255
+    
+    def test_build_renders_missing_seeds_and_index_reloads(self, tmp_path):
+        """Test the offline build is resumable and visible to a running service."""
+        presets_file = tmp_path / "presets.yaml"
+        presets_file.write_text(
+            "presets:\n"
+            f"  - name: studio\n    prompt: \"{self.PROMPT}\"\n    num_inference_steps: 4\n"
+        )
+        calls = []
+        
+        def fake_generate(prompts, negative_prompt, width, height, steps, guidance_scale, seeds):
+            calls.append(list(seeds))
+            return [self._solid(width, height, (seed, seed, seed)) for seed in seeds]
+        
+        serving = BackgroundLibrary(tmp_path / "lib")
+        builder = BackgroundLibrary(tmp_path / "lib")
+        presets = load_presets([presets_file])
+        
+        assert build_library(builder, presets, [1, 2], [(96, 64)], fake_generate) == 2
+        assert build_library(builder, presets, [1, 2, 3], [(96, 64)], fake_generate) == 1
+        assert calls == [[1, 2], [3]]
+        
+        entry = serving.best_match(self.PROMPT, "", (64, 96))
+        assert len(serving) == 3 and entry is not None
+        assert serving.load(entry, (40, 60)).shape == (40, 60, 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,69 @@
+"""Tests for the content-addressed mask cache."""
+
+import numpy as np
+import pytest
+
+from src.mask_cache import MaskCache
+
+
+class TestMaskCache:
+    """Test the content-addressed mask cache."""
+    
+    def test_key_depends_on_content_and_params(self):
+        """Test mask ids change with the image digest and mask parameters."""
+        key = MaskCache.make_key("abc", model="u2net", inference_size=1024)
+        
+        assert MaskCache.is_valid_id(key)
+        assert key == MaskCache.make_key("abc", inference_size=1024, model="u2net")
+        assert key != MaskCache.make_key("abd", model="u2net", inference_size=1024)
+        assert key != MaskCache.make_key("abc", model="u2net", inference_size=0)
+    
+    def test_masks_survive_restart_via_disk(self, tmp_path):
+        """Test a new cache instance reads masks persisted by an earlier one."""
+        mask = np.zeros((64, 48), dtype=np.uint8)
+        mask[10:50, 8:40] = 255
+        key = MaskCache.make_key("digest", model="u2net")
+        
+        MaskCache(tmp_path).put(key, mask)
+        cache = MaskCache(tmp_path)
+        
+        assert np.array_equal(cache.get(key), mask)
+        assert np.array_equal(cache.get(key), mask)
+        stats = cache.stats()
+        assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+    
+    def test_memory_lru_evicts_by_size(self, tmp_path):
+        """Test the in-memory LRU stays within its byte budget."""
+        cache = MaskCache(tmp_path, max_memory_mb=1)
+        for i in range(4):
+            cache.put(MaskCache.make_key(str(i)), np.zeros((512, 512), dtype=np.uint8))
+        
+        assert cache.stats()["memory_entries"] == 4
+        cache.put(MaskCache.make_key("big"), np.zeros((1024, 512), dtype=np.uint8))
+        
+        # The two least recently used masks make room for the larger one
+        assert cache.stats()["memory_entries"] == 3
+        assert cache.stats()["memory_mb"] <= 1.05
+    
+    def test_re_putting_a_mask_does_not_grow_disk_usage(self, tmp_path):
+        """Test overwriting a mask replaces its size in the disk total."""
+        cache = MaskCache(tmp_path)
+        key = MaskCache.make_key("digest")
+        mask = np.random.randint(0, 256, (64, 64), dtype=np.uint8)
+        
+        cache.put(key, mask)
+        cache.put(key, mask)
+        
+        assert cache._disk_bytes == cache._path(key).stat().st_size
+        assert not list(tmp_path.glob("*.tmp"))
+    
+    def test_rejects_malformed_ids(self, tmp_path):
+        """Test ids that are not cache keys never touch the filesystem."""
+        cache = MaskCache(tmp_path)
+        
+        assert cache.get("../../etc/passwd") is None
+        assert not MaskCache.is_valid_id("ABC")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
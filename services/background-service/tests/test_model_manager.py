@@ -0,0 +1,98 @@
+"""Tests for lazy model loading and eviction."""
+
+import time
+
+import pytest
+
+from src.model_manager import ModelManager
+
+
+class TestModelManager:
+    """Test lazy loading, budget eviction and idle unloading of models."""
+    
+    @staticmethod
+    def _manager(budget_mb=100, idle_timeout_s=0):
+        manager = ModelManager(budget_mb, idle_timeout_s)
+        loads = []
+        for name, size in (("a", 60), ("b", 30), ("c", 40)):
+            manager.register(name, lambda name=name: loads.append(name) or object(), size_mb=size)
+        return manager, loads
+    
+    def test_models_load_once_on_first_use(self):
+        """Test registration alone loads nothing and reuse does not reload."""
+        manager, loads = self._manager()
+        assert manager.stats()["resident"] == {}
+        
+        with manager.use("a") as first:
+            pass
+        with manager.use("a") as second:
+            assert second is first
+        assert loads == ["a"]
+        assert manager.stats()["resident"]["a"]["size_mb"] == 60
+    
+    def test_least_recently_used_model_is_evicted(self):
+        """Test loading past the budget unloads the least recently used idle model."""
+        manager, loads = self._manager()
+        manager.load("a")
+        manager.load("b")
+        with manager.use("a"):
+            pass
+        
+        # a + b + c = 130 MB > 100 MB: dropping b, the least recently used, is enough
+        manager.load("c")
+        assert sorted(manager.stats()["resident"]) == ["a", "c"]
+        assert manager.stats()["resident_mb"] == 100
+        assert loads == ["a", "b", "c"]
+    
+    def test_pinned_models_are_not_evicted(self):
+        """Test a model in use survives eviction and idle unloading."""
+        manager, loads = self._manager(idle_timeout_s=10)
+        with manager.use("a"):
+            manager.load("c")
+            assert manager.unload_idle(now=time.monotonic() + 60) == ["c"]
+            assert "a" in manager.stats()["resident"]
+        
+        assert manager.unload_idle(now=time.monotonic() + 60) == ["a"]
+        assert manager.stats()["resident_mb"] == 0
+    
+    def test_loads_in_progress_count_against_the_budget(self):
+        """Test a second load evicts room for one that has not finished yet."""
+        import threading
+        manager = ModelManager(100, 0)
+        started, release = threading.Event(), threading.Event()
+        
+        def slow_loader():
+            started.set()
+            release.wait(5)
+            return object()
+        
+        manager.register("a", slow_loader, size_mb=60)
+        manager.register("b", object, size_mb=30)
+        manager.register("c", object, size_mb=40)
+        manager.load("b")
+        loading = threading.Thread(target=manager.load, args=("a",))
+        loading.start()
+        started.wait(5)
+        
+        # 60 MB reserved for a + 30 MB for b: c only fits once b is unloaded
+        manager.load("c")
+        release.set()
+        loading.join(5)
+        assert sorted(manager.stats()["resident"]) == ["a", "c"]
+        assert manager.stats()["resident_mb"] == 100
+    
+    def test_unloaders_run_without_the_manager_lock(self):
+        """Test a slow unloader does not block other callers of the manager."""
+        unlocked = []
+        manager = ModelManager(100, 0)
+        manager.register("a", object, size_mb=10,
+                         unloader=lambda instance: unlocked.append(manager._lock.acquire(blocking=False)))
+        manager.load("a")
+        
+        assert manager.unload("a")
+        assert unlocked == [True]
+        manager._lock.release()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
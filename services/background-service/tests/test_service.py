@@ -1,40 +1,17 @@
 """Basic tests for the background processing service."""
 
 import pytest
-import numpy as np
-import cv2
 from pathlib import Path
 from fastapi.testclient import TestClient
-import io
-from PIL import Image
 
 from src.main import app
 from src.config import settings
-from src.io import load_image, save_image
-from src.masking import extract_foreground_mask
-from src.enhance import cleanup_background_transparent, cleanup_background_soften
 
+from helpers import create_test_image
 
-client = TestClient(app)
-
-
-def create_test_image(width: int = 256, height: int = 256) -> bytes:
-    """Create a test image as bytes."""
-    # Create a simple test image with a colored rectangle
-    image = np.zeros((height, width, 3), dtype=np.uint8)
-    # Add a colored rectangle in the center
-    cv2.rectangle(image, (width//4, height//4), (3*width//4, 3*height//4), (0, 255, 0), -1)
-    
-    # Convert to PIL and then to bytes
-    pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    img_byte_arr = io.BytesIO()
-    pil_image.save(img_byte_arr, format='JPEG')
-    img_byte_arr.seek(0)
-    
-    return img_byte_arr.getvalue()
 
+client = TestClient(app)
 
-import os
 
 class TestAPI:
     def test_rate_limiter(self, monkeypatch):
@@ -121,55 +98,125 @@ class TestAPI:
         
         assert response.status_code == 400
 
-
-class TestImageProcessing:
-    """Test image processing functions."""
-    
-    def test_load_image(self):
-        """Test image loading."""
-        test_image_bytes = create_test_image(100, 100)
-        image = load_image(test_image_bytes)
+    def test_cleanup_path_outside_shared_roots(self, tmp_path, monkeypatch):
+        """Test path handoff rejects files outside SHARED_ROOTS."""
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        outside = tmp_path / "outside.jpg"
+        outside.write_bytes(create_test_image(32, 32))
+        monkeypatch.setattr(settings, "shared_roots", str(shared))
         
-        assert isinstance(image, np.ndarray)
-        assert image.shape == (100, 100, 3)
-        assert image.dtype == np.uint8
-    
-    def test_extract_foreground_mask(self):
-        """Test foreground mask extraction."""
-        test_image_bytes = create_test_image(100, 100)
-        image = load_image(test_image_bytes)
-        
-        mask = extract_foreground_mask(image)
-        
-        assert isinstance(mask, np.ndarray)
-        assert mask.shape == (100, 100)
-        assert mask.dtype == np.uint8
-        assert np.any(mask > 0)  # Should have some foreground pixels
-    
-    def test_cleanup_background_transparent(self):
-        """Test transparent background cleanup."""
-        test_image_bytes = create_test_image(100, 100)
-        image = load_image(test_image_bytes)
-        mask = extract_foreground_mask(image)
+        response = client.post("/background/cleanup/path", json={"image_path": str(outside)})
         
-        result = cleanup_background_transparent(image, mask)
-        
-        assert isinstance(result, np.ndarray)
-        assert result.shape == (100, 100, 4)  # Should have alpha channel
-        assert result.dtype == np.uint8
-    
-    def test_cleanup_background_soften(self):
-        """Test soften background cleanup."""
-        test_image_bytes = create_test_image(100, 100)
-        image = load_image(test_image_bytes)
-        mask = extract_foreground_mask(image)
+        assert response.status_code == 403
+
+    def test_cleanup_path_checks_shared_roots_before_existence(self, tmp_path, monkeypatch):
+        """Test missing files are reported as forbidden outside SHARED_ROOTS and not found inside."""
+        import src.main as main
+
+        monkeypatch.setattr(main, "_consume_token", lambda: True)
+        monkeypatch.setattr(settings, "shared_roots", str(tmp_path / "shared"))
+
+        outside = client.post("/background/cleanup/path", json={"image_path": str(tmp_path / "missing.jpg")})
+        inside = client.post("/background/cleanup/path", json={"image_path": str(tmp_path / "shared" / "missing.jpg")})
+
+        assert outside.status_code == 403
+        assert inside.status_code == 404
+
+    def test_cleanup_path_writes_next_to_input(self, tmp_path, monkeypatch):
+        """Test path handoff reads from and writes to the shared volume."""
+        image_path = tmp_path / "product.jpg"
+        image_path.write_bytes(create_test_image())
+        monkeypatch.setattr(settings, "shared_roots", str(tmp_path))
         
-        result = cleanup_background_soften(image, mask)
+        response = client.post(
+            "/background/cleanup/path",
+            json={"image_path": str(image_path), "mode": "transparent"}
+        )
         
-        assert isinstance(result, np.ndarray)
-        assert result.shape == (100, 100, 3)
-        assert result.dtype == np.uint8
+        assert response.status_code == 200
+        output_path = Path(response.json()["output_path"])
+        assert output_path.parent == tmp_path
+        assert output_path.exists()
+
+    def test_replace_variants_share_mask_and_keep_order(self, tmp_path, monkeypatch):
+        """Test variants segment once and return one result per prompt in request order."""
+        import numpy as np
+        import src.main as main
+        from src.config import BGEngine
+        from src.library import BackgroundLibrary
+        from src.mask_cache import MaskCache
+
+        segmentations = []
+        generator_calls = []
+
+        def fake_extract(image, inference_size=None):
+            mask = np.zeros(image.shape[:2], dtype=np.uint8)
+            mask[8:-8, 8:-8] = 255
+            segmentations.append(image.shape)
+            return image, mask
+
+        def fake_generate(prompts, negative_prompt, width, height, steps, guidance_scale, seeds):
+            generator_calls.append((list(prompts), list(seeds)))
+            return [np.full((height, width, 3), 40 * (i + 1), dtype=np.uint8) for i in range(len(prompts))]
+
+        monkeypatch.setattr(main, "_consume_token", lambda: True)
+        monkeypatch.setattr(main, "extract_foreground_mask", fake_extract)
+        monkeypatch.setattr(main, "generate_backgrounds_sdxl", fake_generate)
+        monkeypatch.setattr(main, "mask_cache", MaskCache(tmp_path / "masks", 16, 16))
+        monkeypatch.setattr(main, "background_library", BackgroundLibrary(tmp_path / "library"))
+        monkeypatch.setattr(settings, "bg_engine", BGEngine.SDXL)
+        prompts = ["beach", "forest", "studio"]
+
+        response = client.post(
+            "/background/replace/variants",
+            files={"file": ("test.jpg", create_test_image(64, 48), "image/jpeg")},
+            data={"prompts": prompts, "seed": 7, "steps": 4}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(segmentations) == 1
+        assert generator_calls == [(prompts, [7, 8, 9])]
+        assert [r["meta"] for r in data["results"]] == [
+            {"prompt": "beach", "seed": 7}, {"prompt": "forest", "seed": 8}, {"prompt": "studio", "seed": 9}
+        ]
+        assert {r["mask_id"] for r in data["results"]} == {data["mask_id"]}
+        assert all(Path(r["output_path"]).exists() for r in data["results"])
+
+    def test_mask_id_only_reused_for_its_own_image(self, tmp_path, monkeypatch):
+        """Test a mask_id is accepted for the image it was issued for and rejected for others."""
+        import cv2
+        import numpy as np
+        import src.main as main
+        from src.mask_cache import MaskCache
+
+        segmentations = []
+
+        def fake_extract(image, inference_size=None):
+            segmentations.append(image.shape)
+            return image, np.full(image.shape[:2], 255, dtype=np.uint8)
+
+        monkeypatch.setattr(main, "_consume_token", lambda: True)
+        monkeypatch.setattr(main, "extract_foreground_mask", fake_extract)
+        monkeypatch.setattr(main, "mask_cache", MaskCache(tmp_path / "masks", 16, 16))
+        # Same dimensions, different content
+        image = create_test_image(64, 48)
+        other = cv2.imencode(".jpg", np.full((48, 64, 3), 200, dtype=np.uint8))[1].tobytes()
+
+        first = client.post("/background/cleanup", files={"file": ("a.jpg", image, "image/jpeg")})
+        mask_id = first.json()["mask_id"]
+        reused = client.post(
+            "/background/cleanup", files={"file": ("a.jpg", image, "image/jpeg")}, data={"mask_id": mask_id}
+        )
+        foreign = client.post(
+            "/background/cleanup", files={"file": ("b.jpg", other, "image/jpeg")}, data={"mask_id": mask_id}
+        )
 
+        assert first.status_code == 200 and reused.status_code == 200
+        assert reused.json()["mask_id"] == mask_id
+        assert foreign.status_code == 400
+        assert len(segmentations) == 1
 
 class TestConfiguration:
     """Test configuration settings."""
@@ -184,4 +231,4 @@ class TestConfiguration:
 
 
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,35 @@
+"""Tests for boundary tile selection."""
+
+import numpy as np
+import pytest
+
+from src.tiles import boundary_tiles, pad_tile
+
+
+class TestBoundaryTiles:
+    """Test tile selection around mask boundaries."""
+    
+    def test_boundary_tiles_skip_uniform_regions(self):
+        """Test only tiles crossing the mask edge are selected."""
+        mask = np.zeros((512, 512), dtype=np.uint8)
+        mask[:, 300:] = 255
+        
+        tiles = boundary_tiles(mask, 4, tile_size=128)
+        
+        assert tiles == [(y, y + 128, 256, 384) for y in range(0, 512, 128)]
+    
+    def test_flat_values_keep_uniform_partial_alpha(self):
+        """Test uniform tiles are only skipped when their value is listed as flat."""
+        mask = np.full((256, 256), 128, dtype=np.uint8)
+        
+        assert boundary_tiles(mask, 4, tile_size=128) == []
+        assert len(boundary_tiles(mask, 4, tile_size=128, flat_values=(0, 255))) == 4
+    
+    def test_pad_tile_clamps_to_shape(self):
+        """Test padded tiles stay inside the image."""
+        assert pad_tile((0, 128, 100, 228), 8, (200, 300)) == (0, 136, 92, 236)
+        assert pad_tile((128, 200, 256, 300), 8, (200, 300)) == (120, 200, 248, 300)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+"""Tests for upload size limits and spooled decoding."""
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
+
+from src.io import decode_image
+from src.uploads import UploadLimitMiddleware, spooling_route, upload_buffer
+
+from helpers import create_test_image
+
+
+class TestUploads:
+    """Test upload size limits and spooled decoding."""
+    
+    @staticmethod
+    def _limited_app(max_bytes: int):
+        from fastapi import FastAPI, File, UploadFile
+        limited = FastAPI()
+        limited.add_middleware(UploadLimitMiddleware, max_bytes=max_bytes)
+        
+        @limited.post("/background/cleanup")
+        async def upload(file: UploadFile = File(...)):
+            with upload_buffer(file) as buffer:
+                return {"size": len(buffer)}
+        
+        return limited
+    
+    def test_oversized_upload_rejected(self):
+        """Test Content-Length above the limit is rejected with 413."""
+        limited_client = TestClient(self._limited_app(1024))
+        response = limited_client.post(
+            "/background/cleanup",
+            files={"file": ("big.jpg", b"x" * 4096, "image/jpeg")}
+        )
+        assert response.status_code == 413
+    
+    def test_streamed_upload_rejected(self):
+        """Test a chunked body is cut off once it crosses the limit."""
+        limited_client = TestClient(self._limited_app(1024))
+        
+        def chunks():
+            for _ in range(8):
+                yield b"x" * 512
+        
+        response = limited_client.post(
+            "/background/cleanup",
+            content=chunks(),
+            headers={"content-type": "multipart/form-data; boundary=abc"}
+        )
+        assert response.status_code == 413
+    
+    def test_upload_within_limit(self):
+        """Test uploads under the limit reach the endpoint intact."""
+        limited_client = TestClient(self._limited_app(1024 * 1024))
+        response = limited_client.post(
+            "/background/cleanup",
+            files={"file": ("small.jpg", b"x" * 4096, "image/jpeg")}
+        )
+        assert response.status_code == 200
+        assert response.json()["size"] == 4096
+    
+    def test_spool_threshold_applies_to_routes_only(self):
+        """Test uploads above the route's spool threshold roll to disk without changing Starlette."""
+        from fastapi import FastAPI, File, UploadFile
+        default_threshold = MultiPartParser.max_file_size
+        spooling = FastAPI()
+        spooling.router.route_class = spooling_route(1024)
+        
+        @spooling.post("/background/cleanup")
+        async def upload(file: UploadFile = File(...)):
+            return {"rolled": file.file._rolled}
+        
+        spooling_client = TestClient(spooling)
+        big = spooling_client.post("/background/cleanup", files={"file": ("big.jpg", b"x" * 4096, "image/jpeg")})
+        small = spooling_client.post("/background/cleanup", files={"file": ("small.jpg", b"x" * 512, "image/jpeg")})
+        
+        assert big.json() == {"rolled": True}
+        assert small.json() == {"rolled": False}
+        assert MultiPartParser.max_file_size == default_threshold
+    
+    def test_upload_buffer_reads_rolled_spool(self):
+        """Test spooled uploads on disk are decoded through mmap."""
+        from tempfile import SpooledTemporaryFile
+        from fastapi import UploadFile
+        spooled = SpooledTemporaryFile(max_size=16)
+        spooled.write(create_test_image(64, 64))
+        spooled.seek(0)
+        
+        with upload_buffer(UploadFile(spooled, filename="test.jpg")) as buffer:
+            image = decode_image(buffer)
+        
+        assert image.shape == (64, 64, 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
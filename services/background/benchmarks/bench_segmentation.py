@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark generate_mask: first-call versus steady-state latency.
+
+"legacy" reproduces the old behaviour (load DeepLab ResNet-101 on every call,
+full-resolution inference); the other rows use the cached provider with the
+given backbone and inference size. Each configuration runs in a fresh
+subprocess so the first call includes the model load.
+
+Usage:
+    python benchmarks/bench_segmentation.py [--image photo.jpg] [--size 2048] [--repeat 5] [--threads 4]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent.parent
+CONFIGS = [
+    ("legacy", "resnet101", 0),
+    ("cached", "resnet101", 0),
+    ("cached", "resnet101", 520),
+    ("cached", "mobilenet_v3_large", 520),
+    ("cached", "mobilenet_v3_large", 320),
+]
+
+
+def _load_image(path, size):
+    from PIL import Image
+    if path:
+        return Image.open(path).convert("RGB")
+    import numpy as np
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (size * 3 // 4, size, 3), dtype=np.uint8))
+
+
+def _worker(mode, backbone, inference_size, image_path, size, repeat):
+    sys.path.insert(0, str(SERVICES_DIR))
+    import torch
+    import replace_background as rb
+
+    image = _load_image(image_path, size)
+    if mode == "legacy":
+        def run():
+            model = rb.deeplabv3_resnet101(pretrained=True)
+            model.eval()
+            with torch.no_grad():
+                model(rb.get_segmentation_provider().transform(image).unsqueeze(0))
+    else:
+        rb._segmentation_provider = rb.SegmentationModelProvider(backbone=backbone, inference_size=inference_size)
+        def run():
+            rb.generate_mask(image)
+
+    timings = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    steady = timings[1:]
+    return {
+        "mode": mode,
+        "backbone": backbone,
+        "inference": inference_size or "full",
+        "first_ms": round(timings[0] * 1000),
+        "steady_ms": round(sum(steady) / len(steady) * 1000),
+        "threads": torch.get_num_threads(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Image to segment (default: synthetic)")
+    parser.add_argument("--size", type=int, default=2048, help="Width of the synthetic image")
+    parser.add_argument("--repeat", type=int, default=5, help="Steady-state calls after the first")
+    parser.add_argument("--threads", type=int, help="BG_SEG_THREADS for every run")
+    parser.add_argument("--worker", nargs=3, metavar=("MODE", "BACKBONE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        mode, backbone, inference_size = args.worker
+        print(json.dumps(_worker(mode, backbone, int(inference_size), args.image, args.size, args.repeat)))
+        return
+
+    env = dict(os.environ)
+    if args.threads:
+        env["BG_SEG_THREADS"] = str(args.threads)
+        # The legacy path never reads BG_SEG_THREADS; OMP_NUM_THREADS applies to both
+        env["OMP_NUM_THREADS"] = str(args.threads)
+
+    print(f"{'mode':<8} {'backbone':<20} {'inference':>9} {'first ms':>9} {'steady ms':>10} {'threads':>8}")
+    for mode, backbone, inference_size in CONFIGS:
+        cmd = [sys.executable, __file__, "--worker", mode, backbone, str(inference_size),
+               "--size", str(args.size), "--repeat", str(args.repeat)]
+        if args.image:
+            cmd += ["--image", args.image]
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            print(f"{mode:<8} {backbone:<20} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        row = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{row['mode']:<8} {row['backbone']:<20} {str(row['inference']):>9} "
+              f"{row['first_ms']:>9} {row['steady_ms']:>10} {row['threads']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,171 @@
 #!/usr/bin/env python3
 import argparse
+import glob
 import json
 import sys
 import os
-from replace_background import replace_background
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from replace_background import replace_background, create_engine, load_segmentation_model
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+
+def output_path_for(in_path, root, out_dir, out_ext):
+    """Mirror `in_path` (relative to `root`) under `out_dir`."""
+    rel = os.path.relpath(in_path, root) if root else os.path.basename(in_path)
+    if out_ext:
+        rel = os.path.splitext(rel)[0] + out_ext
+    return os.path.join(out_dir, rel)
+
+def read_manifest(path, defaults):
+    """Jobs from a manifest: one input path or one JSON object per line.
+
+    JSON lines use the keys "in", "out", "preset", "mask", "seed" and "overrides";
+    missing keys fall back to the command-line values.
+    """
+    jobs = []
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                if "in" not in entry:
+                    raise ValueError(f"{path}:{line_no}: manifest entry needs \"in\"")
+            else:
+                entry = {"in": line}
+            jobs.append({**defaults, **entry})
+    return jobs
+
+def collect_jobs(args):
+    """Expand directories, globs and manifests into job dicts with input and output paths."""
+    defaults = {"preset": args.preset, "mask": args.mask_path, "seed": args.seed, "overrides": args.overrides}
+    jobs = []
+    for source in args.inputs:
+        if os.path.isdir(source):
+            root = source
+            pattern = os.path.join(source, "**", "*") if args.recursive else os.path.join(source, "*")
+            paths = glob.glob(pattern, recursive=args.recursive)
+        else:
+            root = None
+            paths = glob.glob(source, recursive=True)
+            if not paths:
+                raise FileNotFoundError(f"No inputs match {source}")
+        for path in sorted(paths):
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+                jobs.append({**defaults, "in": path, "root": root})
+
+    if args.manifest:
+        jobs.extend(read_manifest(args.manifest, defaults))
+
+    unique = {}
+    for job in jobs:
+        if not job.get("out"):
+            if not args.out_dir:
+                raise ValueError(f"No output for {job['in']}; pass --out-dir or set \"out\" in the manifest")
+            job["out"] = output_path_for(job["in"], job.get("root"), args.out_dir, args.out_ext)
+        if not job.get("preset"):
+            raise ValueError(f"No preset for {job['in']}; pass --preset or set it in the manifest")
+        # An output listed twice (e.g. a glob and the manifest) is only produced once
+        unique.setdefault(os.path.normpath(job["out"]), job)
+    return list(unique.values())
+
+def is_up_to_date(job):
+    """True when the output exists and is newer than its input and mask.
+
+    A missing input or mask counts as out of date, so the job runs and reports
+    its own error instead of aborting the batch.
+    """
+    sources = [job["in"]] + ([job["mask"]] if job.get("mask") else [])
+    try:
+        out_mtime = os.path.getmtime(job["out"])
+        return all(os.path.getmtime(source) <= out_mtime for source in sources)
+    except OSError:
+        return False
+
+def run_batch(args):
+    write_lock = threading.Lock()
+    def emit(record):
+        with write_lock:
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+
+    pending = []
+    for job in collect_jobs(args):
+        if args.force or not is_up_to_date(job):
+            pending.append(job)
+        else:
+            emit({"status": "skipped", "input": job["in"], "output": job["out"]})
+    if not pending:
+        return 0
+
+    # One engine and segmentation model shared by every image in the run
+    engine = create_engine(args.engine)
+    segmentation_model = load_segmentation_model() if any(not job.get("mask") for job in pending) else None
+
+    def process(job):
+        try:
+            os.makedirs(os.path.dirname(job["out"]) or ".", exist_ok=True)
+            result = replace_background(
+                in_path=job["in"],
+                out_path=job["out"],
+                preset=job["preset"],
+                prompt_overrides=job.get("overrides"),
+                mask_path=job.get("mask"),
+                seed=job.get("seed"),
+                engine=engine,
+                segmentation_model=segmentation_model
+            )
+            emit({"status": "ok", "input": job["in"], "output": job["out"], **result})
+            return True
+        except Exception as e:
+            emit({"status": "error", "input": job["in"], "output": job["out"], "error": str(e)})
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(process, pending))
+    return 0 if all(results) else 1
 
 def main():
     parser = argparse.ArgumentParser(description="Background replacement CLI")
-    parser.add_argument("--in", dest="in_path", required=True, help="Input image path")
-    parser.add_argument("--out", dest="out_path", required=True, help="Output image path")
-    parser.add_argument("--preset", required=True, help="Preset name")
+    parser.add_argument("--in", dest="in_path", help="Input image path")
+    parser.add_argument("--out", dest="out_path", help="Output image path")
+    parser.add_argument("--preset", help="Preset name (required unless every manifest entry sets one)")
     parser.add_argument("--mask", dest="mask_path", help="Mask image path")
     parser.add_argument("--engine", choices=["diffusion", "runway"], help="Engine to use")
     parser.add_argument("--seed", type=int, help="Random seed")
     parser.add_argument("--overrides", type=json.loads, help="JSON string of prompt overrides")
 
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--inputs", nargs="+", default=[], help="Input directories, files or glob patterns")
+    batch.add_argument("--manifest", help="File with one input path or JSON job per line")
+    batch.add_argument("--out-dir", help="Directory for batch outputs (input layout is mirrored)")
+    batch.add_argument("--out-ext", help="Output extension such as .png (default: keep the input's)")
+    batch.add_argument("--recursive", action="store_true", help="Descend into subdirectories of input directories")
+    batch.add_argument("--workers", type=int, default=1, help="Images processed concurrently")
+    batch.add_argument("--force", action="store_true", help="Reprocess outputs that are already up to date")
+
     args = parser.parse_args()
 
     # Set engine if provided
     if args.engine:
         os.environ["BG_REPLACE_ENGINE"] = args.engine
 
+    if args.inputs or args.manifest:
+        if args.in_path or args.out_path:
+            parser.error("--in/--out cannot be combined with --inputs/--manifest")
+        if args.inputs and not args.out_dir:
+            parser.error("--inputs requires --out-dir")
+        try:
+            sys.exit(run_batch(args))
+        except Exception as e:
+            print(json.dumps({"error": str(e)}), file=sys.stderr)
+            sys.exit(1)
+
+    if not args.in_path or not args.out_path or not args.preset:
+        parser.error("--in, --out and --preset are required outside batch mode")
+
     try:
         result = replace_background(
             in_path=args.in_path,
@@ -37,4 +182,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
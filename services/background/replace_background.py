@@ -3,6 +3,7 @@ import hashlib
 import time
 import logging
 import io
+import threading
 from typing import Dict, Optional, Any
 from abc import ABC, abstractmethod
 import yaml
@@ -10,7 +11,7 @@ import numpy as np
 from PIL import Image
 import torch
 import torchvision.transforms as T
-from torchvision.models.segmentation import deeplabv3_resnet101
+from torchvision.models.segmentation import deeplabv3_resnet101, deeplabv3_mobilenet_v3_large
 import cv2
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
@@ -24,16 +25,79 @@ logHandler.setFormatter(formatter)
 logger.addHandler(logHandler)
 logger.setLevel(logging.INFO)
 
-# Load presets
-with open(os.path.join(os.path.dirname(__file__), 'presets.yaml'), 'r') as f:
-    PRESETS = yaml.safe_load(f)
+PRESETS_PATH = os.path.join(os.path.dirname(__file__), 'presets.yaml')
+
+class PresetRegistry:
+    """Presets from presets.yaml indexed by name.
+
+    Each preset is merged over the file's `defaults` section (and the built-in
+    REQUIRED_DEFAULTS) and validated once when the registry is built.
+    """
+
+    REQUIRED_FIELDS = ("prompt", "negative_prompt", "guidance_scale", "strength")
+    REQUIRED_DEFAULTS = {"strength": 0.8}
+
+    def __init__(self, presets: Dict[str, Dict[str, Any]]):
+        self._presets = presets
+
+    @classmethod
+    def from_file(cls, path: str = PRESETS_PATH) -> "PresetRegistry":
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+        entries = data.get("presets")
+        if not isinstance(entries, list):
+            raise ValueError(f"{path}: expected a 'presets' list")
+        defaults = {**cls.REQUIRED_DEFAULTS, **(data.get("defaults") or {})}
+
+        presets = {}
+        for index, entry in enumerate(entries):
+            name = entry.get("name") if isinstance(entry, dict) else None
+            if not name:
+                raise ValueError(f"{path}: preset #{index} has no name")
+            if name in presets:
+                raise ValueError(f"{path}: duplicate preset {name}")
+            config = {**defaults, **entry}
+            missing = [field for field in cls.REQUIRED_FIELDS if config.get(field) is None]
+            if missing:
+                raise ValueError(f"{path}: preset {name} is missing {', '.join(missing)}")
+            if not isinstance(config["guidance_scale"], (int, float)):
+                raise ValueError(f"{path}: preset {name} guidance_scale must be a number")
+            if not isinstance(config["strength"], (int, float)) or not 0 < config["strength"] <= 1:
+                raise ValueError(f"{path}: preset {name} strength must be in (0, 1]")
+            presets[name] = config
+        return cls(presets)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._presets
+
+    def names(self):
+        return list(self._presets)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """Return a copy of the preset, safe for the caller to modify."""
+        if name not in self._presets:
+            raise ValueError(f"Preset {name} not found")
+        return dict(self._presets[name])
+
+_preset_registry: Optional[PresetRegistry] = None
+
+def get_preset_registry() -> PresetRegistry:
+    """Registry for presets.yaml, built on first use and reused afterwards."""
+    global _preset_registry
+    if _preset_registry is None:
+        _preset_registry = PresetRegistry.from_file()
+    return _preset_registry
 
 class BackgroundReplaceEngine(ABC):
+    name: str = ""
+
     @abstractmethod
     def replace_background(self, image: Image.Image, mask: Image.Image, prompt: str, negative_prompt: str, guidance_scale: float, strength: float, seed: Optional[int]) -> Image.Image:
         pass
 
 class DiffusionEngine(BackgroundReplaceEngine):
+    name = "diffusion"
+
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu")
         # Load model - simplified, in practice load appropriate inpaint model
@@ -52,6 +116,8 @@ class DiffusionEngine(BackgroundReplaceEngine):
         return image  # Placeholder
 
 class RunwayEngine(BackgroundReplaceEngine):
+    name = "runway"
+
     def __init__(self):
         self.api_key = os.getenv("RUNWAY_API_KEY")
         if not self.api_key:
@@ -75,31 +141,119 @@ class RunwayEngine(BackgroundReplaceEngine):
         # Placeholder
         return image
 
-def generate_mask(image: Image.Image) -> Image.Image:
-    # Use DeepLab for foreground segmentation
-    model = deeplabv3_resnet101(pretrained=True)
-    model.eval()
-    transform = T.Compose([
-        T.ToTensor(),
-        T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
-    input_tensor = transform(image).unsqueeze(0)
-    with torch.no_grad():
-        output = model(input_tensor)['out'][0]
-    output_predictions = output.argmax(0).byte().cpu().numpy()
+def create_engine(engine_name: Optional[str] = None) -> BackgroundReplaceEngine:
+    """Build the engine named by `engine_name` or BG_REPLACE_ENGINE (default "diffusion")."""
+    engine_name = engine_name or os.getenv("BG_REPLACE_ENGINE", "diffusion")
+    if engine_name == "diffusion":
+        return DiffusionEngine()
+    if engine_name == "runway":
+        return RunwayEngine()
+    raise ValueError(f"Unknown engine {engine_name}")
+
+PERSON_CLASS = 15  # person in the COCO/VOC label set DeepLab is trained on
+
+SEGMENTATION_BACKBONES = {
+    "resnet101": deeplabv3_resnet101,
+    "mobilenet_v3_large": deeplabv3_mobilenet_v3_large,
+}
+
+class SegmentationModelProvider:
+    """Lazily loaded, process-wide DeepLab model for generate_mask.
+
+    The model is built on first use and reused by every later call (and every
+    thread). Inference runs at `inference_size` on the longest side and the
+    person score is upsampled to the input resolution before thresholding.
+
+    Configuration (constructor arguments override the environment):
+    - BG_SEG_BACKBONE: "resnet101" (default) or "mobilenet_v3_large"
+    - BG_SEG_INFERENCE_SIZE: longest side used for inference, 0 for full resolution (default 520)
+    - BG_SEG_THREADS: torch intra-op threads, unset to keep torch's default
+    """
+
+    def __init__(self, backbone: Optional[str] = None, inference_size: Optional[int] = None, num_threads: Optional[int] = None):
+        self.backbone = backbone or os.getenv("BG_SEG_BACKBONE", "resnet101")
+        if self.backbone not in SEGMENTATION_BACKBONES:
+            raise ValueError(f"Unknown segmentation backbone {self.backbone}, expected one of {sorted(SEGMENTATION_BACKBONES)}")
+        self.inference_size = inference_size if inference_size is not None else int(os.getenv("BG_SEG_INFERENCE_SIZE", "520"))
+        threads = os.getenv("BG_SEG_THREADS")
+        self.num_threads = num_threads if num_threads is not None else (int(threads) if threads else None)
+        self.transform = T.Compose([
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ])
+        self._model: Optional[torch.nn.Module] = None
+        self._lock = threading.Lock()
+
+    def get_model(self) -> torch.nn.Module:
+        """Return the model, loading it on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start_time = time.time()
+                    if self.num_threads:
+                        torch.set_num_threads(self.num_threads)
+                    model = SEGMENTATION_BACKBONES[self.backbone](pretrained=True)
+                    model.eval()
+                    self._model = model
+                    logger.info("Segmentation model loaded", extra={
+                        "backbone": self.backbone,
+                        "load_ms": int((time.time() - start_time) * 1000)
+                    })
+        return self._model
+
+    def predict_foreground(self, image: Image.Image, model: Optional[torch.nn.Module] = None) -> np.ndarray:
+        """Boolean person mask at the image's full resolution."""
+        model = model if model is not None else self.get_model()
+        width, height = image.size
+        small = image
+        if self.inference_size and max(width, height) > self.inference_size:
+            scale = self.inference_size / max(width, height)
+            small = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+
+        input_tensor = self.transform(small).unsqueeze(0)
+        with torch.inference_mode():
+            logits = model(input_tensor)['out'][0]
+            # Person score relative to the best other class: > 0 exactly where argmax is person
+            others = torch.cat([logits[:PERSON_CLASS], logits[PERSON_CLASS + 1:]])
+            score = (logits[PERSON_CLASS] - others.max(0).values)[None, None]
+            if small is not image:
+                # Upsampling one score plane instead of every class keeps memory flat
+                score = torch.nn.functional.interpolate(score, size=(height, width), mode="bilinear", align_corners=False)
+        return (score[0, 0] > 0).cpu().numpy()
+
+_segmentation_provider: Optional[SegmentationModelProvider] = None
+_segmentation_provider_lock = threading.Lock()
+
+def get_segmentation_provider() -> SegmentationModelProvider:
+    """Process-wide provider configured from the environment on first use."""
+    global _segmentation_provider
+    if _segmentation_provider is None:
+        with _segmentation_provider_lock:
+            if _segmentation_provider is None:
+                _segmentation_provider = SegmentationModelProvider()
+    return _segmentation_provider
+
+def load_segmentation_model() -> torch.nn.Module:
+    """Load (once) and return the DeepLab model used by generate_mask."""
+    return get_segmentation_provider().get_model()
+
+def generate_mask(image: Image.Image, model: Optional[torch.nn.Module] = None) -> Image.Image:
+    # Use DeepLab for foreground segmentation; the shared model is loaded on first use
+    foreground_mask = get_segmentation_provider().predict_foreground(image, model).astype(np.uint8)
     # Create mask: 1 for background (to inpaint), 0 for foreground (person)
-    foreground_mask = (output_predictions == 15).astype(np.uint8)  # 15 is person class in COCO
     background_mask = 1 - foreground_mask  # Invert: 1 where no person
-    mask_img = Image.fromarray(background_mask * 255, mode='L').resize(image.size, Image.NEAREST)
-    return mask_img
+    return Image.fromarray(background_mask * 255, mode='L')
+
+def replace_background(in_path: str, out_path: str, preset: str, prompt_overrides: Optional[Dict[str, Any]] = None, mask_path: Optional[str] = None, seed: Optional[int] = None, engine: Optional[BackgroundReplaceEngine] = None, segmentation_model: Optional[torch.nn.Module] = None) -> Dict[str, Any]:
+    """Replace the background of one image.
 
-def replace_background(in_path: str, out_path: str, preset: str, prompt_overrides: Optional[Dict[str, Any]] = None, mask_path: Optional[str] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    `engine` and `segmentation_model` let batch callers reuse instances across
+    images; when omitted they are created for this call.
+    """
     start_time = time.time()
 
     # Load preset
-    if preset not in PRESETS:
-        raise ValueError(f"Preset {preset} not found")
-    config = PRESETS[preset].copy()
+    config = get_preset_registry().get(preset)
 
     # Apply overrides
     if prompt_overrides:
@@ -112,24 +266,26 @@ def replace_background(in_path: str, out_path: str, preset: str, prompt_override
         np.random.seed(seed)
         torch.manual_seed(seed)
 
-    # Load image
-    image = Image.open(in_path).convert("RGB")
+    # Load image, hashing the same bytes so the file is only read once
+    with open(in_path, "rb") as f:
+        data = f.read()
+    input_hash = hashlib.sha256(data).hexdigest()
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    del data
 
     # Generate or load mask
     if mask_path:
         mask = Image.open(mask_path).convert("L")
     else:
-        mask = generate_mask(image)
+        mask = generate_mask(image) if segmentation_model is None else generate_mask(image, segmentation_model)
         mask.save(out_path + ".mask.png")
 
     # Select engine
-    engine_name = os.getenv("BG_REPLACE_ENGINE", "diffusion")
-    if engine_name == "diffusion":
-        engine = DiffusionEngine()
-    elif engine_name == "runway":
-        engine = RunwayEngine()
+    if engine is None:
+        engine_name = os.getenv("BG_REPLACE_ENGINE", "diffusion")
+        engine = create_engine(engine_name)
     else:
-        raise ValueError(f"Unknown engine {engine_name}")
+        engine_name = engine.name
 
     # Replace background
     result_image = engine.replace_background(
@@ -145,10 +301,6 @@ def replace_background(in_path: str, out_path: str, preset: str, prompt_override
     # Save result
     result_image.save(out_path)
 
-    # Calculate hash
-    with open(in_path, "rb") as f:
-        input_hash = hashlib.sha256(f.read()).hexdigest()
-
     elapsed_ms = int((time.time() - start_time) * 1000)
 
     logger.info("Background replacement completed", extra={
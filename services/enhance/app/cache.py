@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Different filesystem or no hard link support
+        shutil.copy2(source, destination)
+
+
+class ResultCache:
+    """Content-addressed store of provider results under ``assets_root/cache``.
+
+    Each entry is the output file plus a JSON sidecar with its metadata. Entries
+    are hard-linked in and out, so a hit costs no copy and evicting an entry
+    never touches assets already handed out. An in-memory index ordered by last
+    use drives least-recently-used eviction once the cached files exceed
+    ``max_bytes``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    @staticmethod
+    def key(image_hash: str, operation: str, instruction: str, model: str, backend: str, **extra: Any) -> str:
+        """Cache key for one provider call on one source image."""
+        parts = {
+            "image": image_hash,
+            "operation": operation,
+            "instruction": instruction,
+            "model": model,
+            "backend": backend,
+            **extra,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, destination: Path) -> Optional[Dict[str, Any]]:
+        """Link the cached result to ``destination`` and return its metadata, or None on a miss."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        filename, _ = entry
+        try:
+            metadata = json.loads((self.root / f"{key}.json").read_text(encoding="utf-8"))["metadata"]
+            _link_or_copy(self.root / filename, destination)
+        except (OSError, ValueError, KeyError):
+            # Evicted or damaged between the index lookup and the read
+            self._forget(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(self.root / f"{key}.json")
+        with self._lock:
+            self.hits += 1
+        return metadata
+
+    def put(self, key: str, source: Path, metadata: Dict[str, Any]) -> None:
+        filename = f"{key}{source.suffix}"
+        target = self.root / filename
+        # Write under hidden temporary names, then rename, so readers never see partial entries
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp = self.root / f".{filename}.{suffix}"
+        _link_or_copy(source, tmp)
+        os.replace(tmp, target)
+        sidecar = self.root / f"{key}.json"
+        tmp_sidecar = self.root / f".{key}.json.{suffix}"
+        tmp_sidecar.write_text(json.dumps({"file": filename, "metadata": metadata}), encoding="utf-8")
+        os.replace(tmp_sidecar, sidecar)
+
+        size = target.stat().st_size
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._index[key] = (filename, size)
+            self._total_bytes += size
+            evicted = self._evict_locked()
+        for old_key, old_filename in evicted:
+            self._remove_files(old_key, old_filename)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _load_index(self) -> None:
+        entries = []
+        for sidecar in self.root.glob("*.json"):
+            try:
+                filename = json.loads(sidecar.read_text(encoding="utf-8"))["file"]
+                size = (self.root / filename).stat().st_size
+                entries.append((sidecar.stat().st_mtime, sidecar.stem, filename, size))
+            except (OSError, ValueError, KeyError):
+                sidecar.unlink(missing_ok=True)
+        for _, key, filename, size in sorted(entries):
+            self._index[key] = (filename, size)
+            self._total_bytes += size
+        for old_key, old_filename in self._evict_locked():
+            self._remove_files(old_key, old_filename)
+
+    def _evict_locked(self) -> list[Tuple[str, str]]:
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            old_key, (old_filename, old_size) = self._index.popitem(last=False)
+            self._total_bytes -= old_size
+            evicted.append((old_key, old_filename))
+        return evicted
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+        if entry is not None:
+            self._remove_files(key, entry[0])
+
+    def _remove_files(self, key: str, filename: str) -> None:
+        (self.root / f"{key}.json").unlink(missing_ok=True)
+        (self.root / filename).unlink(missing_ok=True)
+
+
+__all__ = ["ResultCache", "hash_bytes"]
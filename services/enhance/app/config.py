@@ -20,6 +20,27 @@ class Settings(BaseSettings):
     real_esrgan_bin: str | None = Field(default=None)
     codeformer_bin: str | None = Field(default=None)
     default_preset: str = Field(default="enhance_cinematic")
+    http_timeout: float = Field(default=30.0)
+    http_max_connections: int = Field(default=100)
+    http_max_keepalive_connections: int = Field(default=20)
+    http_keepalive_expiry: float = Field(default=30.0)
+    http2: bool = Field(default=True)
+    max_download_bytes: int = Field(default=50 * 1024 * 1024)
+    gemini_timeout: float = Field(default=60.0)
+    gemini_transport_format: str = Field(default="png")
+    gemini_png_compress_level: int = Field(default=1)
+    gemini_jpeg_quality: int = Field(default=95)
+    result_cache_enabled: bool = Field(default=True)
+    result_cache_max_bytes: int = Field(default=2 * 1024 * 1024 * 1024)
+    output_format: str = Field(default="png")
+    output_quality: int = Field(default=90)
+    output_compress_level: int = Field(default=1)
+    encode_workers: int = Field(default=2)
+    jobs_db_path: Path | None = Field(default=None)
+    job_workers: int = Field(default=4)
+    job_queue_size: int = Field(default=1000)
+    webhook_timeout: float = Field(default=10.0)
+    webhook_attempts: int = Field(default=3)
 
     model_config = SettingsConfigDict(
         env_file=".env",
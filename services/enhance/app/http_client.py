@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import importlib.util
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .config import Settings
+
+
+def create_http_client(settings: Settings) -> httpx.AsyncClient:
+    """Pooled client shared by every outbound request for the app's lifetime."""
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    # HTTP/2 needs the optional h2 package (httpx[http2]); fall back to HTTP/1.1 without it
+    http2 = settings.http2 and importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.http_timeout),
+        limits=limits,
+        http2=http2,
+        follow_redirects=True,
+    )
+
+
+async def fetch_image_bytes(
+    url: str,
+    client: Optional[httpx.AsyncClient] = None,
+    max_bytes: Optional[int] = None,
+) -> bytes:
+    if client is None:
+        async with httpx.AsyncClient(timeout=30.0) as temporary:
+            return await fetch_image_bytes(url, temporary, max_bytes)
+
+    async with client.stream("GET", str(url)) as response:
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            raise HTTPException(status_code=response.status_code, detail=str(exc)) from exc
+        declared = response.headers.get("content-length")
+        if max_bytes and declared and declared.isdigit() and int(declared) > max_bytes:
+            raise HTTPException(status_code=413, detail="Remote image exceeds the maximum download size")
+        buffer = bytearray()
+        async for chunk in response.aiter_bytes():
+            buffer += chunk
+            if max_bytes and len(buffer) > max_bytes:
+                raise HTTPException(status_code=413, detail="Remote image exceeds the maximum download size")
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Remote image download returned no data")
+    return bytes(buffer)
+
+
+__all__ = ["create_http_client", "fetch_image_bytes"]
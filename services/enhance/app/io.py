@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import io
+import os
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from PIL import Image
 
@@ -22,9 +24,108 @@ def ensure_asset_dir(settings: Settings, asset_id: str) -> Tuple[Path, str]:
     return base, today
 
 
-def save_image(image: Image.Image, destination: Path) -> None:
+# format name -> (Pillow format, file extension, MIME type)
+OUTPUT_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "png": ("PNG", ".png", "image/png"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+}
+_FORMAT_ALIASES = {"jpg": "jpeg"}
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """How a result is encoded.
+
+    ``quality`` applies to JPEG and lossy WebP. ``compress_level`` is the
+    encoder effort: the zlib level for PNG (0-9) and the method for WebP
+    (0-6; higher values are capped).
+    """
+
+    format: str = "png"
+    quality: int = 90
+    compress_level: int = 1
+    lossless: bool = False
+
+    def __post_init__(self) -> None:
+        name = _FORMAT_ALIASES.get(self.format.lower(), self.format.lower())
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"unsupported output format {self.format!r}; expected one of {sorted(OUTPUT_FORMATS)}")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("output quality must be between 1 and 100")
+        if not 0 <= self.compress_level <= 9:
+            raise ValueError("output compression level must be between 0 and 9")
+        object.__setattr__(self, "format", name)
+
+    @property
+    def extension(self) -> str:
+        return OUTPUT_FORMATS[self.format][1]
+
+    @property
+    def mime_type(self) -> str:
+        return OUTPUT_FORMATS[self.format][2]
+
+    def save_options(self) -> Dict[str, Any]:
+        if self.format == "png":
+            return {"compress_level": self.compress_level}
+        if self.format == "webp":
+            return {"quality": self.quality, "method": min(self.compress_level, 6), "lossless": self.lossless}
+        return {"quality": self.quality}
+
+    def cache_parts(self) -> Dict[str, Any]:
+        return {"format": self.format, **self.save_options()}
+
+
+def save_image(image: Image.Image, destination: Path, output_format: Optional[OutputFormat] = None) -> int:
+    """Encode ``image`` to ``destination`` and return the file size.
+
+    Opaque images are written without an alpha channel; JPEG has none, so
+    transparent images are flattened onto white. The file is written under a
+    temporary name and renamed so the output URL never serves a partial file.
+    """
+    output_format = output_format or OutputFormat()
     destination.parent.mkdir(parents=True, exist_ok=True)
-    image.save(destination, format="PNG")
+    transparent = _has_transparency(image)
+    if output_format.format == "jpeg" and transparent:
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", image.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != ("RGBA" if transparent else "RGB"):
+        image = image.convert("RGBA" if transparent else "RGB")
+    tmp = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    image.save(tmp, format=OUTPUT_FORMATS[output_format.format][0], **output_format.save_options())
+    os.replace(tmp, destination)
+    return destination.stat().st_size
+
+
+def encode_for_transport(image: Image.Image, fmt: str = "png", png_compress_level: int = 1, jpeg_quality: int = 95) -> Tuple[bytes, str]:
+    """Encode an image for upload to a provider; returns the bytes and their MIME type.
+
+    PNG uses a low zlib level since the payload is only sent once. JPEG is used
+    only when requested and the image has no transparency to lose.
+    """
+    buffer = io.BytesIO()
+    if fmt == "jpeg" and not _has_transparency(image):
+        image.convert("RGB").save(buffer, format="JPEG", quality=jpeg_quality)
+        return buffer.getvalue(), "image/jpeg"
+    image.save(buffer, format="PNG", compress_level=png_compress_level)
+    return buffer.getvalue(), "image/png"
+
+
+def _has_transparency(image: Image.Image) -> bool:
+    if image.mode not in ("RGBA", "LA", "PA") and "transparency" not in image.info:
+        return False
+    alpha = (image if image.mode == "RGBA" else image.convert("RGBA")).getchannel("A")
+    return alpha.getextrema()[0] < 255
+
+
+def map_color_bands(image: Image.Image, transform: Callable[[int], int]) -> Image.Image:
+    """Apply ``transform`` to the colour bands of ``image``, keeping RGB as RGB and alpha unchanged."""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    table = [transform(value) for value in range(256)]
+    alpha = list(range(256)) if image.mode == "RGBA" else []
+    return image.point(table * 3 + alpha)
 
 
 def create_output_url(date_segment: str, asset_id: str, filename: str) -> str:
@@ -36,4 +137,7 @@ def load_image_from_bytes(image_bytes: bytes) -> Image.Image:
     stream = io.BytesIO(image_bytes)
     image = Image.open(stream)
     image.load()
-    return image.convert("RGBA")
+    # Opaque inputs stay RGB; an alpha channel nobody uses only costs memory and encode time
+    if image.mode in ("RGB", "RGBA"):
+        return image
+    return image.convert("RGBA" if _has_transparency(image) else "RGB")
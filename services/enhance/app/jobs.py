@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .http_client import fetch_image_bytes
+
+logger = logging.getLogger(__name__)
+
+# kind, asset id, input bytes, job params -> JSON-serialisable result
+JobHandler = Callable[[str, str, bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    asset_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    webhook_url TEXT,
+    webhook_status TEXT,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class JobStore:
+    """SQLite record of asynchronous jobs, so their state survives restarts."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def create(self, asset_id: str, kind: str, params: Dict[str, Any], webhook_url: Optional[str]) -> None:
+        now = _now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (asset_id, kind, status, params, webhook_url, created_at, updated_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (asset_id, kind, json.dumps(params), webhook_url, now, now),
+            )
+
+    def get(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE asset_id = ?", (asset_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("params", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def update(self, asset_id: str, **fields: Any) -> None:
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE asset_id = ?", (*fields.values(), asset_id))
+
+    def unfinished(self) -> List[str]:
+        """Ids of jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT asset_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [row["asset_id"] for row in rows]
+
+    def undelivered(self) -> List[str]:
+        """Ids of finished jobs whose webhook has not been sent yet, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT asset_id FROM jobs WHERE status IN ('succeeded', 'failed')"
+                " AND webhook_url IS NOT NULL AND webhook_status IS NULL ORDER BY created_at"
+            ).fetchall()
+        return [row["asset_id"] for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobRunner:
+    """Runs accepted jobs on a fixed number of workers.
+
+    Uploaded inputs are spooled to disk and only asset ids are queued, so a
+    large batch costs disk rather than memory. URL inputs are downloaded by
+    the worker when the job starts. Webhooks are sent by separate tasks, so a
+    slow receiver does not hold up the next job. Jobs left queued or running,
+    and webhooks left unsent, by a previous process are picked up again on
+    start.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path,
+        handler: JobHandler,
+        workers: int,
+        max_queued: int,
+        max_download_bytes: Optional[int] = None,
+        webhook_timeout: float = 10.0,
+        webhook_attempts: int = 3,
+    ) -> None:
+        self.store: Optional[JobStore] = None
+        self.spool_dir = spool_dir
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.max_download_bytes = max_download_bytes
+        self.webhook_timeout = webhook_timeout
+        self.webhook_attempts = max(1, webhook_attempts)
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue[str]] = None
+        self._webhooks: Optional[asyncio.Queue[str]] = None
+        self._tasks: List[asyncio.Task[None]] = []
+
+    async def start(self, store: JobStore, http_client: Optional[httpx.AsyncClient] = None) -> None:
+        self.store = store
+        self.http_client = http_client
+        await run_in_threadpool(self.spool_dir.mkdir, parents=True, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._webhooks = asyncio.Queue()
+        for asset_id in await run_in_threadpool(self.store.unfinished):
+            job = await run_in_threadpool(self.store.get, asset_id)
+            if job and not job["params"].get("inputUrl") and not self._spool_path(asset_id).exists():
+                await run_in_threadpool(self.store.update, asset_id, status="failed", error="input was lost on restart")
+                continue
+            await run_in_threadpool(self.store.update, asset_id, status="queued")
+            self._queue.put_nowait(asset_id)
+        for asset_id in await run_in_threadpool(self.store.undelivered):
+            self._webhooks.put_nowait(asset_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks += [asyncio.create_task(self._send_webhooks()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(
+        self,
+        asset_id: str,
+        kind: str,
+        params: Dict[str, Any],
+        image_bytes: Optional[bytes],
+        webhook_url: Optional[str],
+    ) -> None:
+        if self._queue is None or self.store is None:
+            raise RuntimeError("job runner is not started")
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFullError("job queue is full")
+        if image_bytes is not None:
+            await run_in_threadpool(self._spool_path(asset_id).write_bytes, image_bytes)
+        await run_in_threadpool(self.store.create, asset_id, kind, params, webhook_url)
+        self._queue.put_nowait(asset_id)
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        while True:
+            asset_id = await self._queue.get()
+            try:
+                await self._run(asset_id)
+            except Exception:
+                logger.exception("job %s could not be recorded", asset_id)
+            finally:
+                self._queue.task_done()
+
+    async def _send_webhooks(self) -> None:
+        assert self._webhooks is not None and self.store is not None
+        while True:
+            asset_id = await self._webhooks.get()
+            try:
+                job = await run_in_threadpool(self.store.get, asset_id)
+                if job is not None and job["webhook_url"]:
+                    delivered = await self._notify(job["webhook_url"], self.describe(job))
+                    await run_in_threadpool(
+                        self.store.update, asset_id, webhook_status="delivered" if delivered else "failed"
+                    )
+            except Exception:
+                logger.exception("webhook for job %s could not be sent", asset_id)
+            finally:
+                self._webhooks.task_done()
+
+    async def _run(self, asset_id: str) -> None:
+        assert self.store is not None and self._webhooks is not None
+        job = await run_in_threadpool(self.store.get, asset_id)
+        if job is None:
+            return
+        await run_in_threadpool(self.store.update, asset_id, status="running")
+        spool = self._spool_path(asset_id)
+        try:
+            image_bytes = await self._load_input(job, spool)
+            result = await self.handler(job["kind"], asset_id, image_bytes, job["params"])
+            update: Dict[str, Any] = {"status": "succeeded", "result": result}
+        except HTTPException as exc:
+            update = {"status": "failed", "error": str(exc.detail)}
+        except Exception as exc:
+            logger.exception("job %s failed", asset_id)
+            update = {"status": "failed", "error": str(exc) or exc.__class__.__name__}
+        await run_in_threadpool(self.store.update, asset_id, **update)
+        await run_in_threadpool(spool.unlink, True)
+
+        if job["webhook_url"]:
+            self._webhooks.put_nowait(asset_id)
+
+    async def _load_input(self, job: Dict[str, Any], spool: Path) -> bytes:
+        if spool.exists():
+            return await run_in_threadpool(spool.read_bytes)
+        return await fetch_image_bytes(job["params"]["inputUrl"], self.http_client, self.max_download_bytes)
+
+    async def _notify(self, url: str, body: Dict[str, Any]) -> bool:
+        for attempt in range(self.webhook_attempts):
+            if attempt:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                if self.http_client is None:
+                    async with httpx.AsyncClient(timeout=self.webhook_timeout) as client:
+                        response = await client.post(url, json=body)
+                else:
+                    response = await self.http_client.post(url, json=body, timeout=self.webhook_timeout)
+            except httpx.HTTPError as exc:
+                logger.warning("webhook %s attempt %d failed: %s", url, attempt + 1, exc)
+                continue
+            if response.is_success:
+                return True
+            logger.warning("webhook %s attempt %d returned %d", url, attempt + 1, response.status_code)
+        return False
+
+    def _spool_path(self, asset_id: str) -> Path:
+        return self.spool_dir / f"{asset_id}.input"
+
+    @staticmethod
+    def describe(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Public view of a job: the GET /jobs body and the webhook payload."""
+        return {
+            "assetId": job["asset_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "createdAt": job["created_at"],
+            "updatedAt": job.get("updated_at"),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "webhookStatus": job.get("webhook_status"),
+        }
+
+
+__all__ = ["JobRunner", "JobStore", "QueueFullError"]
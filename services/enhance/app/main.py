@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Dict, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 
-import httpx
 from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.responses import JSONResponse
+from PIL import Image
 from starlette.concurrency import run_in_threadpool
 
+from .cache import ResultCache, hash_bytes
 from .config import Settings, get_settings
+from .http_client import create_http_client, fetch_image_bytes
+from .jobs import JobRunner, JobStore, QueueFullError
 from .io import (
+    OutputFormat,
     create_output_url,
     ensure_asset_dir,
     generate_asset_id,
@@ -23,24 +31,13 @@ from .schemas import (
     EnhanceRequest,
     EnhanceResponse,
     ErrorResponse,
+    JobAccepted,
+    JobOptions,
+    JobStatus,
+    OutputOptions,
 )
 
 
-async def fetch_image_bytes(url: str) -> bytes:
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        async with client.stream("GET", url) as response:
-            try:
-                response.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(status_code=response.status_code, detail=str(exc)) from exc
-            chunks = []
-            async for chunk in response.aiter_bytes():
-                chunks.append(chunk)
-    if not chunks:
-        raise HTTPException(status_code=400, detail="Remote image download returned no data")
-    return b"".join(chunks)
-
-
 def _allowed_presets(settings: Settings) -> set[str]:
     presets = {settings.default_preset}
     gemini_cfg = settings.providers.get("image_enhance", {}).get("gemini", {})
@@ -64,6 +61,25 @@ def _prepare_metadata(raw: Optional[str | Dict[str, Any]]) -> Dict[str, Any]:
     raise HTTPException(status_code=400, detail="metadata must be a JSON object")
 
 
+def _option_fields(form: Any) -> Dict[str, Any]:
+    """Output and job options present in a multipart or urlencoded form."""
+    fields = {**OutputOptions.model_fields, **JobOptions.model_fields}
+    keys = [field.alias or name for name, field in fields.items()]
+    return {key: form.get(key) for key in keys if form.get(key) is not None}
+
+
+def _resolve_output_format(pipeline: Any, preset: Optional[str], payload: OutputOptions) -> OutputFormat:
+    try:
+        return pipeline.output_format(
+            preset,
+            format=payload.outputFormat,
+            quality=payload.quality,
+            compress_level=payload.compressionLevel,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 def create_app(settings: Optional[Settings] = None) -> FastAPI:
     if settings is None:
         get_settings.cache_clear()
@@ -71,7 +87,38 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
     enhance_pipeline = EnhancePipeline(settings)
     background_pipeline = BackgroundReplacePipeline(settings)
 
-    app = FastAPI(title="Enhance Service", version="1.0.0")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        # One connection pool for input downloads and Gemini calls
+        http_client = create_http_client(settings)
+        app.state.http_client = http_client
+        # Result encoding is CPU bound; keep it off the threadpool that serves request I/O
+        encode_executor = ThreadPoolExecutor(max_workers=max(1, settings.encode_workers), thread_name_prefix="encode")
+        app.state.encode_executor = encode_executor
+        for pipeline in (enhance_pipeline, background_pipeline):
+            if pipeline.gemini_client is not None:
+                pipeline.gemini_client.async_client = http_client
+        # Opened here rather than in create_app so importing the app touches no files
+        job_store = await run_in_threadpool(JobStore, jobs_db_path)
+        app.state.job_store = job_store
+        app.state.result_cache = None
+        if settings.result_cache_enabled:
+            app.state.result_cache = await run_in_threadpool(
+                ResultCache, settings.assets_root / "cache", settings.result_cache_max_bytes
+            )
+        await job_runner.start(job_store, http_client)
+        try:
+            yield
+        finally:
+            await job_runner.stop()
+            job_store.close()
+            for pipeline in (enhance_pipeline, background_pipeline):
+                if pipeline.gemini_client is not None:
+                    pipeline.gemini_client.async_client = None
+            await http_client.aclose()
+            encode_executor.shutdown(wait=True)
+
+    app = FastAPI(title="Enhance Service", version="1.0.0", lifespan=lifespan)
 
     def get_settings_dep() -> Settings:
         return settings
@@ -82,21 +129,138 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
     def get_background_pipeline() -> BackgroundReplacePipeline:
         return background_pipeline
 
-    @app.get("/health", response_model=Dict[str, str])
-    async def health() -> Dict[str, str]:
-        return {"status": "ok"}
+    async def respond(
+        asset_id: str,
+        image_bytes: bytes,
+        name: str,
+        output_format: OutputFormat,
+        metadata: Dict[str, Any],
+        cache_parts: Tuple[str, str, Dict[str, str]],
+        execute: Callable[[Image.Image, Dict[str, Any]], Awaitable[Tuple[Image.Image, Dict[str, Any]]]],
+    ) -> EnhanceResponse:
+        filename = f"{name}{output_format.extension}"
+        directory, date_segment = ensure_asset_dir(settings, asset_id)
+        output_path = directory / filename
+        output_url = create_output_url(date_segment, asset_id, filename)
+
+        cache_key: Optional[str] = None
+        result_cache: Optional[ResultCache] = getattr(app.state, "result_cache", None)
+        if result_cache is not None:
+            operation, instruction, identity = cache_parts
+            image_hash = await run_in_threadpool(hash_bytes, image_bytes)
+            cache_key = ResultCache.key(image_hash, operation, instruction, output=output_format.cache_parts(), **identity)
+            cached = await run_in_threadpool(result_cache.get, cache_key, output_path)
+            if cached is not None:
+                meta = {**metadata, **cached, "assetId": asset_id, "cacheHit": True}
+                return EnhanceResponse(assetId=asset_id, outputUrl=output_url, metadata=meta)
+
+        image = await run_in_threadpool(load_image_from_bytes, image_bytes)
+        output_image, meta = await execute(image, dict(metadata))
+        executor: Optional[Executor] = getattr(app.state, "encode_executor", None)
+        await asyncio.get_running_loop().run_in_executor(executor, save_image, output_image, output_path, output_format)
+        meta["outputFormat"] = output_format.format
+        # A fallback result is not what the provider would return, so a re-run should retry it
+        if cache_key is not None and meta.get("backend") != "local-fallback":
+            produced = {key: value for key, value in meta.items() if metadata.get(key) != value}
+            await run_in_threadpool(result_cache.put, cache_key, output_path, produced)
+        meta.update({"assetId": asset_id, "cacheHit": False})
+        return EnhanceResponse(assetId=asset_id, outputUrl=output_url, metadata=meta)
+
+    async def run_operation(kind: str, asset_id: str, image_bytes: bytes, params: Dict[str, Any]) -> EnhanceResponse:
+        """Run one enhance or background job from its stored parameters."""
+        output_format = OutputFormat(**params["output"])
+        metadata = dict(params["metadata"])
+        if kind == "enhance":
+            preset = params["preset"]
+            return await respond(
+                asset_id,
+                image_bytes,
+                "enhanced",
+                output_format,
+                metadata,
+                ("enhance", preset, enhance_pipeline.cache_identity()),
+                lambda image, meta: enhance_pipeline.aexecute(image, preset, meta),
+            )
+        prompt = params.get("prompt")
+        return await respond(
+            asset_id,
+            image_bytes,
+            "background",
+            output_format,
+            metadata,
+            ("background", background_pipeline.resolve_prompt(prompt), background_pipeline.cache_identity()),
+            lambda image, meta: background_pipeline.aexecute(image, prompt, meta),
+        )
+
+    async def run_job(kind: str, asset_id: str, image_bytes: bytes, params: Dict[str, Any]) -> Dict[str, Any]:
+        return (await run_operation(kind, asset_id, image_bytes, params)).model_dump()
+
+    jobs_db_path = settings.jobs_db_path or settings.assets_root / "jobs" / "jobs.sqlite3"
+    job_runner = JobRunner(
+        jobs_db_path.parent / "spool",
+        run_job,
+        workers=settings.job_workers,
+        max_queued=settings.job_queue_size,
+        max_download_bytes=settings.max_download_bytes,
+        webhook_timeout=settings.webhook_timeout,
+        webhook_attempts=settings.webhook_attempts,
+    )
+
+    async def accept_job(
+        request: Request,
+        file: UploadFile | None,
+        kind: str,
+        params: Dict[str, Any],
+        payload: JobOptions,
+        input_url: Optional[str],
+    ) -> JSONResponse:
+        asset_id = generate_asset_id()
+        image_bytes: Optional[bytes] = None
+        if file is not None:
+            image_bytes = await _load_image_bytes(request, file, None, settings)
+        else:
+            # Downloaded by the worker, so the request returns without waiting on the source
+            params["inputUrl"] = input_url
+        webhook_url = str(payload.webhookUrl) if payload.webhookUrl else None
+        try:
+            await job_runner.submit(asset_id, kind, params, image_bytes, webhook_url)
+        except QueueFullError as exc:
+            raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "30"}) from exc
+        accepted = JobAccepted(assetId=asset_id, status="queued", statusUrl=f"/jobs/{asset_id}")
+        return JSONResponse(status_code=202, content=accepted.model_dump(), headers={"Location": accepted.statusUrl})
+
+    @app.get("/health", response_model=Dict[str, Any])
+    async def health() -> Dict[str, Any]:
+        status: Dict[str, Any] = {"status": "ok"}
+        result_cache: Optional[ResultCache] = app.state.result_cache
+        if result_cache is not None:
+            status["resultCache"] = result_cache.stats()
+        counts = await run_in_threadpool(app.state.job_store.counts)
+        status["jobs"] = {"workers": job_runner.workers, "queueDepth": job_runner.queued(), "byStatus": counts}
+        return status
+
+    @app.get(
+        "/jobs/{asset_id}",
+        response_model=JobStatus,
+        responses={404: {"model": ErrorResponse}},
+    )
+    async def job_status(asset_id: str) -> JobStatus:
+        job = await run_in_threadpool(app.state.job_store.get, asset_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        return JobStatus.model_validate(JobRunner.describe(job))
 
     @app.post(
         "/enhance",
         response_model=EnhanceResponse,
-        responses={400: {"model": ErrorResponse}},
+        responses={202: {"model": JobAccepted}, 400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
     )
     async def enhance(
         request: Request,
         file: UploadFile | None = File(default=None),
         settings: Settings = Depends(get_settings_dep),
         pipeline: EnhancePipeline = Depends(get_enhance_pipeline),
-    ) -> EnhanceResponse:
+    ) -> EnhanceResponse | JSONResponse:
         payload = await _extract_payload(request, file)
         if not payload.inputUrl and file is None:
             raise HTTPException(status_code=400, detail="inputUrl or file is required")
@@ -104,63 +268,53 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
         if preset not in _allowed_presets(settings):
             raise HTTPException(status_code=400, detail="unsupported preset")
 
-        image_bytes = await _load_image_bytes(file, payload.inputUrl)
-        image = load_image_from_bytes(image_bytes)
-        output_image, meta = await run_in_threadpool(
-            pipeline.execute,
-            image,
-            preset,
-            dict(payload.metadata),
-        )
-        asset_id = generate_asset_id()
-        directory, date_segment = ensure_asset_dir(settings, asset_id)
-        output_path = directory / "enhanced.png"
-        await run_in_threadpool(save_image, output_image, output_path)
-        output_url = create_output_url(date_segment, asset_id, output_path.name)
-        meta.update({"assetId": asset_id})
-        return EnhanceResponse(assetId=asset_id, outputUrl=output_url, metadata=meta)
+        output_format = _resolve_output_format(pipeline, preset, payload)
+        params = {"preset": preset, "output": asdict(output_format), "metadata": dict(payload.metadata)}
+        if payload.runAsync or payload.webhookUrl:
+            return await accept_job(request, file, "enhance", params, payload, payload.inputUrl and str(payload.inputUrl))
+
+        image_bytes = await _load_image_bytes(request, file, payload.inputUrl, settings)
+        return await run_operation("enhance", generate_asset_id(), image_bytes, params)
 
     @app.post(
         "/background/replace",
         response_model=EnhanceResponse,
-        responses={400: {"model": ErrorResponse}},
+        responses={202: {"model": JobAccepted}, 400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
     )
     async def background_replace(
         request: Request,
         file: UploadFile | None = File(default=None),
         settings: Settings = Depends(get_settings_dep),
         pipeline: BackgroundReplacePipeline = Depends(get_background_pipeline),
-    ) -> EnhanceResponse:
+    ) -> EnhanceResponse | JSONResponse:
         payload = await _extract_background_payload(request, file)
         if not payload.inputUrl and file is None:
             raise HTTPException(status_code=400, detail="inputUrl or file is required")
-        image_bytes = await _load_image_bytes(file, payload.inputUrl)
-        image = load_image_from_bytes(image_bytes)
-        output_image, meta = await run_in_threadpool(
-            pipeline.execute,
-            image,
-            payload.prompt,
-            dict(payload.metadata),
-        )
-        asset_id = generate_asset_id()
-        directory, date_segment = ensure_asset_dir(settings, asset_id)
-        output_path = directory / "background.png"
-        await run_in_threadpool(save_image, output_image, output_path)
-        output_url = create_output_url(date_segment, asset_id, output_path.name)
-        meta.update({"assetId": asset_id})
-        return EnhanceResponse(assetId=asset_id, outputUrl=output_url, metadata=meta)
+        output_format = _resolve_output_format(pipeline, None, payload)
+        params = {"prompt": payload.prompt, "output": asdict(output_format), "metadata": dict(payload.metadata)}
+        if payload.runAsync or payload.webhookUrl:
+            return await accept_job(request, file, "background", params, payload, payload.inputUrl and str(payload.inputUrl))
+
+        image_bytes = await _load_image_bytes(request, file, payload.inputUrl, settings)
+        return await run_operation("background", generate_asset_id(), image_bytes, params)
 
     return app
 
 
-async def _load_image_bytes(file: UploadFile | None, input_url: Optional[str]) -> bytes:
+async def _load_image_bytes(
+    request: Request,
+    file: UploadFile | None,
+    input_url: Optional[str],
+    settings: Settings,
+) -> bytes:
     if file is not None:
         data = await file.read()
         if not data:
             raise HTTPException(status_code=400, detail="uploaded file is empty")
         return data
     if input_url:
-        return await fetch_image_bytes(input_url)
+        client = getattr(request.app.state, "http_client", None)
+        return await fetch_image_bytes(str(input_url), client, settings.max_download_bytes)
     raise HTTPException(status_code=400, detail="inputUrl or file is required")
 
 
@@ -170,7 +324,7 @@ async def _extract_payload(request: Request, file: UploadFile | None) -> Enhance
         input_url = form.get("inputUrl")
         preset = form.get("preset")
         metadata = _prepare_metadata(form.get("metadata"))
-        return EnhanceRequest.model_validate({"inputUrl": input_url, "preset": preset, "metadata": metadata})
+        return EnhanceRequest.model_validate({"inputUrl": input_url, "preset": preset, "metadata": metadata, **_option_fields(form)})
     if request.headers.get("content-type", "").startswith("application/json"):
         data = await request.json()
         return EnhanceRequest.model_validate(data)
@@ -178,7 +332,7 @@ async def _extract_payload(request: Request, file: UploadFile | None) -> Enhance
     input_url = form.get("inputUrl")
     preset = form.get("preset")
     metadata = _prepare_metadata(form.get("metadata"))
-    return EnhanceRequest.model_validate({"inputUrl": input_url, "preset": preset, "metadata": metadata})
+    return EnhanceRequest.model_validate({"inputUrl": input_url, "preset": preset, "metadata": metadata, **_option_fields(form)})
 
 
 async def _extract_background_payload(request: Request, file: UploadFile | None) -> BackgroundReplaceRequest:
@@ -187,7 +341,7 @@ async def _extract_background_payload(request: Request, file: UploadFile | None)
         input_url = form.get("inputUrl")
         prompt = form.get("prompt")
         metadata = _prepare_metadata(form.get("metadata"))
-        return BackgroundReplaceRequest.model_validate({"inputUrl": input_url, "prompt": prompt, "metadata": metadata})
+        return BackgroundReplaceRequest.model_validate({"inputUrl": input_url, "prompt": prompt, "metadata": metadata, **_option_fields(form)})
     if request.headers.get("content-type", "").startswith("application/json"):
         data = await request.json()
         return BackgroundReplaceRequest.model_validate(data)
@@ -195,7 +349,7 @@ async def _extract_background_payload(request: Request, file: UploadFile | None)
     input_url = form.get("inputUrl")
     prompt = form.get("prompt")
     metadata = _prepare_metadata(form.get("metadata"))
-    return BackgroundReplaceRequest.model_validate({"inputUrl": input_url, "prompt": prompt, "metadata": metadata})
+    return BackgroundReplaceRequest.model_validate({"inputUrl": input_url, "prompt": prompt, "metadata": metadata, **_option_fields(form)})
 
 
 app = create_app()
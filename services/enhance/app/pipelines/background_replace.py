@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import io
 from typing import Any, Dict, Optional, Tuple
 
 from PIL import Image, ImageEnhance
+from starlette.concurrency import run_in_threadpool
 
 from ..config import Settings
-from ..io import load_image_from_bytes
+from ..io import encode_for_transport, load_image_from_bytes
 from ..services.gemini import GeminiImageClient, GeminiError
 from ..services.local import LocalEnhancer, load_local_config
 from .base import PipelineBase
@@ -26,18 +26,19 @@ class BackgroundReplacePipeline(PipelineBase):
                 settings.gemini_api_key,
                 gemini_cfg.get("model", "gemini-1.5-pro-latest"),
                 gemini_cfg.get("prompt_preset", settings.default_preset),
+                timeout=settings.gemini_timeout,
             )
         local_cfg = load_local_config(image_cfg.get("local"))
         self.local_enhancer = LocalEnhancer(local_cfg)
+        self._output_config = providers.get("output") or {}
 
     def execute(self, image: Image.Image, prompt: Optional[str] = None, metadata: Dict[str, Any] | None = None) -> Tuple[Image.Image, Dict[str, Any]]:
-        metadata = metadata or {}
-        prompt_text = prompt or self.replace_prompt or "clean background"
+        prompt_text = self.resolve_prompt(prompt)
         backend_used: str
         if self.mode == "clean_only":
             processed = self._clean_background(image)
             backend_used = "clean"
-        elif self.gemini_client and self.gemini_client.is_configured():
+        elif self._use_gemini():
             try:
                 processed = self._run_gemini(image, prompt_text)
                 backend_used = "gemini"
@@ -47,7 +48,48 @@ class BackgroundReplacePipeline(PipelineBase):
         else:
             processed = self.local_enhancer.replace_background(image)
             backend_used = "local"
+        return self._finalize(processed, prompt_text, backend_used, metadata)
 
+    async def aexecute(self, image: Image.Image, prompt: Optional[str] = None, metadata: Dict[str, Any] | None = None) -> Tuple[Image.Image, Dict[str, Any]]:
+        """Like execute, but awaits the Gemini call instead of blocking a threadpool worker on it."""
+        prompt_text = self.resolve_prompt(prompt)
+        backend_used: str
+        if self.mode == "clean_only":
+            processed = await run_in_threadpool(self._clean_background, image)
+            backend_used = "clean"
+        elif self._use_gemini():
+            try:
+                payload, mime_type = await run_in_threadpool(self._encode_for_gemini, image)
+                gemini_bytes = await self.gemini_client.areplace_background(payload, prompt_text, mime_type)
+                processed = await run_in_threadpool(load_image_from_bytes, gemini_bytes)
+                backend_used = "gemini"
+            except GeminiError:
+                processed = await run_in_threadpool(self.local_enhancer.replace_background, image)
+                backend_used = "local-fallback"
+        else:
+            processed = await run_in_threadpool(self.local_enhancer.replace_background, image)
+            backend_used = "local"
+        return await run_in_threadpool(self._finalize, processed, prompt_text, backend_used, metadata)
+
+    def resolve_prompt(self, prompt: Optional[str]) -> str:
+        return prompt or self.replace_prompt or "clean background"
+
+    def cache_identity(self) -> Dict[str, str]:
+        identity = super().cache_identity()
+        identity["mode"] = self.mode
+        if self.mode == "clean_only":
+            identity.update({"backend": "clean", "model": "clean"})
+        elif self._use_gemini():
+            identity.update({"backend": "gemini", "model": self.gemini_client.model})
+        else:
+            identity.update({"backend": "local", "model": "local"})
+        return identity
+
+    def _use_gemini(self) -> bool:
+        return self.gemini_client is not None and self.gemini_client.is_configured()
+
+    def _finalize(self, processed: Image.Image, prompt_text: str, backend_used: str, metadata: Dict[str, Any] | None) -> Tuple[Image.Image, Dict[str, Any]]:
+        metadata = metadata or {}
         blurred, blur_applied = self._apply_privacy(processed)
         watermarked, watermark_applied = self._apply_watermark(blurred)
         metadata.update(
@@ -62,16 +104,23 @@ class BackgroundReplacePipeline(PipelineBase):
         return watermarked, metadata
 
     def _clean_background(self, image: Image.Image) -> Image.Image:
-        cleaned = image.convert("RGBA")
+        cleaned = image.convert("RGB" if image.mode == "RGB" else "RGBA")
         cleaned = ImageEnhance.Brightness(cleaned).enhance(1.1)
         cleaned = ImageEnhance.Color(cleaned).enhance(0.95)
         return cleaned
 
     def _run_gemini(self, image: Image.Image, prompt: str) -> Image.Image:
-        buffer = io.BytesIO()
-        image.convert("RGBA").save(buffer, format="PNG")
-        gemini_bytes = self.gemini_client.replace_background(buffer.getvalue(), prompt)
+        payload, mime_type = self._encode_for_gemini(image)
+        gemini_bytes = self.gemini_client.replace_background(payload, prompt, mime_type)
         return load_image_from_bytes(gemini_bytes)
 
+    def _encode_for_gemini(self, image: Image.Image) -> Tuple[bytes, str]:
+        return encode_for_transport(
+            image,
+            self.settings.gemini_transport_format,
+            self.settings.gemini_png_compress_level,
+            self.settings.gemini_jpeg_quality,
+        )
+
 
 __all__ = ["BackgroundReplacePipeline"]
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import json
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from PIL import Image
 
 from ..config import Settings
+from ..io import OutputFormat, map_color_bands
 
 
 class PipelineBase:
@@ -18,34 +21,48 @@ class PipelineBase:
         self._watermark_margin = int(brand_watermark.get("margin_px", 0))
         privacy = settings.brand.get("privacy", {})
         self._blur_radius = float(privacy.get("blur_radius", 1.2))
+        # Provider ``output`` block; subclasses point it at their own section
+        self._output_config: Dict[str, Any] = {}
+
+    def output_format(self, preset: Optional[str] = None, **requested: Any) -> OutputFormat:
+        """Encoding for a result: settings, then the provider ``output`` block and its preset entry, then the request."""
+        options: Dict[str, Any] = {
+            "format": self.settings.output_format,
+            "quality": self.settings.output_quality,
+            "compress_level": self.settings.output_compress_level,
+        }
+        config = dict(self._output_config)
+        presets = config.pop("presets", None) or {}
+        options.update(config)
+        if preset:
+            options.update(presets.get(preset) or {})
+        options.update({key: value for key, value in requested.items() if value is not None})
+        return OutputFormat(**options)
+
+    def cache_identity(self) -> Dict[str, str]:
+        """Provider settings that determine the output; subclasses add backend and model."""
+        brand = json.dumps(self.settings.brand, sort_keys=True, default=str)
+        return {"brand": hashlib.sha256(brand.encode("utf-8")).hexdigest()[:16]}
 
     def _apply_privacy(self, image: Image.Image) -> Tuple[Image.Image, bool]:
         if self._blur_radius <= 0:
             return image, False
-        adjusted = image.convert("RGBA").copy()
-        pixels = adjusted.load()
-        width, height = adjusted.size
         delta = int(round(self._blur_radius * 3)) or 1
-        for y in range(height):
-            for x in range(width):
-                r, g, b, a = pixels[x, y]
-                pixels[x, y] = (
-                    min(255, r + delta),
-                    min(255, g + delta),
-                    min(255, b + delta),
-                    a,
-                )
-        return adjusted, True
+        # Lift the colour bands through a lookup table; alpha, if any, is left as is
+        return map_color_bands(image, lambda value: min(255, value + delta)), True
 
     def _apply_watermark(self, image: Image.Image) -> Tuple[Image.Image, bool]:
         watermark_image = self._load_watermark()
         if watermark_image is None:
             return image, False
-        base = image.convert("RGBA")
         wm = watermark_image
-        position = self._resolve_position(base.size, wm.size, self._watermark_position, self._watermark_margin)
-        composite = Image.new("RGBA", base.size)
-        composite.paste(base, (0, 0))
+        position = self._resolve_position(image.size, wm.size, self._watermark_position, self._watermark_margin)
+        if image.mode == "RGB":
+            # Opaque images stay RGB; only the colour bands are blended
+            composite = image.copy()
+        else:
+            composite = Image.new("RGBA", image.size)
+            composite.paste(image.convert("RGBA"), (0, 0))
         composite.paste(wm, position, wm)
         return composite, True
 
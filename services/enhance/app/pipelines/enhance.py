@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import io
 from typing import Any, Dict, Optional, Tuple
 
 from PIL import Image
+from starlette.concurrency import run_in_threadpool
 
 from ..config import Settings
-from ..io import load_image_from_bytes
+from ..io import encode_for_transport, load_image_from_bytes
 from ..services.gemini import GeminiImageClient, GeminiError
 from ..services.local import LocalEnhancer, load_local_config
 from .base import PipelineBase
@@ -24,15 +24,16 @@ class EnhancePipeline(PipelineBase):
                 settings.gemini_api_key,
                 gemini_cfg.get("model", "gemini-1.5-pro-latest"),
                 gemini_cfg.get("prompt_preset", settings.default_preset),
+                timeout=settings.gemini_timeout,
             )
         local_cfg = load_local_config(providers.get("local"))
         self.local_enhancer = LocalEnhancer(local_cfg)
+        self._output_config = providers.get("output") or {}
 
     def execute(self, image: Image.Image, preset: str, metadata: Dict[str, Any] | None = None) -> Tuple[Image.Image, Dict[str, Any]]:
-        metadata = metadata or {}
         backend_used: str
         processed: Optional[Image.Image]
-        if self.backend == "gemini" and self.gemini_client and self.gemini_client.is_configured():
+        if self._use_gemini():
             try:
                 processed = self._run_gemini(image, preset)
                 backend_used = "gemini"
@@ -42,7 +43,39 @@ class EnhancePipeline(PipelineBase):
         else:
             processed = self.local_enhancer.enhance_image(image)
             backend_used = "local"
+        return self._finalize(processed, preset, backend_used, metadata)
 
+    async def aexecute(self, image: Image.Image, preset: str, metadata: Dict[str, Any] | None = None) -> Tuple[Image.Image, Dict[str, Any]]:
+        """Like execute, but awaits the Gemini call instead of blocking a threadpool worker on it."""
+        backend_used: str
+        if self._use_gemini():
+            try:
+                payload, mime_type = await run_in_threadpool(self._encode_for_gemini, image)
+                gemini_bytes = await self.gemini_client.aenhance_image(payload, preset, mime_type)
+                processed = await run_in_threadpool(load_image_from_bytes, gemini_bytes)
+                backend_used = "gemini"
+            except GeminiError:
+                processed = await run_in_threadpool(self.local_enhancer.enhance_image, image)
+                backend_used = "local-fallback"
+        else:
+            processed = await run_in_threadpool(self.local_enhancer.enhance_image, image)
+            backend_used = "local"
+        return await run_in_threadpool(self._finalize, processed, preset, backend_used, metadata)
+
+    def cache_identity(self) -> Dict[str, str]:
+        identity = super().cache_identity()
+        if self._use_gemini():
+            identity.update({"backend": "gemini", "model": self.gemini_client.model})
+        else:
+            config = self.local_enhancer.config
+            identity.update({"backend": "local", "model": f"{config.upscaler}+{config.denoise}"})
+        return identity
+
+    def _use_gemini(self) -> bool:
+        return self.backend == "gemini" and self.gemini_client is not None and self.gemini_client.is_configured()
+
+    def _finalize(self, processed: Image.Image, preset: str, backend_used: str, metadata: Dict[str, Any] | None) -> Tuple[Image.Image, Dict[str, Any]]:
+        metadata = metadata or {}
         blurred, blur_applied = self._apply_privacy(processed)
         watermarked, watermark_applied = self._apply_watermark(blurred)
         metadata.update(
@@ -56,10 +89,17 @@ class EnhancePipeline(PipelineBase):
         return watermarked, metadata
 
     def _run_gemini(self, image: Image.Image, preset: str) -> Image.Image:
-        buffer = io.BytesIO()
-        image.convert("RGBA").save(buffer, format="PNG")
-        gemini_bytes = self.gemini_client.enhance_image(buffer.getvalue(), preset)
+        payload, mime_type = self._encode_for_gemini(image)
+        gemini_bytes = self.gemini_client.enhance_image(payload, preset, mime_type)
         return load_image_from_bytes(gemini_bytes)
 
+    def _encode_for_gemini(self, image: Image.Image) -> Tuple[bytes, str]:
+        return encode_for_transport(
+            image,
+            self.settings.gemini_transport_format,
+            self.settings.gemini_png_compress_level,
+            self.settings.gemini_jpeg_quality,
+        )
+
 
 __all__ = ["EnhancePipeline"]
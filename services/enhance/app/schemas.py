@@ -5,13 +5,24 @@ from typing import Any, Dict, Optional
 from pydantic import BaseModel, Field, HttpUrl
 
 
-class EnhanceRequest(BaseModel):
+class OutputOptions(BaseModel):
+    outputFormat: Optional[str] = None
+    quality: Optional[int] = None
+    compressionLevel: Optional[int] = None
+
+
+class JobOptions(BaseModel):
+    runAsync: bool = Field(default=False, alias="async")
+    webhookUrl: Optional[HttpUrl] = None
+
+
+class EnhanceRequest(OutputOptions, JobOptions):
     inputUrl: Optional[HttpUrl] = None
     preset: Optional[str] = None
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
-class BackgroundReplaceRequest(BaseModel):
+class BackgroundReplaceRequest(OutputOptions, JobOptions):
     inputUrl: Optional[HttpUrl] = None
     prompt: Optional[str] = None
     metadata: Dict[str, Any] = Field(default_factory=dict)
@@ -23,5 +34,22 @@ class EnhanceResponse(BaseModel):
     metadata: Dict[str, Any]
 
 
+class JobAccepted(BaseModel):
+    assetId: str
+    status: str
+    statusUrl: str
+
+
+class JobStatus(BaseModel):
+    assetId: str
+    kind: str
+    status: str
+    createdAt: str
+    updatedAt: Optional[str] = None
+    result: Optional[EnhanceResponse] = None
+    error: Optional[str] = None
+    webhookStatus: Optional[str] = None
+
+
 class ErrorResponse(BaseModel):
     detail: str
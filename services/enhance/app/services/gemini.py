@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import base64
-from typing import Any, Dict
+import json
+import re
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
 
 import httpx
 
@@ -10,62 +12,177 @@ class GeminiError(RuntimeError):
     pass
 
 
+# Multiple of 3, so the base64 of consecutive chunks concatenates without padding
+_ENCODE_CHUNK = 3 * 64 * 1024
+_INLINE_KEY = re.compile(rb'"inline_?[dD]ata"\s*:\s*\{')
+_DATA_KEY = re.compile(rb'"data"\s*:\s*"')
+# Longest key pattern above, kept between chunks so a split key is still found
+_KEY_TAIL = 64
+
+
+class InlineDataDecoder:
+    """Incrementally decodes the first inline image in a generateContent response.
+
+    Response bytes are fed as they arrive; the JSON document is never parsed
+    or held as a whole, and the base64 text is decoded chunk by chunk.
+    """
+
+    def __init__(self) -> None:
+        self._state = "inline"
+        self._pending = bytearray()
+        self._image = bytearray()
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: bytes) -> None:
+        if self._state == "done":
+            return
+        self._pending += chunk
+        if self._state == "inline" and not self._skip_to(_INLINE_KEY, "data"):
+            return
+        if self._state == "data" and not self._skip_to(_DATA_KEY, "decode"):
+            return
+        self._decode()
+
+    def result(self) -> bytes:
+        if self._state != "done":
+            raise GeminiError("Gemini response missing inline image data")
+        return bytes(self._image)
+
+    def _skip_to(self, pattern: re.Pattern[bytes], next_state: str) -> bool:
+        match = pattern.search(self._pending)
+        if match is None:
+            del self._pending[:-_KEY_TAIL]
+            return False
+        del self._pending[: match.end()]
+        self._state = next_state
+        return True
+
+    def _decode(self) -> None:
+        end = self._pending.find(b'"')
+        if end >= 0:
+            encoded = self._pending[:end]
+            self._state = "done"
+        else:
+            encoded = self._pending
+        # base64 never contains a backslash; drop JSON escapes such as "\/"
+        if b"\\" in encoded:
+            encoded = encoded.replace(b"\\", b"")
+        usable = len(encoded) if end >= 0 else len(encoded) - len(encoded) % 4
+        try:
+            self._image += base64.b64decode(bytes(encoded[:usable]))
+        except ValueError as exc:
+            raise GeminiError("Gemini response has invalid inline image data") from exc
+        self._pending = bytearray(encoded[usable:]) if end < 0 else bytearray()
+
+
 class GeminiImageClient:
-    def __init__(self, api_key: str, model: str, prompt_preset: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        prompt_preset: str,
+        async_client: Optional[httpx.AsyncClient] = None,
+        timeout: float = 60.0,
+    ) -> None:
         self.api_key = api_key
         self.model = model
         self.prompt_preset = prompt_preset
+        self.timeout = timeout
+        # Shared pooled client set by the app lifespan; used by the async methods
+        self.async_client = async_client
         self._base_url = "https://generativelanguage.googleapis.com/v1beta"
-        self._client = httpx.Client(timeout=60.0)
+        self._client = httpx.Client(timeout=timeout)
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    def enhance_image(self, image_bytes: bytes, preset: str | None = None) -> bytes:
-        payload = self._build_payload(image_bytes, preset or self.prompt_preset)
-        response = self._post_generate(payload)
-        return self._extract_image(response)
-
-    def replace_background(self, image_bytes: bytes, prompt: str | None = None) -> bytes:
-        payload = self._build_payload(image_bytes, prompt or self.prompt_preset)
-        response = self._post_generate(payload)
-        return self._extract_image(response)
-
-    def _build_payload(self, image_bytes: bytes, prompt_text: str) -> Dict[str, Any]:
-        encoded = base64.b64encode(image_bytes).decode("utf-8")
-        return {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt_text},
-                        {
-                            "inline_data": {
-                                "mime_type": "image/png",
-                                "data": encoded,
-                            }
-                        },
-                    ]
-                }
-            ]
-        }
-
-    def _post_generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def enhance_image(self, image_bytes: bytes, preset: str | None = None, mime_type: str = "image/png") -> bytes:
+        return self._generate(image_bytes, preset or self.prompt_preset, mime_type)
+
+    def replace_background(self, image_bytes: bytes, prompt: str | None = None, mime_type: str = "image/png") -> bytes:
+        return self._generate(image_bytes, prompt or self.prompt_preset, mime_type)
+
+    async def aenhance_image(self, image_bytes: bytes, preset: str | None = None, mime_type: str = "image/png") -> bytes:
+        return await self._agenerate(image_bytes, preset or self.prompt_preset, mime_type)
+
+    async def areplace_background(self, image_bytes: bytes, prompt: str | None = None, mime_type: str = "image/png") -> bytes:
+        return await self._agenerate(image_bytes, prompt or self.prompt_preset, mime_type)
+
+    def _envelope(self, image_bytes: bytes, prompt_text: str, mime_type: str) -> Tuple[bytes, bytes, Dict[str, str]]:
+        """JSON before and after the base64 image, plus headers for the streamed body."""
+        prefix = (
+            '{"contents":[{"parts":[{"text":'
+            + json.dumps(prompt_text)
+            + '},{"inline_data":{"mime_type":'
+            + json.dumps(mime_type)
+            + ',"data":"'
+        ).encode("utf-8")
+        suffix = b'"}}]}]}'
+        length = len(prefix) + 4 * ((len(image_bytes) + 2) // 3) + len(suffix)
+        headers = {"content-type": "application/json", "content-length": str(length)}
+        return prefix, suffix, headers
+
+    def _iter_payload(self, image_bytes: bytes, prefix: bytes, suffix: bytes) -> Iterator[bytes]:
+        yield prefix
+        view = memoryview(image_bytes)
+        for start in range(0, len(view), _ENCODE_CHUNK):
+            yield base64.b64encode(view[start : start + _ENCODE_CHUNK])
+        yield suffix
+
+    async def _aiter_payload(self, image_bytes: bytes, prefix: bytes, suffix: bytes) -> AsyncIterator[bytes]:
+        for chunk in self._iter_payload(image_bytes, prefix, suffix):
+            yield chunk
+
+    def _generate(self, image_bytes: bytes, prompt_text: str, mime_type: str) -> bytes:
         if not self.api_key:
             raise GeminiError("Gemini API key is not configured")
-        url = f"{self._base_url}/models/{self.model}:generateContent"
-        response = self._client.post(url, params={"key": self.api_key}, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        return data
+        prefix, suffix, headers = self._envelope(image_bytes, prompt_text, mime_type)
+        content = self._iter_payload(image_bytes, prefix, suffix)
+        with self._client.stream("POST", self._url(), params={"key": self.api_key}, content=content, headers=headers) as response:
+            if response.is_error:
+                response.read()
+                response.raise_for_status()
+            decoder = InlineDataDecoder()
+            for chunk in response.iter_bytes():
+                decoder.feed(chunk)
+                if decoder.done:
+                    break
+        return decoder.result()
 
-    def _extract_image(self, response_json: Dict[str, Any]) -> bytes:
-        try:
-            parts = response_json["candidates"][0]["content"]["parts"]
-            inline = next(part for part in parts if "inline_data" in part)
-            data_b64 = inline["inline_data"]["data"]
-        except (KeyError, IndexError, StopIteration) as exc:
-            raise GeminiError("Gemini response missing inline image data") from exc
-        return base64.b64decode(data_b64)
+    async def _agenerate(self, image_bytes: bytes, prompt_text: str, mime_type: str) -> bytes:
+        if not self.api_key:
+            raise GeminiError("Gemini API key is not configured")
+        if self.async_client is None:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                return await self._agenerate_with(client, image_bytes, prompt_text, mime_type)
+        return await self._agenerate_with(self.async_client, image_bytes, prompt_text, mime_type)
+
+    async def _agenerate_with(self, client: httpx.AsyncClient, image_bytes: bytes, prompt_text: str, mime_type: str) -> bytes:
+        prefix, suffix, headers = self._envelope(image_bytes, prompt_text, mime_type)
+        content = self._aiter_payload(image_bytes, prefix, suffix)
+        async with client.stream(
+            "POST",
+            self._url(),
+            params={"key": self.api_key},
+            content=content,
+            headers=headers,
+            timeout=self.timeout,
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            decoder = InlineDataDecoder()
+            async for chunk in response.aiter_bytes():
+                decoder.feed(chunk)
+                if decoder.done:
+                    break
+        return decoder.result()
+
+    def _url(self) -> str:
+        return f"{self._base_url}/models/{self.model}:generateContent"
 
 
-__all__ = ["GeminiImageClient", "GeminiError"]
+__all__ = ["GeminiImageClient", "GeminiError", "InlineDataDecoder"]
@@ -18,26 +18,21 @@ class LocalEnhancer:
         self.config = config or LocalEnhanceConfig()
 
     def enhance_image(self, image: Image.Image) -> Image.Image:
-        enhanced = image.convert("RGBA")
+        enhanced = image.convert("RGB" if image.mode == "RGB" else "RGBA")
         enhanced = ImageEnhance.Sharpness(enhanced).enhance(1.15)
         enhanced = ImageEnhance.Color(enhanced).enhance(1.05)
         enhanced = ImageEnhance.Brightness(enhanced).enhance(1.02)
         return enhanced
 
     def replace_background(self, image: Image.Image) -> Image.Image:
-        base = image.convert("RGBA").copy()
-        pixels = base.load()
-        width, height = base.size
-        for y in range(height):
-            for x in range(width):
-                r, g, b, a = pixels[x, y]
-                pixels[x, y] = (
-                    min(255, int(r * 0.9 + 25)),
-                    min(255, int(g * 0.9 + 20)),
-                    min(255, int(b * 0.9 + 15)),
-                    a,
-                )
-        return base
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # Per-band lookup tables; alpha, if any, passes through unchanged
+        red = [min(255, int(value * 0.9 + 25)) for value in range(256)]
+        green = [min(255, int(value * 0.9 + 20)) for value in range(256)]
+        blue = [min(255, int(value * 0.9 + 15)) for value in range(256)]
+        alpha = list(range(256)) if image.mode == "RGBA" else []
+        return image.point(red + green + blue + alpha)
 
 
 def load_local_config(raw: dict | None) -> LocalEnhanceConfig:
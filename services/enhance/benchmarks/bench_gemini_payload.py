@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Peak memory and time of one Gemini round trip, excluding the network.
+
+"dict" rebuilds the previous client behaviour: base64 str in a payload dict,
+json= serialisation, response.json() and b64decode of the whole field.
+"stream" is GeminiImageClient: prebuilt envelope around chunked base64 on the
+way out, InlineDataDecoder on the way back. Both talk to an httpx.MockTransport
+that consumes the request body and answers with a pre-serialised response.
+
+Usage:
+    python benchmarks/bench_gemini_payload.py [--mb 24] [--repeat 3]
+
+As with load_http.py, BRAND_CONFIG and PROVIDERS_CONFIG must point at valid
+config files because importing the app package builds the app.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.gemini import GeminiImageClient  # noqa: E402
+
+URL = "https://generativelanguage.googleapis.com/v1beta/models/bench:generateContent"
+
+
+def _transport(response_body: bytes) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        for _ in request.stream:
+            pass
+        chunks = (response_body[i : i + 65536] for i in range(0, len(response_body), 65536))
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=chunks)
+
+    return httpx.MockTransport(handler)
+
+
+def _dict_round_trip(client: httpx.Client, image: bytes) -> bytes:
+    payload = {
+        "contents": [
+            {
+                "parts": [
+                    {"text": "enhance"},
+                    {"inline_data": {"mime_type": "image/png", "data": base64.b64encode(image).decode("utf-8")}},
+                ]
+            }
+        ]
+    }
+    response = client.post(URL, params={"key": "bench"}, json=payload)
+    data = response.json()
+    return base64.b64decode(data["candidates"][0]["content"]["parts"][0]["inline_data"]["data"])
+
+
+def _measure(run, repeat: int) -> tuple[float, float]:
+    best = float("inf")
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=24, help="Image payload size in MB (both directions)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image = os.urandom(args.mb * 1024 * 1024)
+    response_body = json.dumps(
+        {"candidates": [{"content": {"parts": [{"inline_data": {"data": base64.b64encode(image).decode("ascii")}}]}}]}
+    ).encode("utf-8")
+    transport = _transport(response_body)
+
+    plain = httpx.Client(transport=transport)
+    streaming = GeminiImageClient("bench", "bench", "enhance")
+    streaming._client = httpx.Client(transport=transport)
+
+    assert _dict_round_trip(plain, image) == image
+    assert streaming.enhance_image(image) == image
+
+    print(f"{args.mb} MB image, best of {args.repeat}")
+    print(f"{'path':<8} {'ms':>8} {'peak MB':>9}")
+    for name, run in (
+        ("dict", lambda: _dict_round_trip(plain, image)),
+        ("stream", lambda: streaming.enhance_image(image)),
+    ):
+        seconds, peak_mb = _measure(run, args.repeat)
+        print(f"{name:<8} {seconds * 1000:>8.0f} {peak_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
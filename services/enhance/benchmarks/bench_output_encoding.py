@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Encode time and file size of one result in each output format.
+
+"legacy" is the previous save_image: RGBA PNG at Pillow's default zlib level.
+The other rows go through app.io.save_image, which writes opaque results as
+RGB. The test image is a synthetic photo (gradients, shapes and sensor-like
+noise) so that sizes are in the range of real camera output; pass --input to
+use a real photo instead.
+
+Usage:
+    python benchmarks/bench_output_encoding.py [--megapixels 12] [--repeat 3] [--input photo.jpg]
+
+As with load_http.py, BRAND_CONFIG and PROVIDERS_CONFIG must point at valid
+config files because importing the app package builds the app.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.io import OutputFormat, save_image  # noqa: E402
+
+CASES = [
+    ("png level 1", OutputFormat("png", compress_level=1)),
+    ("png level 3", OutputFormat("png", compress_level=3)),
+    ("png level 6", OutputFormat("png", compress_level=6)),
+    ("webp q90 m4", OutputFormat("webp", quality=90, compress_level=4)),
+    ("webp q90 m1", OutputFormat("webp", quality=90, compress_level=1)),
+    ("webp q80 m4", OutputFormat("webp", quality=80, compress_level=4)),
+    ("jpeg q90", OutputFormat("jpeg", quality=90)),
+    ("jpeg q95", OutputFormat("jpeg", quality=95)),
+]
+
+
+def _synthetic_photo(megapixels: float) -> Image.Image:
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    horizontal = Image.linear_gradient("L").resize((width, height))
+    vertical = Image.linear_gradient("L").rotate(90).resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    image = Image.merge("RGB", (horizontal, vertical, noise)).filter(ImageFilter.GaussianBlur(2))
+    draw = ImageDraw.Draw(image)
+    for i in range(40):
+        x, y = (i * 7919) % width, (i * 104729) % height
+        draw.ellipse((x, y, x + width // 8, y + height // 8), fill=((i * 50) % 256, (i * 90) % 256, (i * 130) % 256))
+    grain = Image.merge("RGB", [Image.effect_noise((width, height), 6)] * 3)
+    return Image.blend(image, grain, 0.15)
+
+
+def _legacy_save(image: Image.Image, destination: Path) -> int:
+    image.convert("RGBA").save(destination, format="PNG")
+    return destination.stat().st_size
+
+
+def _measure(run, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = run()
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--input", type=Path, help="Photo to encode instead of the synthetic image")
+    args = parser.parse_args()
+
+    if args.input:
+        with Image.open(args.input) as source:
+            image = source.convert("RGB")
+    else:
+        image = _synthetic_photo(args.megapixels)
+    # Results reach save_image as RGBA after watermarking, even when fully opaque
+    result = image.convert("RGBA")
+
+    print(f"{image.width}x{image.height}, best of {args.repeat}")
+    print(f"{'format':<14} {'ms':>8} {'MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [("legacy png", lambda: _legacy_save(result, Path(tmp) / "legacy.png"))]
+        rows += [
+            (name, lambda fmt=fmt, name=name: save_image(result, Path(tmp) / f"{name.replace(' ', '_')}{fmt.extension}", fmt))
+            for name, fmt in CASES
+        ]
+        for name, run in rows:
+            seconds, size = _measure(run, args.repeat)
+            print(f"{name:<14} {seconds * 1000:>8.0f} {size / 1024 / 1024:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Load test for outbound HTTP: input downloads and Gemini calls against a local stub.
+
+The stub runs in a subprocess and serves GET /image.png (a fixed payload) and
+POST .../:generateContent (a canned Gemini response after --latency-ms). It
+counts TCP connections (GET /stats), so the per-request clients used before the
+shared pool show up as one connection per call.
+
+Scenarios:
+    fetch/per-request   fetch_image_bytes with a new AsyncClient per call (old behaviour)
+    fetch/pooled        fetch_image_bytes on the lifespan client from create_http_client
+    gemini/threadpool   sync GeminiImageClient calls on a 40-thread pool (old behaviour)
+    gemini/async        GeminiImageClient.aenhance_image on the pooled client
+
+Usage:
+    python benchmarks/load_http.py [--requests 200] [--concurrency 20] [--size-kb 512] [--latency-ms 200]
+
+Importing the app package builds the app, so BRAND_CONFIG and PROVIDERS_CONFIG
+must point at valid config files, as when running the service.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import Settings  # noqa: E402
+from app.http_client import create_http_client, fetch_image_bytes  # noqa: E402
+from app.services.gemini import GeminiImageClient  # noqa: E402
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls on kept-alive connections
+    disable_nagle_algorithm = True
+    payload = b""
+    gemini_body = b""
+    latency_s = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self) -> None:
+        super().setup()
+        with _StubHandler.lock:
+            _StubHandler.connections += 1
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/stats":
+            self._reply(json.dumps({"connections": _StubHandler.connections}).encode(), "application/json")
+        else:
+            self._reply(self.payload, "image/png")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(self.latency_s)
+        self._reply(self.gemini_body, "application/json")
+
+    def _reply(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections under load
+    request_queue_size = 1024
+
+
+def _serve_stub(size_kb: int, latency_ms: int) -> None:
+    _StubHandler.payload = bytes(size_kb * 1024)
+    image_b64 = base64.b64encode(bytes(size_kb * 1024)).decode("ascii")
+    _StubHandler.gemini_body = json.dumps(
+        {"candidates": [{"content": {"parts": [{"inline_data": {"data": image_b64}}]}}]}
+    ).encode()
+    _StubHandler.latency_s = latency_ms / 1000
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+def _stub_connections(base_url: str) -> int:
+    import httpx
+
+    return httpx.get(f"{base_url}/stats").json()["connections"]
+
+
+def _report(name: str, latencies: list[float], elapsed: float, connections: int) -> None:
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<20} {len(latencies) / elapsed:>8.1f} {statistics.median(latencies) * 1000:>8.1f} "
+        f"{p95 * 1000:>8.1f} {connections:>6}"
+    )
+
+
+async def _drive(call, requests: int, concurrency: int) -> tuple[list[float], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+async def _run(args: argparse.Namespace, base_url: str) -> None:
+    settings = Settings(http_max_connections=args.concurrency, http_max_keepalive_connections=args.concurrency)
+    image_url = f"{base_url}/image.png"
+    print(f"{'scenario':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'conns':>6}")
+
+    async def scenario(name: str, call) -> None:
+        before = _stub_connections(base_url)
+        latencies, elapsed = await _drive(call, args.requests, args.concurrency)
+        # Minus the /stats request itself
+        _report(name, latencies, elapsed, _stub_connections(base_url) - before - 1)
+
+    await scenario("fetch/per-request", lambda: fetch_image_bytes(image_url))
+    async with create_http_client(settings) as pooled:
+        await scenario("fetch/pooled", lambda: fetch_image_bytes(image_url, pooled, settings.max_download_bytes))
+
+        gemini = GeminiImageClient("stub-key", "stub-model", "enhance", async_client=pooled)
+        gemini._base_url = base_url
+        image = bytes(args.size_kb * 1024)
+
+        # anyio's default threadpool, which run_in_threadpool uses, has 40 threads
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            await scenario("gemini/threadpool", lambda: loop.run_in_executor(pool, gemini.enhance_image, image))
+        await scenario("gemini/async", lambda: gemini.aenhance_image(image))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=512, help="Payload size of the stub image")
+    parser.add_argument("--latency-ms", type=int, default=200, help="Simulated Gemini latency")
+    parser.add_argument("--stub", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub:
+        _serve_stub(args.size_kb, args.latency_ms)
+        return
+
+    # A separate process, so the stub does not compete with the client for the GIL
+    stub = subprocess.Popen(
+        [sys.executable, __file__, "--stub", "--size-kb", str(args.size_kb), "--latency-ms", str(args.latency_ms)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        port = int(stub.stdout.readline())
+        asyncio.run(_run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
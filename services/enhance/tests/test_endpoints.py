@@ -6,6 +6,11 @@ from pathlib import Path
 import httpx
 import pytest
 import respx
+import yaml
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import create_app
 
 
 @pytest.mark.usefixtures("setup_env")
@@ -34,3 +39,66 @@ def test_enhance_invalid_preset(test_app) -> None:
     response = test_app.post("/enhance", json={"inputUrl": "https://example.com/a.png", "preset": "invalid"})
     assert response.status_code == 400
     assert response.json()["detail"] == "unsupported preset"
+
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_enhance_rejects_oversized_download(monkeypatch) -> None:
+    monkeypatch.setenv("MAX_DOWNLOAD_BYTES", "1024")
+    url = "https://example.com/huge.png"
+    with TestClient(create_app()) as client, respx.mock(assert_all_called=True) as mock:
+        mock.get(url).mock(return_value=httpx.Response(200, content=b"x" * 4096))
+        response = client.post("/enhance", json={"inputUrl": url})
+    assert response.status_code == 413
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_input_downloads_share_the_lifespan_client(test_app, sample_image_bytes) -> None:
+    pooled = test_app.app.state.http_client
+    with respx.mock(assert_all_called=True) as mock:
+        mock.get(url__regex=r"https://example\.com/.*").mock(
+            return_value=httpx.Response(200, content=sample_image_bytes)
+        )
+        for name in ("a", "b"):
+            assert test_app.post("/enhance", json={"inputUrl": f"https://example.com/{name}.png"}).status_code == 200
+    assert test_app.app.state.http_client is pooled
+    assert not pooled.is_closed
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_enhance_negotiates_output_format(test_app, sample_image_bytes) -> None:
+    url = "https://example.com/sample.png"
+    with respx.mock(assert_all_called=True) as mock:
+        mock.get(url).mock(return_value=httpx.Response(200, content=sample_image_bytes))
+        response = test_app.post("/enhance", json={"inputUrl": url, "outputFormat": "webp", "quality": 80})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["outputUrl"].endswith("/enhanced.webp")
+    assert data["metadata"]["outputFormat"] == "webp"
+    relative = data["outputUrl"].split("/assets/")[-1]
+    with Image.open(Path(os.environ["ASSETS_ROOT"]) / relative) as output:
+        assert output.format == "WEBP"
+        # The input is opaque, so no alpha channel is written
+        assert output.mode == "RGB"
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_enhance_uses_preset_output_format(sample_image_bytes) -> None:
+    providers_path = Path(os.environ["PROVIDERS_CONFIG"])
+    providers = yaml.safe_load(providers_path.read_text(encoding="utf-8"))
+    providers["image_enhance"]["output"] = {"presets": {"enhance_cinematic": {"format": "jpeg", "quality": 85}}}
+    providers_path.write_text(yaml.safe_dump(providers), encoding="utf-8")
+
+    files = {"file": ("sample.png", sample_image_bytes, "image/png")}
+    with TestClient(create_app()) as client:
+        by_preset = client.post("/enhance", files=files)
+        by_request = client.post("/enhance", files=files, data={"outputFormat": "png", "compressionLevel": "6"})
+    assert by_preset.json()["outputUrl"].endswith("/enhanced.jpg")
+    assert by_request.json()["outputUrl"].endswith("/enhanced.png")
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_enhance_rejects_unknown_output_format(test_app) -> None:
+    response = test_app.post("/enhance", json={"inputUrl": "https://example.com/a.png", "outputFormat": "tiff"})
+    assert response.status_code == 400
+    assert "unsupported output format" in response.json()["detail"]
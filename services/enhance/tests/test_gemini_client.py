@@ -2,10 +2,17 @@ from __future__ import annotations
 
 import base64
 
+import asyncio
+import json
+
 import httpx
 import respx
 
-from app.services.gemini import GeminiImageClient
+import pytest
+from PIL import Image
+
+from app.io import encode_for_transport
+from app.services.gemini import GeminiError, GeminiImageClient, InlineDataDecoder
 
 
 def test_gemini_client_posts_expected_payload(sample_image_bytes) -> None:
@@ -27,6 +34,67 @@ def test_gemini_client_posts_expected_payload(sample_image_bytes) -> None:
         route = mock.post(url).mock(return_value=httpx.Response(200, json=response_body))
         result = client.enhance_image(sample_image_bytes, "custom-preset")
     assert route.called
-    sent_json = route.calls[0].request.json()
+    request = route.calls[0].request
+    body = request.read()
+    assert int(request.headers["content-length"]) == len(body)
+    sent_json = json.loads(body)
+    assert sent_json["contents"][0]["parts"][1]["inline_data"]["data"] == image_b64
     assert sent_json["contents"][0]["parts"][0]["text"] == "custom-preset"
     assert result == sample_image_bytes
+
+
+def test_gemini_client_async_path_uses_shared_client(sample_image_bytes) -> None:
+    image_b64 = base64.b64encode(sample_image_bytes).decode("utf-8")
+    response_body = {"candidates": [{"content": {"parts": [{"inline_data": {"data": image_b64}}]}}]}
+    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-test:generateContent"
+
+    async def run() -> bytes:
+        async with httpx.AsyncClient() as shared:
+            client = GeminiImageClient("test-key", "gemini-test", "preset-text", async_client=shared)
+            return await client.areplace_background(sample_image_bytes, "new background")
+
+    with respx.mock(assert_all_called=True) as mock:
+        route = mock.post(url).mock(return_value=httpx.Response(200, json=response_body))
+        result = asyncio.run(run())
+    assert route.call_count == 1
+    assert result == sample_image_bytes
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_inline_data_decoder_handles_split_chunks(sample_image_bytes, chunk_size) -> None:
+    image_b64 = base64.b64encode(sample_image_bytes).decode("utf-8")
+    body = json.dumps(
+        {
+            "candidates": [
+                {
+                    "content": {
+                        "parts": [
+                            {"text": 'mentions "inline_data": {} in prose'},
+                            {"inlineData": {"mimeType": "image/png", "data": image_b64}},
+                        ]
+                    }
+                }
+            ]
+        }
+    ).encode("utf-8").replace(b"/", b"\\/")
+    decoder = InlineDataDecoder()
+    for start in range(0, len(body), chunk_size):
+        decoder.feed(body[start : start + chunk_size])
+    assert decoder.result() == sample_image_bytes
+
+
+def test_inline_data_decoder_requires_image() -> None:
+    decoder = InlineDataDecoder()
+    decoder.feed(b'{"candidates": [{"content": {"parts": [{"text": "no image"}]}}]}')
+    with pytest.raises(GeminiError):
+        decoder.result()
+
+
+def test_encode_for_transport_keeps_alpha_as_png() -> None:
+    opaque = Image.new("RGBA", (8, 8), (10, 20, 30, 255))
+    translucent = Image.new("RGBA", (8, 8), (10, 20, 30, 128))
+
+    data, mime_type = encode_for_transport(opaque, "jpeg")
+    assert mime_type == "image/jpeg" and data[:2] == b"\xff\xd8"
+    data, mime_type = encode_for_transport(translucent, "jpeg")
+    assert mime_type == "image/png" and data[:4] == b"\x89PNG"
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.io import OutputFormat, load_image_from_bytes, save_image
+
+
+def test_save_image_drops_unused_alpha(tmp_path: Path) -> None:
+    opaque = Image.new("RGBA", (8, 8), (10, 20, 30, 255))
+    translucent = Image.new("RGBA", (8, 8), (10, 20, 30, 128))
+
+    save_image(opaque, tmp_path / "opaque.png")
+    save_image(translucent, tmp_path / "translucent.webp", OutputFormat("webp", lossless=True))
+    with Image.open(tmp_path / "opaque.png") as image:
+        assert image.mode == "RGB"
+    with Image.open(tmp_path / "translucent.webp") as image:
+        assert image.mode == "RGBA"
+
+
+def test_save_image_flattens_transparency_for_jpeg(tmp_path: Path) -> None:
+    clear = Image.new("RGBA", (8, 8), (0, 0, 0, 0))
+    size = save_image(clear, tmp_path / "clear.jpg", OutputFormat("jpg", quality=95))
+    assert size == (tmp_path / "clear.jpg").stat().st_size
+    with Image.open(tmp_path / "clear.jpg") as image:
+        assert image.format == "JPEG"
+        assert min(image.getextrema()[0]) > 250  # white, not black
+
+
+def test_load_image_keeps_rgb_for_opaque_input(sample_image_bytes) -> None:
+    assert load_image_from_bytes(sample_image_bytes).mode == "RGB"
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"format": "gif"}, {"quality": 0}, {"quality": 101}, {"compress_level": 10}],
+)
+def test_output_format_validation(options) -> None:
+    with pytest.raises(ValueError):
+        OutputFormat(**options)
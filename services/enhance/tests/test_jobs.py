@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+
+from app.jobs import JobStore
+from app.main import create_app
+
+
+def _wait_for(client: TestClient, asset_id: str, webhook: bool = False, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{asset_id}").json()
+        # The webhook goes out after the final status is recorded
+        if job["status"] in ("succeeded", "failed") and (job["webhookStatus"] or not webhook):
+            return job
+        if time.monotonic() > deadline:
+            raise AssertionError(f"job did not finish: {job}")
+        time.sleep(0.05)
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_async_enhance_returns_202_and_posts_webhook(test_app, sample_image_bytes) -> None:
+    hook = "https://hooks.example.com/enhance-done"
+    with respx.mock(assert_all_called=True) as mock:
+        webhook = mock.post(hook).mock(return_value=httpx.Response(200))
+        response = test_app.post(
+            "/enhance",
+            files={"file": ("sample.png", sample_image_bytes, "image/png")},
+            data={"async": "true", "webhookUrl": hook},
+        )
+        assert response.status_code == 202
+        accepted = response.json()
+        assert accepted["status"] == "queued"
+        assert response.headers["location"] == f"/jobs/{accepted['assetId']}"
+        job = _wait_for(test_app, accepted["assetId"], webhook=True)
+
+    assert job["status"] == "succeeded"
+    assert job["webhookStatus"] == "delivered"
+    assert job["result"]["assetId"] == accepted["assetId"]
+    output = Path(os.environ["ASSETS_ROOT"]) / job["result"]["outputUrl"].split("/assets/")[-1]
+    assert output.exists()
+    delivered = json.loads(webhook.calls.last.request.content)
+    assert delivered["assetId"] == accepted["assetId"]
+    assert delivered["status"] == "succeeded"
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_slow_webhook_does_not_hold_up_the_next_job(monkeypatch, sample_image_bytes) -> None:
+    monkeypatch.setenv("JOB_WORKERS", "1")
+    hook = "https://hooks.example.com/down"
+    with respx.mock(assert_all_called=True) as mock:
+        mock.post(hook).mock(return_value=httpx.Response(500))
+        with TestClient(create_app()) as client:
+            first, second = (
+                client.post(
+                    "/enhance",
+                    files={"file": ("sample.png", sample_image_bytes, "image/png")},
+                    data={"async": "true", "webhookUrl": hook},
+                ).json()
+                for _ in range(2)
+            )
+            # The first webhook is still backing off between retries
+            assert _wait_for(client, second["assetId"], timeout=2.0)["status"] == "succeeded"
+            assert client.get(f"/jobs/{first['assetId']}").json()["webhookStatus"] is None
+            assert _wait_for(client, first["assetId"], webhook=True)["webhookStatus"] == "failed"
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_job_store_is_opened_by_the_lifespan() -> None:
+    jobs_dir = Path(os.environ["ASSETS_ROOT"]) / "jobs"
+    app = create_app()
+    assert not jobs_dir.exists()
+    with TestClient(app):
+        assert (jobs_dir / "jobs.sqlite3").exists()
+        assert (jobs_dir / "spool").is_dir()
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_async_job_records_download_failure(test_app) -> None:
+    url = "https://example.com/missing.png"
+    with respx.mock(assert_all_called=True) as mock:
+        mock.get(url).mock(return_value=httpx.Response(404))
+        response = test_app.post("/background/replace", json={"inputUrl": url, "async": True})
+        assert response.status_code == 202
+        job = _wait_for(test_app, response.json()["assetId"])
+    assert job["status"] == "failed"
+    assert job["kind"] == "background"
+    assert job["error"]
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_unknown_job_is_404(test_app) -> None:
+    assert test_app.get("/jobs/does-not-exist").status_code == 404
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_full_job_queue_is_503(monkeypatch, sample_image_bytes) -> None:
+    monkeypatch.setenv("JOB_QUEUE_SIZE", "0")
+    with TestClient(create_app()) as client:
+        response = client.post(
+            "/enhance",
+            files={"file": ("sample.png", sample_image_bytes, "image/png")},
+            data={"async": "true"},
+        )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "30"
+
+
+@pytest.mark.usefixtures("setup_env")
+def test_unfinished_jobs_resume_after_restart(sample_image_bytes) -> None:
+    jobs_dir = Path(os.environ["ASSETS_ROOT"]) / "jobs"
+    store = JobStore(jobs_dir / "jobs.sqlite3")
+    params = {"preset": "enhance_cinematic", "output": {"format": "png"}, "metadata": {}}
+    store.create("resumed", "enhance", params, None)
+    store.update("resumed", status="running")
+    store.create("lost", "enhance", params, None)
+    store.close()
+    (jobs_dir / "spool").mkdir(parents=True)
+    (jobs_dir / "spool" / "resumed.input").write_bytes(sample_image_bytes)
+
+    with TestClient(create_app()) as client:
+        resumed = _wait_for(client, "resumed")
+        lost = client.get("/jobs/lost").json()
+    assert resumed["status"] == "succeeded"
+    assert lost["status"] == "failed"
+    assert lost["error"] == "input was lost on restart"
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.cache import ResultCache
+from app.main import create_app
+
+
+def _write(path: Path, size: int) -> Path:
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_result_cache_round_trip_and_lru_eviction(tmp_path: Path) -> None:
+    cache = ResultCache(tmp_path / "cache", max_bytes=250)
+    keys = [ResultCache.key("img", "enhance", f"preset-{i}", "model", "gemini") for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, _write(tmp_path / f"out{i}.png", 100), {"backend": "gemini", "n": i})
+
+    # Touch the first entry so the second is least recently used
+    assert cache.get(keys[0], tmp_path / "hit" / "a.png") == {"backend": "gemini", "n": 0}
+    cache.put(keys[2], _write(tmp_path / "out2.png", 100), {"n": 2})
+
+    assert cache.get(keys[1], tmp_path / "hit" / "b.png") is None
+    assert cache.get(keys[2], tmp_path / "hit" / "c.png") == {"n": 2}
+    assert (tmp_path / "hit" / "a.png").read_bytes() == b"x" * 100
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 200
+
+
+def test_result_cache_index_survives_restart(tmp_path: Path) -> None:
+    key = ResultCache.key("img", "background", "prompt", "model", "gemini")
+    ResultCache(tmp_path / "cache", max_bytes=1000).put(key, _write(tmp_path / "out.png", 10), {"prompt": "p"})
+
+    reloaded = ResultCache(tmp_path / "cache", max_bytes=1000)
+    assert reloaded.stats()["entries"] == 1
+    assert reloaded.get(key, tmp_path / "copy.png") == {"prompt": "p"}
+
+
+def test_result_cache_key_depends_on_every_part() -> None:
+    base = ResultCache.key("img", "enhance", "preset", "model", "gemini")
+    assert base == ResultCache.key("img", "enhance", "preset", "model", "gemini")
+    assert base != ResultCache.key("img2", "enhance", "preset", "model", "gemini")
+    assert base != ResultCache.key("img", "enhance", "other", "model", "gemini")
+    assert base != ResultCache.key("img", "enhance", "preset", "model-2", "gemini")
+    assert base != ResultCache.key("img", "enhance", "preset", "model", "local")
+
+
+def test_enhance_reuses_cached_result(test_app, sample_image_bytes) -> None:
+    files = {"file": ("sample.png", sample_image_bytes, "image/png")}
+    first = test_app.post("/enhance", files=files, data={"metadata": '{"campaign": "spring"}'})
+    second = test_app.post("/enhance", files=files, data={"metadata": '{"campaign": "spring"}'})
+
+    assert first.status_code == 200 and second.status_code == 200
+    first_meta, second_meta = first.json()["metadata"], second.json()["metadata"]
+    assert first_meta["cacheHit"] is False
+    assert second_meta["cacheHit"] is True
+    assert second_meta["campaign"] == "spring"
+    assert second_meta["backend"] == first_meta["backend"]
+    assert second.json()["assetId"] != first.json()["assetId"]
+
+    assets_root = Path(os.environ["ASSETS_ROOT"])
+    outputs = [assets_root / response.json()["outputUrl"].split("/assets/")[-1] for response in (first, second)]
+    assert outputs[0].read_bytes() == outputs[1].read_bytes()
+
+
+def test_result_cache_opened_with_app_lifespan() -> None:
+    cache_dir = Path(os.environ["ASSETS_ROOT"]) / "cache"
+    app = create_app()
+    assert not cache_dir.exists()
+
+    with TestClient(app) as client:
+        assert cache_dir.is_dir()
+        assert client.get("/health").json()["resultCache"]["entries"] == 0
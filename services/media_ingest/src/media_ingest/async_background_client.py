@@ -0,0 +1,312 @@
+"""Asyncio background processing client for batch workloads"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Union
+
+import httpx
+from loguru import logger
+
+from .background_client import (
+    BackgroundClientConfig,
+    BackgroundClientError,
+    BackgroundMetadata,
+    BGEngine,
+    BGMode,
+    ImageInput,
+    encode_image_payload,
+)
+
+# Statuses that mean the service is busy rather than broken, so retrying makes sense
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+@dataclass
+class BackgroundBatchResult:
+    """Outcome of one image in a batch call"""
+    image_path: Path
+    metadata: Optional[BackgroundMetadata] = None
+    error: Optional[BackgroundClientError] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AsyncBackgroundClient:
+    """Async client for the background processing service
+
+    Keeps up to ``max_concurrency`` requests in flight over a pooled
+    ``httpx.AsyncClient`` so a batch keeps the service queue full without
+    tying up pipeline worker threads.
+    """
+
+    def __init__(self,
+                 config: Optional[BackgroundClientConfig] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.config = config or BackgroundClientConfig()
+
+        # Override from environment variables
+        if os.getenv("BACKGROUND_API_URL"):
+            self.config.base_url = os.getenv("BACKGROUND_API_URL")
+        if os.getenv("BACKGROUND_TIMEOUT"):
+            self.config.timeout = int(os.getenv("BACKGROUND_TIMEOUT"))
+        if os.getenv("BACKGROUND_MAX_CONCURRENCY"):
+            self.config.max_concurrency = int(os.getenv("BACKGROUND_MAX_CONCURRENCY"))
+        if os.getenv("BACKGROUND_TRANSPORT_FORMAT"):
+            self.config.transport_format = os.getenv("BACKGROUND_TRANSPORT_FORMAT")
+
+        self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.config.base_url,
+            timeout=httpx.Timeout(self.config.timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=self.config.max_concurrency,
+                max_keepalive_connections=self.config.max_concurrency
+            ),
+            transport=transport
+        )
+
+        logger.info(
+            f"Async background client initialized with base_url: {self.config.base_url} "
+            f"(max_concurrency={self.config.max_concurrency})"
+        )
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncBackgroundClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff so retries from a batch don't synchronise"""
+        return random.uniform(0, self.config.retry_delay * (2 ** attempt))
+
+    async def _make_request(self, endpoint: str, files: Dict, data: Dict) -> Dict[str, Any]:
+        """Make HTTP request with bounded concurrency and jittered retries"""
+        for attempt in range(self.config.retry_attempts):
+            last_attempt = attempt == self.config.retry_attempts - 1
+            try:
+                async with self._semaphore:
+                    logger.info(f"Making request to {endpoint} (attempt {attempt + 1}/{self.config.retry_attempts})")
+                    response = await self._client.post(endpoint, files=files, data=data)
+
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get("success"):
+                        logger.info(f"Request successful: {result.get('message')}")
+                        return result
+                    raise BackgroundClientError(
+                        result.get("error", "Unknown error"),
+                        "PROCESSING_FAILED"
+                    )
+
+                if response.status_code in RETRYABLE_STATUS_CODES and not last_attempt:
+                    logger.warning(f"Service busy (HTTP {response.status_code}) on attempt {attempt + 1}")
+                else:
+                    raise BackgroundClientError(
+                        f"HTTP {response.status_code}: {response.text}",
+                        "HTTP_ERROR"
+                    )
+
+            except httpx.TimeoutException:
+                logger.warning(f"Request timeout on attempt {attempt + 1}")
+                if last_attempt:
+                    raise BackgroundClientError("Request timed out", "TIMEOUT")
+
+            except httpx.TransportError:
+                logger.warning(f"Connection error on attempt {attempt + 1}")
+                if last_attempt:
+                    raise BackgroundClientError("Connection failed", "CONNECTION_ERROR")
+
+            except BackgroundClientError:
+                raise
+
+            except Exception as e:
+                logger.warning(f"Unexpected error on attempt {attempt + 1}: {e}")
+                if last_attempt:
+                    raise BackgroundClientError(f"Unexpected error: {str(e)}", "UNKNOWN_ERROR")
+
+            # Wait before retry, outside the semaphore so other requests can proceed
+            await asyncio.sleep(self._backoff(attempt))
+
+        raise BackgroundClientError("Request failed", "UNKNOWN_ERROR")
+
+    async def _encode(self, image: ImageInput, filename: Optional[str]):
+        """Read or encode the upload off the event loop"""
+        return await asyncio.to_thread(encode_image_payload, image, self.config, filename)
+
+    async def cleanup(self,
+                      image_path: ImageInput,
+                      mode: BGMode = BGMode.TRANSPARENT,
+                      blur_radius: Optional[int] = None,
+                      desaturate_pct: Optional[int] = None,
+                      enhance_fg: bool = True,
+                      denoise: bool = False,
+                      filename: Optional[str] = None) -> BackgroundMetadata:
+        """Clean up image background"""
+        upload = await self._encode(image_path, filename)
+
+        logger.info(f"Starting background cleanup for {upload[0]} with mode {mode}")
+
+        files = {'file': upload}
+        data = {
+            'mode': mode.value,
+            'enhance_fg': enhance_fg,
+            'denoise': denoise
+        }
+        if blur_radius is not None:
+            data['blur_radius'] = blur_radius
+        if desaturate_pct is not None:
+            data['desaturate_pct'] = desaturate_pct
+
+        result = await self._make_request('/background/cleanup', files, data)
+
+        return BackgroundMetadata(
+            mode='cleanup',
+            out_jpg=result.get('output_path'),
+            processed_at=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            settings={
+                'mode': mode.value,
+                'blur_radius': blur_radius,
+                'desaturate_pct': desaturate_pct,
+                'enhance_fg': enhance_fg,
+                'denoise': denoise
+            }
+        )
+
+    async def replace(self,
+                      image_path: ImageInput,
+                      prompt: str,
+                      negative_prompt: str = "people, text, watermark",
+                      engine: Optional[BGEngine] = None,
+                      steps: int = 20,
+                      guidance_scale: float = 7.5,
+                      seed: Optional[int] = None,
+                      enhance_fg: bool = True,
+                      match_colors: bool = True,
+                      feather_edges: bool = True,
+                      filename: Optional[str] = None) -> BackgroundMetadata:
+        """Replace image background with AI-generated content"""
+        if not prompt.strip():
+            raise BackgroundClientError("Prompt is required", "MISSING_PROMPT")
+
+        upload = await self._encode(image_path, filename)
+
+        logger.info(f"Starting background replacement for {upload[0]} with prompt: '{prompt}'")
+
+        files = {'file': upload}
+        data = {
+            'prompt': prompt,
+            'negative_prompt': negative_prompt,
+            'steps': steps,
+            'guidance_scale': guidance_scale,
+            'enhance_fg': enhance_fg,
+            'match_colors': match_colors,
+            'feather_edges': feather_edges
+        }
+        if engine:
+            data['engine'] = engine.value
+        if seed is not None:
+            data['seed'] = seed
+
+        result = await self._make_request('/background/replace', files, data)
+
+        return BackgroundMetadata(
+            mode='replace',
+            engine=engine.value if engine else None,
+            out_jpg=result.get('output_path'),
+            processed_at=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            prompt=prompt,
+            settings={
+                'negative_prompt': negative_prompt,
+                'steps': steps,
+                'guidance_scale': guidance_scale,
+                'seed': seed,
+                'enhance_fg': enhance_fg,
+                'match_colors': match_colors,
+                'feather_edges': feather_edges
+            }
+        )
+
+    async def _run_batch(self,
+                         image_paths: Iterable[Union[str, Path]],
+                         call) -> AsyncIterator[BackgroundBatchResult]:
+        """Run ``call`` for every path and yield results as they complete
+
+        A fixed window of ``max_concurrency`` workers pulls paths one at a time,
+        so only that many uploads are read and encoded at once, not the whole batch.
+        """
+        paths = iter(image_paths)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                for path in paths:
+                    path = Path(path)
+                    try:
+                        results.put_nowait(BackgroundBatchResult(image_path=path, metadata=await call(path)))
+                    except BackgroundClientError as e:
+                        results.put_nowait(BackgroundBatchResult(image_path=path, error=e))
+            except Exception as e:
+                results.put_nowait(e)
+            finally:
+                # One sentinel per worker marks it finished
+                results.put_nowait(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, self.config.max_concurrency))]
+        running = len(workers)
+        try:
+            while running:
+                item = await results.get()
+                if item is None:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            # Consumer stopped early: don't leave requests running in the background
+            for task in workers:
+                if not task.done():
+                    task.cancel()
+
+    def cleanup_many(self,
+                     image_paths: Iterable[Union[str, Path]],
+                     **kwargs) -> AsyncIterator[BackgroundBatchResult]:
+        """Clean up many images, yielding each result as soon as it completes
+
+        Keyword arguments are passed through to :meth:`cleanup`.
+        """
+        return self._run_batch(image_paths, lambda path: self.cleanup(path, **kwargs))
+
+    def replace_many(self,
+                     image_paths: Iterable[Union[str, Path]],
+                     prompt: str,
+                     **kwargs) -> AsyncIterator[BackgroundBatchResult]:
+        """Replace backgrounds for many images, yielding each result as it completes
+
+        Keyword arguments are passed through to :meth:`replace`.
+        """
+        return self._run_batch(image_paths, lambda path: self.replace(path, prompt, **kwargs))
+
+    async def is_healthy(self) -> bool:
+        """Check if the background service is healthy"""
+        try:
+            response = await self._client.get("/health", timeout=5)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+
+def create_async_client(config: Optional[BackgroundClientConfig] = None) -> AsyncBackgroundClient:
+    """Create an async background client instance"""
+    return AsyncBackgroundClient(config)
@@ -1,14 +1,20 @@
 """Background processing client for Python services"""
 
+import io
 import os
 import json
+import struct
 import time
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
 import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
 from loguru import logger
 
 
@@ -24,6 +30,24 @@ class BGMode(str, Enum):
     SOFTEN = "soften"
 
 
+class TransportFormat(str, Enum):
+    """Encoding used when uploading in-memory images"""
+    JPEG = "jpeg"  # smallest upload, lossy
+    PNG = "png"  # lossless, fast low-compression encode
+    RAW = "raw"  # uncompressed RGB with a shape header, for co-located services
+
+
+# Raw transport layout shared with background-service src/io.py:
+# magic, height, width, channels (uint32/uint32/uint8, little-endian), then RGB bytes
+RAW_MAGIC = b"VRAW"
+RAW_HEADER = struct.Struct("<4sIIB")
+RAW_CONTENT_TYPE = "application/x-vitrine-raw"
+
+# Anything cleanup/replace accept as an image: a file path, encoded bytes,
+# an RGB uint8 array (H x W x 3) or a PIL image
+ImageInput = Union[str, Path, bytes, bytearray, memoryview, io.BytesIO, np.ndarray, Image.Image]
+
+
 @dataclass
 class BackgroundClientConfig:
     """Configuration for background client"""
@@ -31,6 +55,14 @@ class BackgroundClientConfig:
     timeout: int = 300  # 5 minutes
     retry_attempts: int = 3
     retry_delay: float = 1.0
+    pool_connections: int = 2  # number of host pools to keep
+    pool_maxsize: int = 8  # keep-alive connections per host
+    health_ttl: float = 30.0  # seconds to trust a health check result
+    max_concurrency: int = 4  # in-flight requests for the async client
+    transport_format: str = TransportFormat.PNG.value  # encoding for in-memory images
+    png_compress_level: int = 1  # 0 = uncompressed, 9 = smallest
+    jpeg_quality: int = 95
+    path_handoff: bool = False  # send file paths instead of uploads (shared volume)
 
 
 @dataclass
@@ -53,6 +85,70 @@ class BackgroundClientError(Exception):
         self.code = code
 
 
+def _sniff_content_type(data: bytes) -> str:
+    """Guess the content type of an already-encoded buffer"""
+    if data[:4] == RAW_MAGIC:
+        return RAW_CONTENT_TYPE
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return "image/jpeg"
+
+
+def encode_image_payload(image: ImageInput,
+                         config: BackgroundClientConfig,
+                         filename: Optional[str] = None) -> Tuple[str, bytes, str]:
+    """Turn an image input into a multipart ``(filename, bytes, content_type)`` tuple
+    
+    Paths and encoded buffers are sent as-is. Arrays and PIL images are encoded
+    with ``config.transport_format`` so callers never have to write a temp file.
+    """
+    if isinstance(image, (str, Path)):
+        image_path = Path(image)
+        if not image_path.exists():
+            raise BackgroundClientError(f"Image file not found: {image_path}", "FILE_NOT_FOUND")
+        data = image_path.read_bytes()
+        return filename or image_path.name, data, _sniff_content_type(data)
+    
+    if isinstance(image, io.BytesIO):
+        image = image.getbuffer()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        return filename or "image", data, _sniff_content_type(data)
+    
+    if isinstance(image, Image.Image):
+        pil_image = image if image.mode == "RGB" else image.convert("RGB")
+        array = None
+    elif isinstance(image, np.ndarray):
+        if image.dtype != np.uint8 or image.ndim != 3 or image.shape[2] != 3:
+            raise BackgroundClientError(
+                f"Expected an RGB uint8 array of shape (H, W, 3), got {image.dtype} {image.shape}",
+                "INVALID_IMAGE"
+            )
+        pil_image = None
+        array = image
+    else:
+        raise BackgroundClientError(f"Unsupported image input: {type(image).__name__}", "INVALID_IMAGE")
+    
+    fmt = TransportFormat(config.transport_format)
+    stem = Path(filename).stem if filename else "image"
+    
+    if fmt == TransportFormat.RAW:
+        if array is None:
+            array = np.asarray(pil_image)
+        height, width, channels = array.shape
+        header = RAW_HEADER.pack(RAW_MAGIC, height, width, channels)
+        return f"{stem}.raw", header + np.ascontiguousarray(array).tobytes(), RAW_CONTENT_TYPE
+    
+    if pil_image is None:
+        pil_image = Image.fromarray(array, "RGB")
+    buffer = io.BytesIO()
+    if fmt == TransportFormat.PNG:
+        pil_image.save(buffer, format="PNG", compress_level=config.png_compress_level)
+        return f"{stem}.png", buffer.getvalue(), "image/png"
+    pil_image.save(buffer, format="JPEG", quality=config.jpeg_quality)
+    return f"{stem}.jpg", buffer.getvalue(), "image/jpeg"
+
+
 class BackgroundClient:
     """Client for the background processing service"""
     
@@ -64,10 +160,52 @@ class BackgroundClient:
             self.config.base_url = os.getenv("BACKGROUND_API_URL")
         if os.getenv("BACKGROUND_TIMEOUT"):
             self.config.timeout = int(os.getenv("BACKGROUND_TIMEOUT"))
+        if os.getenv("BACKGROUND_POOL_SIZE"):
+            self.config.pool_maxsize = int(os.getenv("BACKGROUND_POOL_SIZE"))
+        if os.getenv("BACKGROUND_HEALTH_TTL"):
+            self.config.health_ttl = float(os.getenv("BACKGROUND_HEALTH_TTL"))
+        if os.getenv("BACKGROUND_TRANSPORT_FORMAT"):
+            self.config.transport_format = os.getenv("BACKGROUND_TRANSPORT_FORMAT")
+        if os.getenv("BACKGROUND_PATH_HANDOFF"):
+            self.config.path_handoff = os.getenv("BACKGROUND_PATH_HANDOFF").lower() in ("1", "true", "yes")
+        
+        self.session = self._create_session()
+        self._health_lock = threading.Lock()
+        self._health_checked_at: Optional[float] = None
+        self._health_status = False
         
         logger.info(f"Background client initialized with base_url: {self.config.base_url}")
     
-    def _make_request(self, endpoint: str, files: Dict, data: Dict) -> Dict[str, Any]:
+    def _create_session(self) -> requests.Session:
+        """Create a keep-alive session with a pooled adapter"""
+        session = requests.Session()
+        # Retries are handled in _make_request, so the adapter must not retry on its own
+        adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            max_retries=0,
+            pool_block=False
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+    
+    def __enter__(self) -> "BackgroundClient":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _make_request(self,
+                      endpoint: str,
+                      files: Optional[Dict] = None,
+                      data: Optional[Dict] = None,
+                      json_body: Optional[Dict] = None) -> Dict[str, Any]:
         """Make HTTP request with retry logic"""
         url = f"{self.config.base_url}{endpoint}"
         
@@ -75,10 +213,11 @@ class BackgroundClient:
             try:
                 logger.info(f"Making request to {url} (attempt {attempt + 1}/{self.config.retry_attempts})")
                 
-                response = requests.post(
+                response = self.session.post(
                     url,
                     files=files,
                     data=data,
+                    json=json_body,
                     timeout=self.config.timeout
                 )
                 
@@ -121,35 +260,42 @@ class BackgroundClient:
             if attempt < self.config.retry_attempts - 1:
                 time.sleep(self.config.retry_delay * (2 ** attempt))
     
+    def _use_path_handoff(self, image: ImageInput) -> bool:
+        """Whether to send a server-visible path instead of uploading the file"""
+        return self.config.path_handoff and isinstance(image, (str, Path))
+    
     def cleanup(self, 
-                image_path: Union[str, Path],
+                image_path: ImageInput,
                 mode: BGMode = BGMode.TRANSPARENT,
                 blur_radius: Optional[int] = None,
                 desaturate_pct: Optional[int] = None,
                 enhance_fg: bool = True,
-                denoise: bool = False) -> BackgroundMetadata:
-        """Clean up image background"""
+                denoise: bool = False,
+                filename: Optional[str] = None) -> BackgroundMetadata:
+        """Clean up image background
         
-        image_path = Path(image_path)
-        if not image_path.exists():
-            raise BackgroundClientError(f"Image file not found: {image_path}", "FILE_NOT_FOUND")
+        ``image_path`` may also be an in-memory image (see ``ImageInput``).
+        """
         
-        logger.info(f"Starting background cleanup for {image_path} with mode {mode}")
+        data = {
+            'mode': mode.value,
+            'enhance_fg': enhance_fg,
+            'denoise': denoise
+        }
         
-        with open(image_path, 'rb') as f:
-            files = {'file': (image_path.name, f, 'image/jpeg')}
-            data = {
-                'mode': mode.value,
-                'enhance_fg': enhance_fg,
-                'denoise': denoise
-            }
-            
-            if blur_radius is not None:
-                data['blur_radius'] = blur_radius
-            if desaturate_pct is not None:
-                data['desaturate_pct'] = desaturate_pct
-            
-            result = self._make_request('/background/cleanup', files, data)
+        if blur_radius is not None:
+            data['blur_radius'] = blur_radius
+        if desaturate_pct is not None:
+            data['desaturate_pct'] = desaturate_pct
+        
+        if self._use_path_handoff(image_path):
+            logger.info(f"Starting background cleanup for {image_path} with mode {mode} (path handoff)")
+            data['image_path'] = str(image_path)
+            result = self._make_request('/background/cleanup/path', json_body=data)
+        else:
+            upload = encode_image_payload(image_path, self.config, filename)
+            logger.info(f"Starting background cleanup for {upload[0]} with mode {mode}")
+            result = self._make_request('/background/cleanup', {'file': upload}, data)
         
         metadata = BackgroundMetadata(
             mode='cleanup',
@@ -168,7 +314,7 @@ class BackgroundClient:
         return metadata
     
     def replace(self,
-                image_path: Union[str, Path],
+                image_path: ImageInput,
                 prompt: str,
                 negative_prompt: str = "people, text, watermark",
                 engine: Optional[BGEngine] = None,
@@ -177,36 +323,42 @@ class BackgroundClient:
                 seed: Optional[int] = None,
                 enhance_fg: bool = True,
                 match_colors: bool = True,
-                feather_edges: bool = True) -> BackgroundMetadata:
-        """Replace image background with AI-generated content"""
+                feather_edges: bool = True,
+                filename: Optional[str] = None) -> BackgroundMetadata:
+        """Replace image background with AI-generated content
         
-        image_path = Path(image_path)
-        if not image_path.exists():
-            raise BackgroundClientError(f"Image file not found: {image_path}", "FILE_NOT_FOUND")
+        ``image_path`` may also be an in-memory image (see ``ImageInput``).
+        """
         
         if not prompt.strip():
             raise BackgroundClientError("Prompt is required", "MISSING_PROMPT")
         
-        logger.info(f"Starting background replacement for {image_path} with prompt: '{prompt}'")
+        data = {
+            'prompt': prompt,
+            'negative_prompt': negative_prompt,
+            'steps': steps,
+            'guidance_scale': guidance_scale,
+            'enhance_fg': enhance_fg,
+            'match_colors': match_colors,
+            'feather_edges': feather_edges
+        }
         
-        with open(image_path, 'rb') as f:
-            files = {'file': (image_path.name, f, 'image/jpeg')}
-            data = {
-                'prompt': prompt,
-                'negative_prompt': negative_prompt,
-                'steps': steps,
-                'guidance_scale': guidance_scale,
-                'enhance_fg': enhance_fg,
-                'match_colors': match_colors,
-                'feather_edges': feather_edges
-            }
-            
+        if engine:
+            data['engine'] = engine.value
+        if seed is not None:
+            data['seed'] = seed
+        
+        if self._use_path_handoff(image_path):
+            logger.info(f"Starting background replacement for {image_path} with prompt: '{prompt}' (path handoff)")
+            data['image_path'] = str(image_path)
             if engine:
-                data['engine'] = engine.value
-            if seed is not None:
-                data['seed'] = seed
-            
-            result = self._make_request('/background/replace', files, data)
+                # The service's JSON models use lowercase engine names
+                data['engine'] = engine.value.lower()
+            result = self._make_request('/background/replace/path', json_body=data)
+        else:
+            upload = encode_image_payload(image_path, self.config, filename)
+            logger.info(f"Starting background replacement for {upload[0]} with prompt: '{prompt}'")
+            result = self._make_request('/background/replace', {'file': upload}, data)
         
         metadata = BackgroundMetadata(
             mode='replace',
@@ -228,17 +380,92 @@ class BackgroundClient:
         logger.info(f"Background replacement completed: {metadata.out_jpg}")
         return metadata
     
-    def is_healthy(self) -> bool:
-        """Check if the background service is healthy"""
-        try:
-            response = requests.get(f"{self.config.base_url}/health", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+    def replace_variants(self,
+                         image_path: ImageInput,
+                         prompts: List[str],
+                         negative_prompt: str = "people, text, watermark",
+                         steps: int = 20,
+                         guidance_scale: float = 7.5,
+                         seed: Optional[int] = None,
+                         enhance_fg: bool = True,
+                         match_colors: bool = True,
+                         feather_edges: bool = True,
+                         filename: Optional[str] = None) -> List[BackgroundMetadata]:
+        """Render one image over a generated background per prompt in a single call
+        
+        The service masks and enhances the foreground once for all prompts, e.g.
+        every prompt of a ``BRAND_PRESETS`` entry. Results are in prompt order.
+        """
+        prompts = [p for p in prompts if p.strip()]
+        if not prompts:
+            raise BackgroundClientError("Prompt is required", "MISSING_PROMPT")
+        
+        upload = encode_image_payload(image_path, self.config, filename)
+        logger.info(f"Starting background replacement for {upload[0]} with {len(prompts)} prompt(s)")
+        
+        data = {
+            'prompts': prompts,
+            'negative_prompt': negative_prompt,
+            'steps': steps,
+            'guidance_scale': guidance_scale,
+            'enhance_fg': enhance_fg,
+            'match_colors': match_colors,
+            'feather_edges': feather_edges
+        }
+        if seed is not None:
+            data['seed'] = seed
+        
+        result = self._make_request('/background/replace/variants', {'file': upload}, data)
+        
+        processed_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        variants = []
+        for prompt, variant in zip(prompts, result.get('results', [])):
+            variants.append(BackgroundMetadata(
+                mode='replace',
+                out_jpg=variant.get('output_path'),
+                processed_at=processed_at,
+                prompt=prompt,
+                settings={
+                    'negative_prompt': negative_prompt,
+                    'steps': steps,
+                    'guidance_scale': guidance_scale,
+                    'seed': variant.get('meta', {}).get('seed'),
+                    'enhance_fg': enhance_fg,
+                    'match_colors': match_colors,
+                    'feather_edges': feather_edges
+                }
+            ))
+        
+        logger.info(f"Background variants completed: {[v.out_jpg for v in variants]}")
+        return variants
+    
+    def is_healthy(self, force: bool = False) -> bool:
+        """Check if the background service is healthy
+        
+        The result is cached for ``health_ttl`` seconds so a batch pays for a
+        single health probe instead of one per image. Pass ``force=True`` to
+        bypass the cache.
+        """
+        with self._health_lock:
+            now = time.monotonic()
+            if (not force
+                    and self._health_checked_at is not None
+                    and now - self._health_checked_at < self.config.health_ttl):
+                return self._health_status
+            
+            try:
+                response = self.session.get(f"{self.config.base_url}/health", timeout=5)
+                healthy = response.status_code == 200
+            except Exception:
+                healthy = False
+            
+            self._health_status = healthy
+            self._health_checked_at = now
+            return healthy
     
     def get_status(self) -> Dict[str, str]:
         """Get service status"""
-        response = requests.get(f"{self.config.base_url}/health", timeout=5)
+        response = self.session.get(f"{self.config.base_url}/health", timeout=5)
         response.raise_for_status()
         return response.json()
 
@@ -264,4 +491,31 @@ BRAND_PRESETS = {
 
 def create_client(config: Optional[BackgroundClientConfig] = None) -> BackgroundClient:
     """Create a background client instance"""
-    return BackgroundClient(config)
\ No newline at end of file
+    return BackgroundClient(config)
+
+
+_shared_client: Optional[BackgroundClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client(config: Optional[BackgroundClientConfig] = None) -> BackgroundClient:
+    """Get the process-wide background client, creating it on first use
+    
+    The config is only applied when the client is first created.
+    """
+    global _shared_client
+    
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = create_client(config)
+        return _shared_client
+
+
+def reset_shared_client():
+    """Close and drop the process-wide background client"""
+    global _shared_client
+    
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
\ No newline at end of file
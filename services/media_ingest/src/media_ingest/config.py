@@ -36,12 +36,15 @@ class MediaIngestConfig(BaseSettings):
     # Feature toggles
     face_blur_enabled: bool = Field(True, description="Enable face blurring")
     enhancement_enabled: bool = Field(True, description="Enable image enhancement")
-    
-        # Background automation settings
-        background_automation: Optional[str] = Field(None, description="Background automation mode: 'cleanup', 'replace', or None")
-        background_api_url: str = Field("http://localhost:8089", description="Background service API URL")
-        background_preset: str = Field("vitrinealu", description="Brand preset for background replacement")
-        background_prompt_type: str = Field("studio", description="Prompt type: garden, studio, minimal, lifestyle")
+
+    # Background automation settings
+    background_automation: Optional[str] = Field(None, description="Background automation mode: 'cleanup', 'replace', or None")
+    background_api_url: str = Field("http://localhost:8089", description="Background service API URL")
+    background_preset: str = Field("vitrinealu", description="Brand preset for background replacement")
+    background_prompt_type: str = Field("studio", description="Prompt type: garden, studio, minimal, lifestyle")
+    background_pool_size: int = Field(8, description="Keep-alive connections kept open to the background service")
+    background_health_ttl: float = Field(30.0, description="Seconds to cache the background service health check")
+    background_transport_format: str = Field("png", description="Upload encoding for in-memory images: png, jpeg, or raw")
 
     # Enhancement settings
     enhancement_backend: str = Field("realesrgan", description="Enhancement backend: realesrgan, gfpgan, or pil")
@@ -4,11 +4,13 @@ import hashlib
 import json
 import shutil
 import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import cv2
+import numpy as np
 from PIL import Image
 
 from .config import config
@@ -16,7 +18,15 @@ from .curation import curation_engine
 from .enhance import enhancer
 from .face_blur import face_blurrer
 from .watermark import watermark_applier
-from .background_client import create_client as create_background_client, BRAND_PRESETS, BGMode, BackgroundClientError
+from .background_client import (
+    create_client as create_background_client,
+    BackgroundClient,
+    BackgroundClientConfig,
+    BRAND_PRESETS,
+    BGMode,
+    BackgroundClientError,
+    ImageInput,
+)
 
 
 class ProcessedDatabase:
@@ -62,6 +72,8 @@ class MediaPipeline:
         self.db = ProcessedDatabase(config.processed_db_path)
         Path(config.output_base_path).mkdir(parents=True, exist_ok=True)
         Path(config.temp_dir).mkdir(parents=True, exist_ok=True)
+        self._background_client: Optional[BackgroundClient] = None
+        self._background_client_lock = threading.Lock()
 
     def compute_sha256(self, file_path: Path) -> str:
         """Compute SHA256 hash of file"""
@@ -104,69 +116,87 @@ class MediaPipeline:
         with open(json_path, 'w') as f:
             json.dump(metadata, f, indent=2, default=str)
 
-        def process_background(self, temp_output_path: Path) -> Optional[Dict]:
-            """Process background automation if enabled"""
-            if not config.background_automation:
+    def get_background_client(self) -> BackgroundClient:
+        """Get the pipeline's background client, creating it on first use"""
+        with self._background_client_lock:
+            if self._background_client is None:
+                self._background_client = create_background_client(BackgroundClientConfig(
+                    base_url=config.background_api_url,
+                    pool_maxsize=config.background_pool_size,
+                    health_ttl=config.background_health_ttl,
+                    transport_format=config.background_transport_format
+                ))
+            return self._background_client
+
+    def process_background(self, image: ImageInput, filename: Optional[str] = None) -> Optional[Dict]:
+        """Process background automation if enabled
+        
+        ``image`` can be a path or an in-memory image; in-memory images are
+        uploaded directly without a temp file round trip.
+        """
+        if not config.background_automation:
+            return None
+        
+        try:
+            # Reuse the pooled client across the whole batch
+            background_client = self.get_background_client()
+        
+            # Check if service is available (cached between calls)
+            if not background_client.is_healthy():
+                print("Background service is not available, skipping background processing")
                 return None
+        
+            if config.background_automation == "cleanup":
+                # Clean up background
+                result = background_client.cleanup(
+                    image_path=image,
+                    filename=filename,
+                    mode=BGMode.TRANSPARENT,
+                    enhance_fg=True,
+                    denoise=False
+                )
             
-            try:
-                # Create background client
-                background_client = create_background_client()
-            
-                # Check if service is available
-                if not background_client.is_healthy():
-                    print("Background service is not available, skipping background processing")
-                    return None
+                return {
+                    "mode": "cleanup",
+                    "outJpg": result.out_jpg,
+                    "outPng": result.out_png,
+                    "processedAt": result.processed_at,
+                    "settings": result.settings
+                }
             
-                if config.background_automation == "cleanup":
-                    # Clean up background
-                    result = background_client.cleanup(
-                        image_path=temp_output_path,
-                        mode=BGMode.TRANSPARENT,
-                        enhance_fg=True,
-                        denoise=False
-                    )
-                
-                    return {
-                        "mode": "cleanup",
-                        "outJpg": result.out_jpg,
-                        "outPng": result.out_png,
-                        "processedAt": result.processed_at,
-                        "settings": result.settings
-                    }
-                
-                elif config.background_automation == "replace":
-                    # Get brand preset
-                    preset = BRAND_PRESETS.get(config.background_preset, BRAND_PRESETS["vitrinealu"])
-                    prompt = preset["prompts"].get(config.background_prompt_type, preset["prompts"]["studio"])
-                
-                    # Replace background
-                    result = background_client.replace(
-                        image_path=temp_output_path,
-                        prompt=prompt,
-                        negative_prompt=preset["negative_prompt"],
-                        engine=preset["settings"]["engine"],
-                        steps=preset["settings"]["steps"],
-                        guidance_scale=preset["settings"]["guidance_scale"]
-                    )
-                
-                    return {
-                        "mode": "replace",
-                        "engine": result.engine,
-                        "outJpg": result.out_jpg,
-                        "processedAt": result.processed_at,
-                        "prompt": result.prompt,
-                        "settings": result.settings
-                    }
+            elif config.background_automation == "replace":
+                # Get brand preset
+                preset = BRAND_PRESETS.get(config.background_preset, BRAND_PRESETS["vitrinealu"])
+                prompt = preset["prompts"].get(config.background_prompt_type, preset["prompts"]["studio"])
             
-                return None
+                # Replace background
+                result = background_client.replace(
+                    image_path=image,
+                    filename=filename,
+                    prompt=prompt,
+                    negative_prompt=preset["negative_prompt"],
+                    engine=preset["settings"]["engine"],
+                    steps=preset["settings"]["steps"],
+                    guidance_scale=preset["settings"]["guidance_scale"]
+                )
             
-            except BackgroundClientError as e:
-                print(f"Background processing failed: {e}")
-                return None
-            except Exception as e:
-                print(f"Unexpected error in background processing: {e}")
-                return None
+                return {
+                    "mode": "replace",
+                    "engine": result.engine,
+                    "outJpg": result.out_jpg,
+                    "processedAt": result.processed_at,
+                    "prompt": result.prompt,
+                    "settings": result.settings
+                }
+        
+            return None
+        
+        except BackgroundClientError as e:
+            print(f"Background processing failed: {e}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error in background processing: {e}")
+            return None
 
     def process_file(self, input_path: Path, source: str = "nas") -> Optional[Path]:
         """Process a single media file through the complete pipeline"""
@@ -212,26 +242,21 @@ class MediaPipeline:
             else:
                 final_pil = watermarked_pil
 
-                # 8. Background processing (optional)
-                background_metadata = None
-                if config.background_automation:
-                    try:
-                            # Save temporary image for background processing
-                            temp_path = Path(config.temp_dir) / f"temp_{input_path.stem}.jpg"
-                            final_pil.save(temp_path, quality=95)
-                            background_metadata = self.process_background(temp_path)
-                            # Clean up temp file
-                            if temp_path.exists():
-                                temp_path.unlink()
-                    except Exception as e:
-                        print(f"Background processing failed: {e}")
-                        # Continue without background processing
-
-                # 9. Generate output path and save
+            # 8. Background processing (optional)
+            background_metadata = None
+            if config.background_automation:
+                try:
+                    # Upload straight from memory, no temp file or lossy re-encode
+                    background_metadata = self.process_background(final_pil, filename=input_path.name)
+                except Exception as e:
+                    print(f"Background processing failed: {e}")
+                    # Continue without background processing
+
+            # 9. Generate output path and save
             output_path = self.generate_output_path(input_path, scores)
             final_pil.save(output_path, quality=95)
 
-                # 10. Create sidecar metadata
+            # 10. Create sidecar metadata
             metadata = {
                 "source": source,
                 "original_path": str(input_path),
@@ -248,12 +273,12 @@ class MediaPipeline:
                 },
                 "faces_blurred": config.face_blur_enabled,
                 "watermark": config.watermark_path,
-                    "brand": "vitrinealu",
-                    "background": background_metadata
+                "brand": "vitrinealu",
+                "background": background_metadata
             }
             self.create_sidecar_json(output_path, metadata)
 
-                # 11. Mark as processed
+            # 11. Mark as processed
             self.db.mark_processed(file_hash, str(input_path), str(output_path), source)
 
             print(f"Successfully processed {input_path} -> {output_path}")
@@ -0,0 +1,291 @@
+"""Tests for the background processing client"""
+
+import asyncio
+import io
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+from unittest.mock import patch, Mock
+
+from media_ingest import background_client as bg
+from media_ingest.background_client import (
+    BackgroundClient,
+    BackgroundClientConfig,
+    BGMode,
+    RAW_HEADER,
+    RAW_MAGIC,
+    encode_image_payload,
+)
+from media_ingest import async_background_client as async_bg
+from media_ingest.async_background_client import AsyncBackgroundClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create a client with env overrides cleared"""
+    for name in ("BACKGROUND_API_URL", "BACKGROUND_TIMEOUT", "BACKGROUND_POOL_SIZE",
+                 "BACKGROUND_HEALTH_TTL", "BACKGROUND_TRANSPORT_FORMAT", "BACKGROUND_PATH_HANDOFF"):
+        monkeypatch.delenv(name, raising=False)
+    client = BackgroundClient(BackgroundClientConfig(base_url="http://bg:8089", pool_maxsize=4))
+    yield client
+    client.close()
+
+
+def _ok_response(payload=None):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = payload or {"success": True, "output_path": "/out/result.jpg"}
+    return response
+
+
+class TestBackgroundClientSession:
+    """Test connection pooling and health caching"""
+
+    def test_adapter_uses_configured_pool_size(self, client):
+        adapter = client.session.get_adapter("http://bg:8089/health")
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 0
+
+    def test_requests_reuse_session(self, client, tmp_path):
+        image_path = tmp_path / "test.jpg"
+        image_path.write_bytes(b"\xff\xd8\xff")
+
+        with patch.object(client.session, "post", return_value=_ok_response()) as mock_post, \
+                patch("media_ingest.background_client.requests.post") as module_post:
+            client.cleanup(image_path, mode=BGMode.TRANSPARENT)
+            client.cleanup(image_path, mode=BGMode.SOFTEN)
+
+        assert mock_post.call_count == 2
+        module_post.assert_not_called()
+
+    def test_health_is_cached_within_ttl(self, client):
+        with patch.object(client.session, "get", return_value=_ok_response()) as mock_get:
+            assert client.is_healthy()
+            assert client.is_healthy()
+            assert mock_get.call_count == 1
+
+            assert client.is_healthy(force=True)
+            assert mock_get.call_count == 2
+
+    def test_health_expires_after_ttl(self, client):
+        client.config.health_ttl = 10.0
+        with patch.object(client.session, "get", side_effect=Exception("down")) as mock_get, \
+                patch("media_ingest.background_client.time.monotonic", side_effect=[100.0, 105.0, 111.0]):
+            assert not client.is_healthy()
+            assert not client.is_healthy()
+            assert not client.is_healthy()
+
+        assert mock_get.call_count == 2
+
+
+class TestImagePayload:
+    """Test in-memory upload encoding"""
+
+    def test_path_is_sent_unchanged(self, tmp_path):
+        image_path = tmp_path / "photo.jpg"
+        image_path.write_bytes(b"\xff\xd8\xffdata")
+
+        name, data, content_type = encode_image_payload(image_path, BackgroundClientConfig())
+
+        assert name == "photo.jpg"
+        assert data == b"\xff\xd8\xffdata"
+        assert content_type == "image/jpeg"
+
+    def test_pil_image_png_is_lossless(self):
+        array = np.random.randint(0, 256, (16, 24, 3), dtype=np.uint8)
+        config = BackgroundClientConfig(transport_format="png")
+
+        name, data, content_type = encode_image_payload(Image.fromarray(array), config, "shot.jpg")
+
+        assert name == "shot.png"
+        assert content_type == "image/png"
+        assert np.array_equal(np.asarray(Image.open(io.BytesIO(data))), array)
+
+    def test_raw_transport_has_shape_header(self):
+        array = np.random.randint(0, 256, (10, 7, 3), dtype=np.uint8)
+        config = BackgroundClientConfig(transport_format="raw")
+
+        _, data, content_type = encode_image_payload(array, config)
+
+        magic, height, width, channels = RAW_HEADER.unpack_from(data)
+        assert content_type == "application/x-vitrine-raw"
+        assert (magic, height, width, channels) == (RAW_MAGIC, 10, 7, 3)
+        pixels = np.frombuffer(data, dtype=np.uint8, offset=RAW_HEADER.size).reshape(10, 7, 3)
+        assert np.array_equal(pixels, array)
+
+    def test_cleanup_uploads_in_memory_image(self, client):
+        with patch.object(client.session, "post", return_value=_ok_response()) as mock_post:
+            client.cleanup(Image.new("RGB", (8, 8), color="red"), filename="input.jpg")
+
+        name, data, content_type = mock_post.call_args[1]["files"]["file"]
+        assert name == "input.png"
+        assert content_type == "image/png"
+
+
+class TestReplaceVariants:
+    """Test the multi-prompt replace call"""
+
+    def test_variants_send_all_prompts_in_one_request(self, client):
+        prompts = list(bg.BRAND_PRESETS["vitrinealu"]["prompts"].values())
+        payload = {
+            "success": True,
+            "results": [{"output_path": f"/out/{i}.jpg", "meta": {"seed": 7 + i}} for i in range(len(prompts))]
+        }
+
+        with patch.object(client.session, "post", return_value=_ok_response(payload)) as mock_post:
+            variants = client.replace_variants(Image.new("RGB", (8, 8)), prompts, seed=7)
+
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[0][0] == "http://bg:8089/background/replace/variants"
+        assert mock_post.call_args[1]["data"]["prompts"] == prompts
+        assert [v.out_jpg for v in variants] == [f"/out/{i}.jpg" for i in range(4)]
+        assert [v.prompt for v in variants] == prompts
+        assert variants[3].settings["seed"] == 10
+
+
+class TestSharedClient:
+    """Test the process-wide client"""
+
+    def test_shared_client_is_singleton(self):
+        bg.reset_shared_client()
+        try:
+            first = bg.get_shared_client()
+            second = bg.get_shared_client()
+            assert first is second
+        finally:
+            bg.reset_shared_client()
+
+
+class TestAsyncBackgroundClient:
+    """Test the asyncio batch client"""
+
+    @staticmethod
+    def _make_images(tmp_path, count):
+        paths = []
+        for i in range(count):
+            path = tmp_path / f"img_{i}.jpg"
+            path.write_bytes(b"\xff\xd8\xff")
+            paths.append(path)
+        return paths
+
+    def test_replace_many_respects_concurrency_limit(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("BACKGROUND_API_URL", raising=False)
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={"success": True, "output_path": "/out/x.jpg"})
+
+        async def run():
+            config = BackgroundClientConfig(base_url="http://bg:8089", max_concurrency=2)
+            async with AsyncBackgroundClient(config, transport=httpx.MockTransport(handler)) as client:
+                return [r async for r in client.replace_many(self._make_images(tmp_path, 6), "studio")]
+
+        results = asyncio.run(run())
+
+        assert len(results) == 6
+        assert all(r.ok for r in results)
+        assert all(r.metadata.prompt == "studio" for r in results)
+        assert peak <= 2
+
+    def test_replace_many_encodes_only_a_window_of_images(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("BACKGROUND_API_URL", raising=False)
+        encoded = []
+        encoded_at_request = []
+        real_encode = async_bg.encode_image_payload
+
+        def counting_encode(*args, **kwargs):
+            encoded.append(args[0])
+            return real_encode(*args, **kwargs)
+
+        monkeypatch.setattr(async_bg, "encode_image_payload", counting_encode)
+
+        async def handler(request):
+            encoded_at_request.append(len(encoded))
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"success": True, "output_path": "/out/x.jpg"})
+
+        async def run():
+            config = BackgroundClientConfig(base_url="http://bg:8089", max_concurrency=2)
+            async with AsyncBackgroundClient(config, transport=httpx.MockTransport(handler)) as client:
+                return [r async for r in client.replace_many(self._make_images(tmp_path, 8), "studio")]
+
+        results = asyncio.run(run())
+
+        assert len(results) == 8
+        # Uploads are read on demand, not all before the first request
+        assert encoded_at_request[0] <= 2
+        assert len(encoded) == 8
+
+    def test_busy_service_is_retried(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("BACKGROUND_API_URL", raising=False)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, text="queue full")
+            return httpx.Response(200, json={"success": True, "output_path": "/out/x.jpg"})
+
+        async def run():
+            config = BackgroundClientConfig(base_url="http://bg:8089", retry_delay=0.0)
+            async with AsyncBackgroundClient(config, transport=httpx.MockTransport(handler)) as client:
+                return await client.cleanup(self._make_images(tmp_path, 1)[0])
+
+        metadata = asyncio.run(run())
+
+        assert len(calls) == 2
+        assert metadata.out_jpg == "/out/x.jpg"
+
+    def test_cleanup_many_reports_failures_per_image(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("BACKGROUND_API_URL", raising=False)
+
+        def handler(request):
+            return httpx.Response(400, text="bad image")
+
+        async def run():
+            config = BackgroundClientConfig(base_url="http://bg:8089")
+            paths = self._make_images(tmp_path, 2) + [tmp_path / "missing.jpg"]
+            async with AsyncBackgroundClient(config, transport=httpx.MockTransport(handler)) as client:
+                return [r async for r in client.cleanup_many(paths)]
+
+        results = asyncio.run(run())
+
+        assert len(results) == 3
+        assert not any(r.ok for r in results)
+        assert sorted(r.error.code for r in results) == ["FILE_NOT_FOUND", "HTTP_ERROR", "HTTP_ERROR"]
+
+
+class TestPathHandoff:
+    """Test shared-volume path handoff"""
+
+    def test_path_handoff_posts_json(self, client, tmp_path):
+        client.config.path_handoff = True
+        image_path = tmp_path / "photo.jpg"
+        image_path.write_bytes(b"\xff\xd8\xff")
+
+        with patch.object(client.session, "post", return_value=_ok_response()) as mock_post:
+            client.replace(image_path, prompt="studio", engine=bg.BGEngine.SDXL)
+
+        url = mock_post.call_args[0][0]
+        kwargs = mock_post.call_args[1]
+        assert url == "http://bg:8089/background/replace/path"
+        assert kwargs["files"] is None
+        assert kwargs["json"]["image_path"] == str(image_path)
+        assert kwargs["json"]["engine"] == "sdxl"
+
+    def test_in_memory_images_still_upload(self, client):
+        client.config.path_handoff = True
+
+        with patch.object(client.session, "post", return_value=_ok_response()) as mock_post:
+            client.cleanup(Image.new("RGB", (4, 4)))
+
+        assert mock_post.call_args[0][0] == "http://bg:8089/background/cleanup"
+        assert "file" in mock_post.call_args[1]["files"]
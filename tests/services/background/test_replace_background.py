@@ -105,17 +105,112 @@ def test_runway_engine_retry():
         # Should have retried
         assert mock_post.call_count == 2
 
+class _FakeSegmenter:
+    """DeepLab stand-in scoring the top half of its input as person."""
+
+    def __init__(self):
+        self.input_sizes = []
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_tensor):
+        import torch
+        height, width = input_tensor.shape[-2:]
+        self.input_sizes.append((width, height))
+        logits = torch.zeros(1, 21, height, width)
+        logits[0, 15, :height // 2] = 1.0
+        return {'out': logits}
+
 def test_generate_mask(sample_image):
-    with patch('services.background.replace_background.deeplabv3_resnet101') as mock_model_class, \
-         patch('services.background.replace_background.torch') as mock_torch:
-        mock_model = Mock()
-        mock_output = Mock()
-        mock_output.argmax.return_value.byte.return_value.cpu.return_value.numpy.return_value = np.zeros((100, 100), dtype=np.uint8)
-        mock_model.return_value = {'out': [mock_output]}
-        mock_model_class.return_value = mock_model
-        mock_torch.no_grad.return_value.__enter__ = Mock()
-        mock_torch.no_grad.return_value.__exit__ = Mock()
+    from services.background import replace_background as rb
+    fake = _FakeSegmenter()
+    factory = Mock(return_value=fake)
 
+    with patch.dict(rb.SEGMENTATION_BACKBONES, {"resnet101": factory}), \
+         patch.object(rb, '_segmentation_provider', rb.SegmentationModelProvider(backbone="resnet101", inference_size=50)):
         mask = generate_mask(sample_image)
-        assert isinstance(mask, Image.Image)
-        assert mask.mode == 'L'
\ No newline at end of file
+        generate_mask(sample_image)
+
+    assert isinstance(mask, Image.Image)
+    assert mask.mode == 'L'
+    assert mask.size == (100, 100)
+    pixels = np.array(mask)
+    assert (pixels[:45] == 0).all()  # person kept
+    assert (pixels[55:] == 255).all()  # background to inpaint
+    # Loaded once, inference at the reduced resolution
+    factory.assert_called_once()
+    assert fake.input_sizes == [(50, 50), (50, 50)]
+
+def test_segmentation_provider_backbone_selection():
+    from services.background import replace_background as rb
+    factory = Mock(return_value=_FakeSegmenter())
+
+    with patch.dict(os.environ, {"BG_SEG_BACKBONE": "mobilenet_v3_large", "BG_SEG_INFERENCE_SIZE": "0"}), \
+         patch.dict(rb.SEGMENTATION_BACKBONES, {"mobilenet_v3_large": factory}):
+        provider = rb.SegmentationModelProvider()
+        foreground = provider.predict_foreground(Image.new('RGB', (30, 20)))
+
+    assert provider.inference_size == 0
+    assert foreground.shape == (20, 30)
+    factory.assert_called_once_with(pretrained=True)
+
+    with pytest.raises(ValueError, match="Unknown segmentation backbone"):
+        rb.SegmentationModelProvider(backbone="vgg")
+
+def test_preset_registry_indexes_and_applies_defaults():
+    from services.background.replace_background import get_preset_registry
+    registry = get_preset_registry()
+
+    assert "modern_garden_day" in registry
+    assert get_preset_registry() is registry
+    # Presets without their own strength pick up the built-in default
+    assert registry.get("product-studio")["strength"] == 0.8
+    assert registry.get("sunset_patio")["strength"] == 0.75
+    # Callers get copies
+    registry.get("sunset_patio")["prompt"] = "changed"
+    assert registry.get("sunset_patio")["prompt"] != "changed"
+
+    with pytest.raises(ValueError, match="Preset missing not found"):
+        registry.get("missing")
+
+@pytest.mark.parametrize("body, error", [
+    ("presets:\n  - name: a\n    prompt: p\n    negative_prompt: n\n    guidance_scale: 7\n  - name: a\n    prompt: p\n    negative_prompt: n\n    guidance_scale: 7\n", "duplicate preset a"),
+    ("presets:\n  - name: a\n    prompt: p\n    guidance_scale: 7\n", "missing negative_prompt"),
+    ("presets:\n  - name: a\n    prompt: p\n    negative_prompt: n\n    guidance_scale: 7\n    strength: 2\n", "strength"),
+    ("presets:\n  name: a\n", "expected a 'presets' list"),
+])
+def test_preset_registry_validation(tmp_path, body, error):
+    from services.background.replace_background import PresetRegistry
+    path = tmp_path / "presets.yaml"
+    path.write_text(body)
+
+    with pytest.raises(ValueError, match=error):
+        PresetRegistry.from_file(str(path))
+
+def test_replace_background_reads_input_once(tmp_paths, sample_image):
+    in_path, out_path, mask_path = tmp_paths
+    sample_image.save(in_path)
+    Image.new('L', (100, 100), color=255).save(mask_path)
+    engine = Mock()
+    engine.name = "diffusion"
+    engine.replace_background.return_value = sample_image
+
+    real_open = open
+    with patch('builtins.open', side_effect=real_open) as mock_open:
+        replace_background(str(in_path), str(out_path), "modern_garden_day", mask_path=str(mask_path), engine=engine)
+
+    input_opens = [c for c in mock_open.call_args_list if c.args and c.args[0] == str(in_path)]
+    assert len(input_opens) == 1
+
+def test_missing_mask_marks_job_out_of_date(tmp_paths, sample_image, monkeypatch):
+    # cli.py is run as a script and imports its siblings as top-level modules
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), "..", "..", "..", "services", "background"))
+    from cli import is_up_to_date
+    in_path, out_path, mask_path = tmp_paths
+    sample_image.save(in_path)
+    sample_image.save(out_path)
+
+    assert is_up_to_date({"in": str(in_path), "out": str(out_path)})
+    # The job runs and reports the missing mask rather than aborting the batch
+    assert not is_up_to_date({"in": str(in_path), "out": str(out_path), "mask": str(mask_path)})